@@ -1,6 +1,7 @@
 # backend/celery_app.py
 """Celery 应用实例"""
 from celery import Celery
+from celery.signals import worker_init
 
 # 创建 Celery 应用
 celery_app = Celery('ai_pdf_chat')
@@ -12,6 +13,13 @@ celery_app.config_from_object('backend.celeryconfig')
 celery_app.autodiscover_tasks(['backend.tasks'])
 
 
+@worker_init.connect
+def warm_up_worker(**kwargs):
+    """主进程预加载 jieba 词典,fork 出的子进程直接继承"""
+    from backend.services.sparse_retrieval import warm_up_tokenizer
+    warm_up_tokenizer()
+
+
 @celery_app.task(bind=True)
 def debug_task(self):
     """调试任务"""
@@ -15,16 +15,85 @@ class Settings(BaseSettings):
     qdrant_url: str = "http://localhost:6333"
     qdrant_api_key: str = ""
 
+    # Shared HTTP Transport (OpenAI / Anthropic / Qdrant)
+    http_shared_transport: bool = True
+    http_max_connections: int = 100
+    http_max_keepalive_connections: int = 20
+    http_keepalive_expiry: float = 30.0
+    http_http2: bool = True  # used when the h2 package is installed
+    http_connect_timeout: float = 5.0
+    http_read_timeout: float = 60.0
+    http_pool_timeout: float = 10.0
+
     # Redis
     redis_host: str = "localhost"
     redis_port: int = 6379
     redis_db: int = 0
 
+    # Cache Serialization
+    cache_codec: str = "msgpack"  # json | msgpack
+    cache_compression: str = "zstd"  # none | zstd | lz4
+    cache_compress_min_bytes: int = 1024
+
+    # In-process L1 Cache (in front of Redis)
+    cache_l1_enabled: bool = False
+    cache_l1_max_items: int = 1024
+    cache_l1_ttl: int = 30  # bounds staleness if an invalidation is missed
+    cache_invalidation_channel: str = "cache:invalidate"
+
+    # Task Progress Events (/tasks/{task_id}/events)
+    task_events_channel_prefix: str = "task:events"
+    task_events_heartbeat: float = 15.0  # seconds between SSE keep-alive comments
+
     # App Settings
     max_file_size_mb: int = 10
     free_tier_pdf_limit: int = 3
     free_tier_question_limit: int = 10
 
+    # PDF Extraction
+    pdf_extract_workers: int = 0  # 0 = os.cpu_count(), 1 = serial
+    pdf_parallel_min_pages: int = 50
+
+    # Sharded Ingestion (Celery chord over page ranges)
+    pdf_shard_min_pages: int = 200  # 0 = never shard
+    pdf_shard_pages: int = 50  # pages per shard subtask
+
+    # Embeddings
+    embedding_batch_max_tokens: int = 100000  # provider limit is 300k per request
+    embedding_batch_max_inputs: int = 2048
+    embedding_max_concurrency: int = 4
+    embedding_cache_enabled: bool = True
+    embedding_cache_ttl: int = 30 * 24 * 3600  # embeddings are deterministic per model
+
+    # Semantic Answer Cache (/chat)
+    semantic_cache_enabled: bool = True
+    semantic_cache_threshold: float = 0.95  # cosine similarity
+    semantic_cache_ttl: int = 3600
+    semantic_cache_max_entries: int = 256  # per PDF
+
+    # BM25 Index Persistence (shared by API processes and Celery workers)
+    bm25_index_backend: str = "disk"  # disk | redis | none
+    bm25_index_dir: str = "data/bm25"
+    bm25_index_mmap: bool = True  # memory-map index arrays loaded from disk
+    bm25_index_ttl: int = 7 * 24 * 3600  # redis backend only
+    bm25_library_enabled: bool = True  # also maintain one index across all PDFs
+
+    # BM25 Tokenization (jieba)
+    bm25_tokenize_workers: int = 0  # 0 = os.cpu_count(), 1 = serial
+    bm25_tokenize_parallel_min: int = 1000  # chunks before a process pool is used
+    bm25_query_cache_size: int = 4096  # tokenized queries kept in an LRU
+
+    # Hybrid Retrieval (dense + BM25 legs run concurrently)
+    hybrid_dense_timeout: float = 5.0  # seconds, embedding + Qdrant search; also their HTTP timeout
+    hybrid_sparse_timeout: float = 2.0  # seconds, BM25 search
+    hybrid_candidates: int = 20  # results per leg before fusion
+    hybrid_max_workers: int = 8  # threads per retrieval leg, shared by concurrent hybrid queries
+    hybrid_fusion: str = "rrf"  # rrf | minmax | zscore | dbsf
+    hybrid_rrf_k: int = 60
+
+    # Ingestion Pipeline
+    pipeline_stream_batch_size: int = 64  # chunks per embed/upsert window
+
     class Config:
         env_file = ".env"
         env_file_encoding = 'utf-8'
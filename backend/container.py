@@ -0,0 +1,130 @@
+"""Process-wide service container, built once and closed on app shutdown."""
+import threading
+from typing import Any, Callable, Dict, Optional
+from backend.http_transport import get_http_transport
+
+
+class ServiceContainer:
+    """
+    Holds long-lived service instances for the API process.
+
+    Services are built on first use (or by warm_up at startup) and reused by
+    every request, so OpenAI/Anthropic/Qdrant clients keep their pooled
+    connections and VectorStore checks the collection only once.
+    PDFPipeline and RetrievalService share one EmbeddingService and one
+    VectorStore.
+    """
+
+    def __init__(self):
+        self._services: Dict[str, Any] = {}
+        # Re-entrant: building the pipeline builds its shared dependencies
+        self._lock = threading.RLock()
+
+    def _get(self, name: str, factory: Callable[[], Any]) -> Any:
+        """Return the named service, building it once (thread-safe)."""
+        service = self._services.get(name)
+        if service is None:
+            with self._lock:
+                service = self._services.get(name)
+                if service is None:
+                    service = factory()
+                    self._services[name] = service
+        return service
+
+    @property
+    def embedding_service(self):
+        from backend.embeddings import EmbeddingService
+        return self._get('embedding_service', EmbeddingService)
+
+    @property
+    def vector_store(self):
+        from backend.vector_store import VectorStore
+        return self._get('vector_store', VectorStore)
+
+    @property
+    def pipeline(self):
+        from backend.pipeline import PDFPipeline
+        return self._get('pipeline', lambda: PDFPipeline(
+            embedding_service=self.embedding_service,
+            vector_store=self.vector_store
+        ))
+
+    @property
+    def retrieval_service(self):
+        from backend.retrieval import RetrievalService
+        return self._get('retrieval_service', lambda: RetrievalService(
+            embedding_service=self.embedding_service,
+            vector_store=self.vector_store
+        ))
+
+    @property
+    def qa_service(self):
+        from backend.qa_service import QAService
+        return self._get('qa_service', QAService)
+
+    @property
+    def suggester(self):
+        from backend.suggestions import QuestionSuggester
+        return self._get('suggester', QuestionSuggester)
+
+    def warm_up(self) -> None:
+        """
+        Build all services eagerly at startup.
+
+        Failures (e.g. Qdrant not reachable yet) are logged and the service
+        is built again on first use instead of failing startup.
+        """
+        for name in ('pipeline', 'retrieval_service', 'qa_service', 'suggester'):
+            try:
+                getattr(self, name)
+            except Exception as e:
+                print(f"[Container] Deferred {name}: {e}")
+
+    async def aclose(self) -> None:
+        """Close pooled clients of every built service and forget them."""
+        with self._lock:
+            services = list(self._services.values())
+            self._services.clear()
+
+        for service in services:
+            aclose = getattr(service, 'aclose', None)
+            if aclose is None:
+                continue
+            try:
+                await aclose()
+            except Exception as e:
+                print(f"[Container] Failed to close {type(service).__name__}: {e}")
+
+        # Shared OpenAI/Anthropic pools are owned by the transport, not the services
+        await get_http_transport().aclose()
+
+        from backend.services.hybrid_retrieval import shutdown_retrieval_executor
+        shutdown_retrieval_executor()
+
+    def pool_stats(self) -> Dict:
+        """Connection pool statistics for tuning the shared transport."""
+        stats = {'shared': get_http_transport().pool_stats()}
+        vector_store = self._services.get('vector_store')
+        if vector_store is not None:
+            stats['qdrant'] = vector_store.pool_stats()
+        return stats
+
+
+# Global singleton instance
+_container: Optional[ServiceContainer] = None
+_container_lock = threading.Lock()
+
+
+def get_container() -> ServiceContainer:
+    """
+    Get the global service container (thread-safe singleton pattern).
+
+    Returns:
+        ServiceContainer instance
+    """
+    global _container
+    if _container is None:
+        with _container_lock:
+            if _container is None:
+                _container = ServiceContainer()
+    return _container
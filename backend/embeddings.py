@@ -1,26 +1,141 @@
-from openai import OpenAI
-from typing import List
+from openai import OpenAI, AsyncOpenAI
+from concurrent.futures import ThreadPoolExecutor
+import asyncio
+from typing import List, Optional
 from backend.config import get_settings
+from backend.http_transport import get_http_transport
+from backend.services.embedding_cache import EmbeddingCache
 
 settings = get_settings()
 
 class EmbeddingService:
     def __init__(self):
-        self.client = OpenAI(api_key=settings.openai_api_key)
+        # Shared keep-alive pools; the transport owns (and closes) them
+        self._owns_http_clients = not settings.http_shared_transport
+        if settings.http_shared_transport:
+            transport = get_http_transport()
+            self.client = OpenAI(api_key=settings.openai_api_key, http_client=transport.client)
+            self.async_client = AsyncOpenAI(api_key=settings.openai_api_key, http_client=transport.async_client)
+        else:
+            self.client = OpenAI(api_key=settings.openai_api_key)
+            self.async_client = AsyncOpenAI(api_key=settings.openai_api_key)
         self.model = "text-embedding-3-small"
+        self.batch_max_tokens = settings.embedding_batch_max_tokens
+        self.batch_max_inputs = settings.embedding_batch_max_inputs
+        self.max_concurrency = settings.embedding_max_concurrency
+        self.cache = EmbeddingCache(self.model) if settings.embedding_cache_enabled else None
 
-    def get_embedding(self, text: str) -> List[float]:
-        """Get embedding for single text"""
-        response = self.client.embeddings.create(
+    async def aclose(self):
+        """Release pooled HTTP connections of both clients"""
+        if not self._owns_http_clients:
+            return
+        self.client.close()
+        await self.async_client.close()
+
+    def get_embedding(self, text: str, timeout: Optional[float] = None) -> List[float]:
+        """Get embedding for single text; timeout overrides the HTTP timeout of this request"""
+        if self.cache:
+            cached = self.cache.get_many([text])[0]
+            if cached is not None:
+                return cached
+
+        client = self.client.with_options(timeout=timeout) if timeout is not None else self.client
+        response = client.embeddings.create(
+            input=text,
+            model=self.model
+        )
+        embedding = response.data[0].embedding
+
+        if self.cache:
+            self.cache.set_many({text: embedding})
+        return embedding
+
+    async def aget_embedding(self, text: str) -> List[float]:
+        """Get embedding for single text without blocking the event loop"""
+        if self.cache:
+            # The cache client is synchronous; keep its round trip off the loop
+            cached = (await asyncio.to_thread(self.cache.get_many, [text]))[0]
+            if cached is not None:
+                return cached
+
+        response = await self.async_client.embeddings.create(
             input=text,
             model=self.model
         )
-        return response.data[0].embedding
+        embedding = response.data[0].embedding
+
+        if self.cache:
+            await asyncio.to_thread(self.cache.set_many, {text: embedding})
+        return embedding
 
     def get_embeddings_batch(self, texts: List[str]) -> List[List[float]]:
-        """Get embeddings for multiple texts"""
+        """Get embeddings for multiple texts, only requesting cache misses"""
+        if not texts:
+            return []
+        if not self.cache:
+            return self._embed_texts(texts)
+
+        embeddings = self.cache.get_many(texts)
+
+        # Request each missing text once, even if it repeats in the input
+        missing = list(dict.fromkeys(
+            text for text, embedding in zip(texts, embeddings) if embedding is None
+        ))
+        if missing:
+            fetched = dict(zip(missing, self._embed_texts(missing)))
+            self.cache.set_many(fetched)
+            embeddings = [
+                embedding if embedding is not None else fetched[text]
+                for text, embedding in zip(texts, embeddings)
+            ]
+
+        return embeddings
+
+    def _embed_texts(self, texts: List[str]) -> List[List[float]]:
+        """Call the API for texts, split into concurrent micro-batches"""
+        batches = self._split_batches(texts)
+        if len(batches) == 1:
+            return self._embed_batch(batches[0])
+
+        # executor.map keeps batch order, so results line up with texts
+        workers = min(self.max_concurrency, len(batches))
+        embeddings = []
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            for batch_embeddings in executor.map(self._embed_batch, batches):
+                embeddings.extend(batch_embeddings)
+        return embeddings
+
+    def _embed_batch(self, texts: List[str]) -> List[List[float]]:
+        """Embed one request-sized batch"""
         response = self.client.embeddings.create(
             input=texts,
             model=self.model
         )
         return [item.embedding for item in response.data]
+
+    def _split_batches(self, texts: List[str]) -> List[List[str]]:
+        """Greedily pack texts into batches under the token and input caps"""
+        batches = []
+        current = []
+        current_tokens = 0
+
+        for text in texts:
+            tokens = self._estimate_tokens(text)
+            if current and (
+                current_tokens + tokens > self.batch_max_tokens
+                or len(current) >= self.batch_max_inputs
+            ):
+                batches.append(current)
+                current = []
+                current_tokens = 0
+            current.append(text)
+            current_tokens += tokens
+
+        if current:
+            batches.append(current)
+        return batches
+
+    def _estimate_tokens(self, text: str) -> int:
+        """Conservative token estimate: ~1 token per 3 UTF-8 bytes"""
+        # Over-counts English (~4 bytes/token) and matches CJK (3 bytes/char)
+        return max(1, len(text.encode('utf-8')) // 3)
@@ -0,0 +1,140 @@
+"""Shared, connection-pooled HTTP transport for the OpenAI, Anthropic and Qdrant clients."""
+import threading
+import httpx
+from typing import Dict, Optional
+from backend.config import get_settings
+
+try:
+    import h2  # noqa: F401  (enables httpx HTTP/2 support)
+    HTTP2_AVAILABLE = True
+except ImportError:  # optional dependency
+    HTTP2_AVAILABLE = False
+
+
+def build_limits() -> httpx.Limits:
+    """Connection pool limits from Settings."""
+    settings = get_settings()
+    return httpx.Limits(
+        max_connections=settings.http_max_connections,
+        max_keepalive_connections=settings.http_max_keepalive_connections,
+        keepalive_expiry=settings.http_keepalive_expiry
+    )
+
+
+def build_timeout() -> httpx.Timeout:
+    """Request timeouts from Settings."""
+    settings = get_settings()
+    return httpx.Timeout(
+        settings.http_read_timeout,
+        connect=settings.http_connect_timeout,
+        pool=settings.http_pool_timeout
+    )
+
+
+def http2_enabled() -> bool:
+    """HTTP/2 is used when configured and the h2 package is installed."""
+    return get_settings().http_http2 and HTTP2_AVAILABLE
+
+
+def pool_stats_for(client) -> Dict:
+    """
+    Snapshot of an httpx client's connection pool.
+
+    Args:
+        client: httpx.Client or httpx.AsyncClient
+
+    Returns:
+        Dict with connections, active, idle and queued request counts
+    """
+    try:
+        pool = client._transport._pool
+        connections = list(pool.connections)
+        idle = sum(1 for conn in connections if conn.is_idle())
+        active = len(connections) - idle
+        requests = len(getattr(pool, '_requests', []))
+        return {
+            'connections': len(connections),
+            'active': active,
+            'idle': idle,
+            'queued_requests': max(requests - active, 0),
+            'max_connections': pool._max_connections,
+            'max_keepalive_connections': pool._max_keepalive_connections,
+            'http2': pool._http2
+        }
+    except AttributeError:
+        # httpx/httpcore internals changed or a custom transport is in use
+        return {'available': False}
+
+
+class HTTPTransport:
+    """Lazily built, process-wide sync and async httpx clients."""
+
+    def __init__(self):
+        self._client: Optional[httpx.Client] = None
+        self._async_client: Optional[httpx.AsyncClient] = None
+        self._lock = threading.Lock()
+
+    @property
+    def client(self) -> httpx.Client:
+        """Shared synchronous client (keep-alive pool)."""
+        if self._client is None:
+            with self._lock:
+                if self._client is None:
+                    self._client = httpx.Client(
+                        limits=build_limits(),
+                        timeout=build_timeout(),
+                        http2=http2_enabled()
+                    )
+        return self._client
+
+    @property
+    def async_client(self) -> httpx.AsyncClient:
+        """Shared asynchronous client (keep-alive pool)."""
+        if self._async_client is None:
+            with self._lock:
+                if self._async_client is None:
+                    self._async_client = httpx.AsyncClient(
+                        limits=build_limits(),
+                        timeout=build_timeout(),
+                        http2=http2_enabled()
+                    )
+        return self._async_client
+
+    def pool_stats(self) -> Dict:
+        """Pool statistics of the clients built so far."""
+        stats = {}
+        if self._client is not None:
+            stats['sync'] = pool_stats_for(self._client)
+        if self._async_client is not None:
+            stats['async'] = pool_stats_for(self._async_client)
+        return stats
+
+    async def aclose(self) -> None:
+        """Close both clients; they are rebuilt on next use."""
+        with self._lock:
+            client, self._client = self._client, None
+            async_client, self._async_client = self._async_client, None
+        if client is not None:
+            client.close()
+        if async_client is not None:
+            await async_client.aclose()
+
+
+# Global singleton instance
+_http_transport: Optional[HTTPTransport] = None
+_http_transport_lock = threading.Lock()
+
+
+def get_http_transport() -> HTTPTransport:
+    """
+    Get the global HTTP transport (thread-safe singleton pattern).
+
+    Returns:
+        HTTPTransport instance
+    """
+    global _http_transport
+    if _http_transport is None:
+        with _http_transport_lock:
+            if _http_transport is None:
+                _http_transport = HTTPTransport()
+    return _http_transport
@@ -1,40 +1,63 @@
 # backend/main.py
 from fastapi import FastAPI, UploadFile, File, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import StreamingResponse
 from backend.models import (
     UploadResponse,
+    AsyncUploadResponse,
     QuestionRequest,
     AnswerResponse,
     FeedbackRequest,
     HealthResponse
 )
 from backend.routers import tasks
+from backend.tasks.pdf_tasks import process_pdf_task
+from backend.container import get_container
+from backend.services.sparse_retrieval import get_sparse_retriever
+from contextlib import asynccontextmanager
 import uuid
 import os
+import json
 import shutil
 
-# 延迟导入,避免在测试时需要所有依赖
+# 服务实例由容器在首次使用时创建并复用 (服务类在容器内按需导入);
+# 测试通过 patch 下列 get_* 函数替换服务
 def get_pipeline():
-    from backend.pipeline import PDFPipeline
-    return PDFPipeline()
+    return get_container().pipeline
 
 def get_retrieval_service():
-    from backend.retrieval import RetrievalService
-    return RetrievalService()
+    return get_container().retrieval_service
 
 def get_qa_service():
-    from backend.qa_service import QAService
-    return QAService()
+    return get_container().qa_service
+
+def get_answer_cache():
+    """语义答案缓存,未启用时返回 None"""
+    from backend.config import get_settings
+    if not get_settings().semantic_cache_enabled:
+        return None
+    from backend.services.semantic_cache import get_semantic_cache
+    return get_semantic_cache()
 
 def get_suggester():
-    from backend.suggestions import QuestionSuggester
-    return QuestionSuggester()
+    return get_container().suggester
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """启动时预建服务实例,关闭时释放连接池"""
+    container = get_container()
+    container.warm_up()
+    get_sparse_retriever().warm_up()
+    yield
+    await container.aclose()
 
 
 app = FastAPI(
     title="AI PDF Chat API",
     description="智能PDF问答系统 - 上传PDF并通过自然语言提问",
-    version="0.1.0"
+    version="0.1.0",
+    lifespan=lifespan
 )
 
 # CORS中间件配置
@@ -64,6 +87,31 @@ async def health_check():
     return {"status": "healthy"}
 
 
+@app.get("/health/pools")
+async def connection_pool_stats():
+    """
+    HTTP 连接池统计 (OpenAI/Anthropic 共享池 + Qdrant),用于调优池大小
+
+    Returns:
+        各连接池的连接数、活跃/空闲数和排队请求数
+    """
+    return get_container().pool_stats()
+
+
+@app.get("/health/semantic-cache")
+async def semantic_cache_stats():
+    """
+    语义答案缓存统计 (本进程),用于调优相似度阈值和容量
+
+    Returns:
+        命中/未命中次数、命中率、条目数和 PDF 数;未启用时仅返回 enabled=False
+    """
+    answer_cache = get_answer_cache()
+    if answer_cache is None:
+        return {"enabled": False}
+    return {"enabled": True, **answer_cache.stats()}
+
+
 @app.post("/upload", response_model=UploadResponse)
 async def upload_pdf(file: UploadFile = File(...)):
     """
@@ -78,26 +126,7 @@ async def upload_pdf(file: UploadFile = File(...)):
     Raises:
         HTTPException: 文件类型错误或处理失败
     """
-    # 验证文件类型
-    if not file.filename.endswith('.pdf'):
-        raise HTTPException(
-            status_code=400,
-            detail="只支持PDF文件。请上传.pdf格式的文件。"
-        )
-
-    # 生成唯一ID
-    pdf_id = str(uuid.uuid4())
-
-    # 保存文件
-    file_path = os.path.join(UPLOAD_DIR, f"{pdf_id}.pdf")
-    try:
-        with open(file_path, "wb") as buffer:
-            shutil.copyfileobj(file.file, buffer)
-    except Exception as e:
-        raise HTTPException(
-            status_code=500,
-            detail=f"文件保存失败: {str(e)}"
-        )
+    pdf_id, file_path = _save_upload(file)
 
     # 处理PDF
     try:
@@ -126,6 +155,79 @@ async def upload_pdf(file: UploadFile = File(...)):
         )
 
 
+@app.post("/upload/async", response_model=AsyncUploadResponse, status_code=202)
+async def upload_pdf_async(file: UploadFile = File(...)):
+    """
+    上传PDF并提交后台处理任务,立即返回
+
+    文件保存后由 Celery 的 process_pdf_task 完成抽取、分块、向量化和索引,
+    客户端通过 /tasks/{task_id} 查询进度。
+
+    Args:
+        file: 上传的PDF文件
+
+    Returns:
+        pdf_id、task_id 和任务状态查询地址
+
+    Raises:
+        HTTPException: 文件类型错误、保存失败或任务提交失败
+    """
+    pdf_id, file_path = _save_upload(file)
+
+    try:
+        # Worker 可能运行在其他目录,传绝对路径
+        result = process_pdf_task.delay(os.path.abspath(file_path), pdf_id, index_vectors=True)
+    except Exception as e:
+        if os.path.exists(file_path):
+            os.remove(file_path)
+        raise HTTPException(
+            status_code=503,
+            detail=f"提交处理任务失败: {str(e)}"
+        )
+
+    return AsyncUploadResponse(
+        status="queued",
+        pdf_id=pdf_id,
+        filename=file.filename,
+        task_id=result.id,
+        status_url=f"/tasks/{result.id}"
+    )
+
+
+def _save_upload(file: UploadFile):
+    """
+    校验文件类型并保存到上传目录
+
+    Returns:
+        (pdf_id, file_path)
+
+    Raises:
+        HTTPException: 文件类型错误或保存失败
+    """
+    # 验证文件类型
+    if not file.filename.endswith('.pdf'):
+        raise HTTPException(
+            status_code=400,
+            detail="只支持PDF文件。请上传.pdf格式的文件。"
+        )
+
+    # 生成唯一ID
+    pdf_id = str(uuid.uuid4())
+
+    # 保存文件
+    file_path = os.path.join(UPLOAD_DIR, f"{pdf_id}.pdf")
+    try:
+        with open(file_path, "wb") as buffer:
+            shutil.copyfileobj(file.file, buffer)
+    except Exception as e:
+        raise HTTPException(
+            status_code=500,
+            detail=f"文件保存失败: {str(e)}"
+        )
+
+    return pdf_id, file_path
+
+
 @app.post("/chat", response_model=AnswerResponse)
 async def ask_question(request: QuestionRequest):
     """
@@ -141,12 +243,23 @@ async def ask_question(request: QuestionRequest):
         HTTPException: PDF不存在或未找到相关内容
     """
     try:
-        # 检索相关内容块
         retrieval_service = get_retrieval_service()
-        chunks = retrieval_service.retrieve(
+        answer_cache = get_answer_cache()
+
+        # 语义缓存: 相近的问题直接复用已有答案,跳过检索和 LLM 调用
+        question_embedding = None
+        if answer_cache is not None:
+            question_embedding = await retrieval_service.embedding_service.aget_embedding(request.question)
+            cached_answer = await answer_cache.alookup(request.pdf_id, question_embedding)
+            if cached_answer is not None:
+                return AnswerResponse(**cached_answer)
+
+        # 检索相关内容块
+        chunks = await retrieval_service.aretrieve(
             question=request.question,
             pdf_id=request.pdf_id,
-            k=5
+            k=5,
+            question_embedding=question_embedding
         )
 
         if not chunks:
@@ -157,19 +270,75 @@ async def ask_question(request: QuestionRequest):
 
         # 生成答案
         qa_service = get_qa_service()
-        answer = qa_service.answer(request.question, chunks)
+        answer = await qa_service.aanswer(request.question, chunks)
 
-        return AnswerResponse(
+        response = AnswerResponse(
             answer=answer['answer'],
             cited_pages=answer['cited_pages'],
-            sources=[
-                {
-                    'page': c['page'],
-                    'text': c['text'][:200] + ('...' if len(c['text']) > 200 else '')
-                }
-                for c in chunks
-            ]
+            sources=_format_sources(chunks)
+        )
+
+        if answer_cache is not None:
+            await answer_cache.astore(request.pdf_id, question_embedding, response.model_dump())
+
+        return response
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(
+            status_code=500,
+            detail=f"生成答案时发生错误: {str(e)}"
+        )
+
+
+@app.post("/chat/stream")
+async def ask_question_stream(request: QuestionRequest):
+    """
+    对PDF提问,以 Server-Sent Events 流式返回答案
+
+    事件:
+        token: {"text": 增量文本}
+        done:  {"answer", "cited_pages", "sources"} (最后一个事件)
+        error: {"detail": 错误信息}
+
+    Args:
+        request: 包含pdf_id和问题的请求
+
+    Returns:
+        text/event-stream 响应
+
+    Raises:
+        HTTPException: PDF不存在或未找到相关内容
+    """
+    answer_cache = get_answer_cache()
+    question_embedding = None
+    try:
+        retrieval_service = get_retrieval_service()
+
+        if answer_cache is not None:
+            question_embedding = await retrieval_service.embedding_service.aget_embedding(request.question)
+            cached_answer = await answer_cache.alookup(request.pdf_id, question_embedding)
+            if cached_answer is not None:
+                events = [
+                    _sse('token', {'text': cached_answer['answer']}),
+                    _sse('done', cached_answer)
+                ]
+                return _event_stream_response(iter(events))
+
+        chunks = await retrieval_service.aretrieve(
+            question=request.question,
+            pdf_id=request.pdf_id,
+            k=5,
+            question_embedding=question_embedding
         )
+
+        if not chunks:
+            raise HTTPException(
+                status_code=404,
+                detail="未找到相关内容。请确认PDF已上传并尝试换个问题。"
+            )
+
+        qa_service = get_qa_service()
     except HTTPException:
         raise
     except Exception as e:
@@ -178,6 +347,53 @@ async def ask_question(request: QuestionRequest):
             detail=f"生成答案时发生错误: {str(e)}"
         )
 
+    sources = _format_sources(chunks)
+
+    async def event_stream():
+        try:
+            async for event in qa_service.astream_answer(request.question, chunks):
+                if event['type'] == 'token':
+                    yield _sse('token', {'text': event['text']})
+                    continue
+
+                final = {
+                    'answer': event['answer'],
+                    'cited_pages': event['cited_pages'],
+                    'sources': sources
+                }
+                if answer_cache is not None:
+                    await answer_cache.astore(request.pdf_id, question_embedding, final)
+                yield _sse('done', final)
+        except Exception as e:
+            yield _sse('error', {'detail': f"生成答案时发生错误: {str(e)}"})
+
+    return _event_stream_response(event_stream())
+
+
+def _format_sources(chunks):
+    """来源片段: 页码 + 前200字"""
+    return [
+        {
+            'page': c['page'],
+            'text': c['text'][:200] + ('...' if len(c['text']) > 200 else '')
+        }
+        for c in chunks
+    ]
+
+
+def _sse(event: str, data: dict) -> str:
+    """格式化一个 SSE 事件"""
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+
+def _event_stream_response(events) -> StreamingResponse:
+    """SSE 响应,关闭代理缓冲以便逐条推送"""
+    return StreamingResponse(
+        events,
+        media_type="text/event-stream",
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    )
+
 
 @app.get("/")
 async def root():
@@ -11,6 +11,15 @@ class UploadResponse(BaseModel):
     page_count: int
 
 
+class AsyncUploadResponse(BaseModel):
+    """异步上传响应模型 (处理在后台任务中进行)"""
+    status: str
+    pdf_id: str
+    filename: str
+    task_id: str
+    status_url: str
+
+
 class QuestionRequest(BaseModel):
     """问答请求模型"""
     pdf_id: str
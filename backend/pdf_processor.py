@@ -1,27 +1,102 @@
 # backend/pdf_processor.py
 from PyPDF2 import PdfReader
-from typing import List, Dict
+from concurrent.futures import ProcessPoolExecutor
+from typing import List, Dict, Iterator, Optional, Tuple
+import multiprocessing
+import os
 import re
+from backend.config import get_settings
+
+settings = get_settings()
+
+
+def _extract_page_range(pdf_path: str, start: int, end: int) -> List[Dict]:
+    """Worker entry point: open the PDF and extract pages [start, end)"""
+    # PdfReader objects are not picklable, so every worker opens its own reader
+    reader = PdfReader(pdf_path)
+    return PDFProcessor()._extract_range(reader, start, end)
+
 
 class PDFProcessor:
-    def extract_pages(self, pdf_path: str) -> List[Dict]:
-        """Extract text from PDF page by page"""
+    def __init__(self, max_workers: Optional[int] = None):
+        if max_workers is None:
+            max_workers = settings.pdf_extract_workers
+        self.max_workers = max_workers or os.cpu_count() or 1
+        self.parallel_min_pages = settings.pdf_parallel_min_pages
+
+    def extract_pages(self, pdf_path: str, max_workers: Optional[int] = None) -> List[Dict]:
+        """Extract text from PDF page by page, in parallel for large documents"""
         reader = PdfReader(pdf_path)
+        page_count = len(reader.pages)
+        workers = min(max_workers or self.max_workers, page_count)
+
+        if workers <= 1 or page_count < self.parallel_min_pages or self._in_daemon_process():
+            return self._extract_range(reader, 0, page_count)
+
+        # Split into more shards than workers so uneven pages balance out
+        ranges = self._split_page_ranges(page_count, workers * 4)
         pages = []
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            # executor.map yields results in submission order
+            for shard in executor.map(
+                _extract_page_range,
+                [pdf_path] * len(ranges),
+                [start for start, _ in ranges],
+                [end for _, end in ranges]
+            ):
+                pages.extend(shard)
+
+        return pages
 
-        for page_num, page in enumerate(reader.pages, start=1):
-            text = page.extract_text()
+    def extract_page_range(self, pdf_path: str, start: int, end: int) -> List[Dict]:
+        """Extract pages [start, end) only (0-based indexes), serially"""
+        return _extract_page_range(pdf_path, start, end)
+
+    def page_ranges(self, pdf_path: str, pages_per_range: int) -> List[Tuple[int, int]]:
+        """Split the document into contiguous ranges of about pages_per_range pages"""
+        page_count = len(PdfReader(pdf_path).pages)
+        shards = -(-page_count // max(pages_per_range, 1))
+        return self._split_page_ranges(page_count, shards) if page_count else []
+
+    def iter_pages(self, pdf_path: str) -> Iterator[Dict]:
+        """Yield extracted pages one at a time, in page order"""
+        reader = PdfReader(pdf_path)
+        for index in range(len(reader.pages)):
+            yield from self._extract_range(reader, index, index + 1)
+
+    def _extract_range(self, reader: PdfReader, start: int, end: int) -> List[Dict]:
+        """Extract pages [start, end) from an open reader (0-based indexes)"""
+        pages = []
+
+        for index in range(start, end):
+            text = reader.pages[index].extract_text()
             # Clean up text
             text = self._clean_text(text)
 
             pages.append({
-                'page_num': page_num,
+                'page_num': index + 1,
                 'text': text,
                 'char_count': len(text)
             })
 
         return pages
 
+    def _split_page_ranges(self, page_count: int, shards: int) -> List[Tuple[int, int]]:
+        """Split [0, page_count) into contiguous, near-equal ranges"""
+        shards = max(1, min(shards, page_count))
+        size, remainder = divmod(page_count, shards)
+        ranges = []
+        start = 0
+        for i in range(shards):
+            end = start + size + (1 if i < remainder else 0)
+            ranges.append((start, end))
+            start = end
+        return ranges
+
+    def _in_daemon_process(self) -> bool:
+        """Daemonic processes (e.g. Celery prefork children) cannot spawn a pool"""
+        return multiprocessing.current_process().daemon
+
     def _clean_text(self, text: str) -> str:
         """Clean extracted text"""
         # Remove excessive whitespace
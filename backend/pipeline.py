@@ -1,34 +1,52 @@
 from backend.pdf_processor import PDFProcessor
 from backend.embeddings import EmbeddingService
 from backend.vector_store import VectorStore
-from typing import Dict
+from backend.config import get_settings
+from backend.services.semantic_cache import get_semantic_cache
+from backend.services.sparse_retrieval import get_sparse_retriever
+from typing import Dict, Iterable, Iterator, List, Optional
+
+settings = get_settings()
 
 
 class PDFPipeline:
-    def __init__(self):
+    def __init__(
+        self,
+        embedding_service: Optional[EmbeddingService] = None,
+        vector_store: Optional[VectorStore] = None
+    ):
         self.pdf_processor = PDFProcessor()
-        self.embedding_service = EmbeddingService()
-        self.vector_store = VectorStore()
+        self.embedding_service = embedding_service or EmbeddingService()
+        self.vector_store = vector_store or VectorStore()
+        self.sparse_retriever = get_sparse_retriever()
+
+    def process_pdf(self, pdf_path: str, pdf_id: str, streaming: bool = False) -> Dict:
+        """Full pipeline: extract -> chunk -> BM25 index -> embed -> store"""
+        if streaming:
+            return self.process_pdf_streaming(pdf_path, pdf_id)
 
-    def process_pdf(self, pdf_path: str, pdf_id: str) -> Dict:
-        """Full pipeline: extract -> chunk -> embed -> store"""
         try:
             # 1. Extract text from PDF
             pages = self.pdf_processor.extract_pages(pdf_path)
 
-            # 2. Smart chunking
-            chunks = self.pdf_processor.smart_chunking(pages)
+            # 2. Smart chunking (IDs are shared by the BM25 index and the vector store)
+            chunks = self._assign_ids(self.pdf_processor.smart_chunking(pages), pdf_id)
 
-            # 3. Generate embeddings
+            # 3. Build the BM25 index
+            self.sparse_retriever.index_document(pdf_id, chunks)
+
+            # 4. Generate embeddings
             texts = [chunk['text'] for chunk in chunks]
             embeddings = self.embedding_service.get_embeddings_batch(texts)
 
-            # 4. Add embeddings to chunks
-            for chunk, embedding in zip(chunks, embeddings):
-                chunk['embedding'] = embedding
-
             # 5. Store in vector database
-            self.vector_store.add_chunks(pdf_id, chunks)
+            self.vector_store.add_chunks(pdf_id, [
+                {**chunk, 'embedding': embedding}
+                for chunk, embedding in zip(chunks, embeddings)
+            ])
+
+            # 6. Cached answers refer to the previous index
+            get_semantic_cache().invalidate(pdf_id)
 
             return {
                 'success': True,
@@ -41,3 +59,83 @@ class PDFPipeline:
                 'success': False,
                 'error': str(e)
             }
+
+    def process_pdf_streaming(
+        self,
+        pdf_path: str,
+        pdf_id: str,
+        batch_size: Optional[int] = None
+    ) -> Dict:
+        """
+        Streaming pipeline: extract, chunk, embed and store in bounded windows.
+
+        Only one window of chunks and embeddings is held at a time, so memory
+        stays flat with document size and early chunks become searchable
+        before the rest of the file is processed.
+        """
+        batch_size = batch_size or settings.pipeline_stream_batch_size
+        stats = {'pages': 0, 'chunks': 0, 'batches': 0}
+
+        try:
+            # Cached answers refer to the previous index
+            get_semantic_cache().invalidate(pdf_id)
+
+            pages = self._count_pages(self.pdf_processor.iter_pages(pdf_path), stats)
+            for window in self._iter_chunk_windows(pages, batch_size):
+                window = self._assign_ids(window, pdf_id, start=stats['chunks'])
+
+                # The first window replaces any previous BM25 index, later ones extend it
+                if stats['batches'] == 0:
+                    self.sparse_retriever.index_document(pdf_id, window)
+                else:
+                    self.sparse_retriever.add_chunks(pdf_id, window)
+
+                texts = [chunk['text'] for chunk in window]
+                embeddings = self.embedding_service.get_embeddings_batch(texts)
+
+                self.vector_store.add_chunks(pdf_id, [
+                    {**chunk, 'embedding': embedding}
+                    for chunk, embedding in zip(window, embeddings)
+                ])
+                stats['chunks'] += len(window)
+                stats['batches'] += 1
+
+            return {
+                'success': True,
+                'pdf_id': pdf_id,
+                'chunks_created': stats['chunks'],
+                'pages_processed': stats['pages'],
+                'batches_upserted': stats['batches']
+            }
+        except Exception as e:
+            return {
+                'success': False,
+                'error': str(e),
+                'chunks_created': stats['chunks']
+            }
+
+    @staticmethod
+    def _assign_ids(chunks: List[Dict], pdf_id: str, start: int = 0) -> List[Dict]:
+        """Give chunks the IDs used by both the BM25 index and the vector store"""
+        return [
+            {**chunk, 'id': f"{pdf_id}_chunk_{start + idx}"}
+            for idx, chunk in enumerate(chunks)
+        ]
+
+    def _iter_chunk_windows(self, pages: Iterable[Dict], batch_size: int) -> Iterator[List[Dict]]:
+        """Chunk pages lazily and group the chunks into windows of batch_size"""
+        window = []
+        for page in pages:
+            window.extend(self.pdf_processor.smart_chunking([page]))
+            while len(window) >= batch_size:
+                yield window[:batch_size]
+                window = window[batch_size:]
+
+        if window:
+            yield window
+
+    def _count_pages(self, pages: Iterable[Dict], stats: Dict) -> Iterator[Dict]:
+        """Pass pages through while counting them"""
+        for page in pages:
+            stats['pages'] += 1
+            yield page
@@ -1,6 +1,7 @@
-from anthropic import Anthropic
-from typing import List, Dict
+from anthropic import Anthropic, AsyncAnthropic
+from typing import List, Dict, AsyncIterator
 from backend.config import get_settings
+from backend.http_transport import get_http_transport
 import re
 
 settings = get_settings()
@@ -8,9 +9,24 @@ settings = get_settings()
 
 class QAService:
     def __init__(self):
-        self.client = Anthropic(api_key=settings.anthropic_api_key)
+        # Shared keep-alive pools; the transport owns (and closes) them
+        self._owns_http_clients = not settings.http_shared_transport
+        if settings.http_shared_transport:
+            transport = get_http_transport()
+            self.client = Anthropic(api_key=settings.anthropic_api_key, http_client=transport.client)
+            self.async_client = AsyncAnthropic(api_key=settings.anthropic_api_key, http_client=transport.async_client)
+        else:
+            self.client = Anthropic(api_key=settings.anthropic_api_key)
+            self.async_client = AsyncAnthropic(api_key=settings.anthropic_api_key)
         self.model = "claude-sonnet-4-20250514"
 
+    async def aclose(self):
+        """Release pooled HTTP connections of both clients"""
+        if not self._owns_http_clients:
+            return
+        self.client.close()
+        await self.async_client.close()
+
     def answer(self, question: str, chunks: List[Dict]) -> Dict:
         """Generate answer with forced citations"""
         # Build context from chunks
@@ -41,6 +57,62 @@ class QAService:
             'model': self.model
         }
 
+    async def aanswer(self, question: str, chunks: List[Dict]) -> Dict:
+        """Generate answer with forced citations without blocking the event loop"""
+        context = self._build_context(chunks)
+        system_prompt = self._get_system_prompt()
+        user_prompt = self._build_user_prompt(question, context)
+
+        response = await self.async_client.messages.create(
+            model=self.model,
+            max_tokens=1024,
+            system=system_prompt,
+            messages=[
+                {"role": "user", "content": user_prompt}
+            ]
+        )
+
+        answer_text = response.content[0].text
+
+        return {
+            'answer': answer_text,
+            'cited_pages': self._extract_cited_pages(answer_text),
+            'model': self.model
+        }
+
+    async def astream_answer(self, question: str, chunks: List[Dict]) -> AsyncIterator[Dict]:
+        """
+        Stream the answer as Claude generates it, without blocking the event loop.
+
+        Yields {'type': 'token', 'text': ...} for every text delta, then one
+        {'type': 'done', 'answer', 'cited_pages', 'model'} built from the
+        accumulated text.
+        """
+        context = self._build_context(chunks)
+        system_prompt = self._get_system_prompt()
+        user_prompt = self._build_user_prompt(question, context)
+
+        parts = []
+        async with self.async_client.messages.stream(
+            model=self.model,
+            max_tokens=1024,
+            system=system_prompt,
+            messages=[
+                {"role": "user", "content": user_prompt}
+            ]
+        ) as stream:
+            async for text in stream.text_stream:
+                parts.append(text)
+                yield {'type': 'token', 'text': text}
+
+        answer_text = ''.join(parts)
+        yield {
+            'type': 'done',
+            'answer': answer_text,
+            'cited_pages': self._extract_cited_pages(answer_text),
+            'model': self.model
+        }
+
     def _get_system_prompt(self) -> str:
         return """你是一个专业的PDF文档助手。
 
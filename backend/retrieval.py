@@ -1,18 +1,29 @@
 from backend.embeddings import EmbeddingService
 from backend.vector_store import VectorStore
-from typing import List, Dict
+from typing import List, Dict, Optional
 import re
 
 
 class RetrievalService:
-    def __init__(self):
-        self.embedding_service = EmbeddingService()
-        self.vector_store = VectorStore()
+    def __init__(
+        self,
+        embedding_service: Optional[EmbeddingService] = None,
+        vector_store: Optional[VectorStore] = None
+    ):
+        self.embedding_service = embedding_service or EmbeddingService()
+        self.vector_store = vector_store or VectorStore()
 
-    def retrieve(self, question: str, pdf_id: str, k: int = 5) -> List[Dict]:
+    def retrieve(
+        self,
+        question: str,
+        pdf_id: str,
+        k: int = 5,
+        question_embedding: Optional[List[float]] = None
+    ) -> List[Dict]:
         """Retrieve relevant chunks for question"""
-        # 1. Get question embedding
-        question_embedding = self.embedding_service.get_embedding(question)
+        # 1. Get question embedding (callers may pass one they already computed)
+        if question_embedding is None:
+            question_embedding = self.embedding_service.get_embedding(question)
 
         # 2. Vector search
         search_results = self.vector_store.search(
@@ -21,6 +32,29 @@ class RetrievalService:
             limit=k * 2  # Get more for potential reranking
         )
 
+        return self._format_results(question, search_results, k)
+
+    async def aretrieve(
+        self,
+        question: str,
+        pdf_id: str,
+        k: int = 5,
+        question_embedding: Optional[List[float]] = None
+    ) -> List[Dict]:
+        """Retrieve relevant chunks for question using the async clients"""
+        if question_embedding is None:
+            question_embedding = await self.embedding_service.aget_embedding(question)
+
+        search_results = await self.vector_store.asearch(
+            query_vector=question_embedding,
+            pdf_id=pdf_id,
+            limit=k * 2
+        )
+
+        return self._format_results(question, search_results, k)
+
+    def _format_results(self, question: str, search_results, k: int) -> List[Dict]:
+        """Format search hits and boost pages mentioned in the question"""
         # 3. Check for page number mention
         page_num = self._extract_page_number(question)
 
@@ -30,6 +64,7 @@ class RetrievalService:
             results.append({
                 'text': result.payload['text'],
                 'page': result.payload['page_num'],
+                'page_end': result.payload.get('page_end', result.payload['page_num']),
                 'score': result.score,
                 'chunk_id': result.payload['chunk_id']
             })
@@ -48,7 +83,10 @@ class RetrievalService:
         return None
 
     def _boost_page_results(self, results: List[Dict], page_num: int) -> List[Dict]:
-        """Move results from specific page to top"""
-        page_results = [r for r in results if r['page'] == page_num]
-        other_results = [r for r in results if r['page'] != page_num]
+        """Move results whose page span covers a specific page to top"""
+        def on_page(r):
+            return r['page'] <= page_num <= r.get('page_end', r['page'])
+
+        page_results = [r for r in results if on_page(r)]
+        other_results = [r for r in results if not on_page(r)]
         return page_results + other_results
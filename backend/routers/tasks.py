@@ -1,9 +1,13 @@
 """Task management API endpoints."""
+import asyncio
+import json
 from fastapi import APIRouter
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
 from typing import Optional, Dict, Any
 from backend.tasks.pdf_tasks import process_pdf_task
 from backend.celery_app import celery_app
+from backend.services.task_events import TERMINAL_STATES, subscribe_task_events
 
 
 router = APIRouter(prefix="/tasks", tags=["tasks"])
@@ -88,3 +92,43 @@ async def get_task_status(task_id: str):
         response.result = result.info if result.info else None
 
     return response
+
+
+@router.get("/{task_id}/events")
+async def stream_task_events(task_id: str):
+    """
+    Stream task progress as Server-Sent Events.
+
+    The current state is sent first, then every update the worker publishes
+    over Redis pub/sub, until the task succeeds or fails. Replaces polling
+    GET /tasks/{task_id}.
+
+    Args:
+        task_id: Unique task identifier
+
+    Returns:
+        text/event-stream of `progress` events and a final `done` event
+    """
+    async def snapshot():
+        result = celery_app.AsyncResult(task_id)
+        state, info = await asyncio.to_thread(lambda: (result.state, result.info))
+        if isinstance(info, Exception):
+            info = {'error': str(info)}
+        return {'state': state, 'result': info}
+
+    async def event_stream():
+        async for event in subscribe_task_events(task_id, snapshot):
+            if event is None:
+                # Comment line keeps proxies from closing an idle stream
+                yield ": keep-alive\n\n"
+                continue
+            name = 'done' if event['state'] in TERMINAL_STATES else 'progress'
+            data = json.dumps({'task_id': task_id, 'status': event['state'], 'result': event['result']},
+                              ensure_ascii=False, default=str)
+            yield f"event: {name}\ndata: {data}\n\n"
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
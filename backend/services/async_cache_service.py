@@ -0,0 +1,328 @@
+"""Asyncio-native Redis cache service for FastAPI handlers."""
+import asyncio
+import json
+import threading
+import uuid
+import redis
+import redis.asyncio as aioredis
+from functools import wraps
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+from backend.config import get_settings
+from backend.services.cache_codecs import (
+    decode_value,
+    encode_value,
+    get_codec,
+    get_compression_id
+)
+from backend.services.cache_service import (
+    _unwrap_entry,
+    _wrap_entry,
+    make_cache_key
+)
+
+
+class AsyncCacheService:
+    """
+    Non-blocking counterpart of CacheService built on redis.asyncio.
+
+    Uses the same codecs and key scheme, so values written by either
+    service can be read by the other. When the L1 tier is enabled, writes
+    and deletes publish the same invalidation messages as CacheService, so
+    synchronous processes evict the affected keys from their L1.
+    """
+
+    # Keys per DEL command when deleting in bulk
+    DELETE_BATCH_SIZE = 500
+
+    def __init__(self):
+        """Create the Redis client (connections are opened lazily on first use)."""
+        settings = get_settings()
+        self.redis = aioredis.Redis(
+            host=settings.redis_host,
+            port=settings.redis_port,
+            db=settings.redis_db,
+            password=getattr(settings, 'redis_password', None),
+            decode_responses=False,
+            socket_connect_timeout=5,
+            socket_timeout=5
+        )
+        self.codec = get_codec(settings.cache_codec)
+        self.compression_id = get_compression_id(settings.cache_compression)
+        self.compress_min_bytes = settings.cache_compress_min_bytes
+
+        # This service has no L1 itself, but CacheService instances may
+        self.invalidation_channel = settings.cache_invalidation_channel
+        self.publish_invalidations = settings.cache_l1_enabled
+        self._instance_id = uuid.uuid4().hex
+
+    async def ping(self) -> None:
+        """
+        Check the Redis connection.
+
+        Raises:
+            ConnectionError: If Redis is unreachable
+        """
+        try:
+            await self.redis.ping()
+        except redis.ConnectionError as e:
+            raise ConnectionError(f"Failed to connect to Redis: {e}")
+
+    async def set(self, key: str, value: Any, ttl: int = 3600) -> None:
+        """
+        Set a value in cache with TTL.
+
+        Args:
+            key: Cache key
+            value: Value to cache (serialized with the configured codec)
+            ttl: Time to live in seconds (default: 1 hour)
+
+        Raises:
+            redis.RedisError: If Redis operation fails
+        """
+        try:
+            await self.redis.setex(key, ttl, self._encode(value))
+            await self._publish_invalidation(keys=[key])
+        except redis.RedisError as e:
+            raise redis.RedisError(f"Failed to set cache key '{key}': {e}") from e
+
+    async def get(self, key: str) -> Optional[Any]:
+        """
+        Get a value from cache.
+
+        Args:
+            key: Cache key
+
+        Returns:
+            Deserialized value or None if not found
+
+        Raises:
+            redis.RedisError: If Redis operation fails
+        """
+        try:
+            return decode_value(await self.redis.get(key))
+        except redis.RedisError as e:
+            raise redis.RedisError(f"Failed to get cache key '{key}': {e}") from e
+
+    async def delete(self, key: str) -> None:
+        """
+        Delete a key from cache.
+
+        Args:
+            key: Cache key to delete
+
+        Raises:
+            redis.RedisError: If Redis operation fails
+        """
+        try:
+            await self.redis.delete(key)
+            await self._publish_invalidation(keys=[key])
+        except redis.RedisError as e:
+            raise redis.RedisError(f"Failed to delete cache key '{key}': {e}") from e
+
+    async def get_many(self, keys: List[str]) -> Dict[str, Any]:
+        """
+        Get several values in one MGET round trip.
+
+        Args:
+            keys: Cache keys
+
+        Returns:
+            Dict of key -> deserialized value for the keys that were found
+
+        Raises:
+            redis.RedisError: If Redis operation fails
+        """
+        keys = list(dict.fromkeys(keys))
+        if not keys:
+            return {}
+        try:
+            values = await self.redis.mget(keys)
+        except redis.RedisError as e:
+            raise redis.RedisError(f"Failed to get {len(keys)} cache keys: {e}") from e
+        return {key: decode_value(value) for key, value in zip(keys, values) if value is not None}
+
+    async def set_many(
+        self,
+        mapping: Dict[str, Any],
+        ttl: int = 3600,
+        ttls: Optional[Dict[str, int]] = None
+    ) -> None:
+        """
+        Set several values in one pipelined round trip.
+
+        Args:
+            mapping: Cache key -> value
+            ttl: Default time to live in seconds (default: 1 hour)
+            ttls: Optional per-key TTL overrides
+
+        Raises:
+            redis.RedisError: If Redis operation fails
+        """
+        if not mapping:
+            return
+        ttls = ttls or {}
+        try:
+            pipe = self.redis.pipeline(transaction=False)
+            for key, value in mapping.items():
+                pipe.setex(key, ttls.get(key, ttl), self._encode(value))
+            if self.publish_invalidations:
+                pipe.publish(self.invalidation_channel, self._invalidation_message(keys=list(mapping)))
+            await pipe.execute()
+        except redis.RedisError as e:
+            raise redis.RedisError(f"Failed to set {len(mapping)} cache keys: {e}") from e
+
+    async def clear_pattern(self, pattern: str) -> int:
+        """
+        Clear all keys matching a pattern, deleting in batches as SCAN proceeds.
+
+        Args:
+            pattern: Redis pattern (e.g., "pdf:123:*")
+
+        Returns:
+            Number of keys deleted
+
+        Raises:
+            redis.RedisError: If Redis operation fails
+        """
+        try:
+            deleted = 0
+            batch = []
+            async for key in self.redis.scan_iter(match=pattern, count=100):
+                batch.append(key)
+                if len(batch) >= self.DELETE_BATCH_SIZE:
+                    deleted += await self.redis.delete(*batch)
+                    batch = []
+            if batch:
+                deleted += await self.redis.delete(*batch)
+            await self._publish_invalidation(pattern=pattern)
+            return deleted
+        except redis.RedisError as e:
+            raise redis.RedisError(f"Failed to clear pattern '{pattern}': {e}") from e
+
+    async def close(self) -> None:
+        """Close the connection pool."""
+        await self.redis.aclose()
+
+    async def _publish_invalidation(self, keys: Optional[List[str]] = None, pattern: Optional[str] = None) -> None:
+        """Tell processes with an L1 tier to drop keys (or a pattern)."""
+        if self.publish_invalidations:
+            await self.redis.publish(self.invalidation_channel, self._invalidation_message(keys, pattern))
+
+    def _invalidation_message(self, keys: Optional[List[str]] = None, pattern: Optional[str] = None) -> str:
+        """Same message format as CacheService._publish_invalidation."""
+        return json.dumps({'origin': self._instance_id, 'keys': keys or [], 'pattern': pattern})
+
+    def _encode(self, value: Any) -> bytes:
+        """Serialize a value with the configured codec and compression."""
+        return encode_value(value, self.codec, self.compression_id, self.compress_min_bytes)
+
+    def _make_cache_key(self, prefix: str, func_name: str, args: tuple, kwargs: dict) -> str:
+        """Generate the same cache key as CacheService._make_cache_key."""
+        return make_cache_key(prefix, func_name, args, kwargs)
+
+
+# Global singleton instance with thread-safe initialization
+_async_cache_service_instance: Optional[AsyncCacheService] = None
+_async_cache_lock = threading.Lock()
+
+
+def get_async_cache_service() -> AsyncCacheService:
+    """
+    Get the global async cache service instance (thread-safe singleton pattern).
+
+    Returns:
+        AsyncCacheService instance
+    """
+    global _async_cache_service_instance
+    if _async_cache_service_instance is None:
+        with _async_cache_lock:
+            if _async_cache_service_instance is None:
+                _async_cache_service_instance = AsyncCacheService()
+    return _async_cache_service_instance
+
+
+# In-flight computations per cache key (single-flight within this process)
+_inflight: Dict[str, "asyncio.Future"] = {}
+_refresh_tasks: Dict[str, "asyncio.Task"] = {}
+
+
+async def _store(cache: AsyncCacheService, cache_key: str, result: Any, ttl: int, stale_ttl: int) -> None:
+    """Write a computed result using the same entry format as @cached."""
+    if result is not None:
+        await cache.set(cache_key, _wrap_entry(result, ttl, stale_ttl), ttl=ttl + stale_ttl)
+
+
+def _refresh_done(cache_key: str, task: "asyncio.Task") -> None:
+    """Forget a finished background refresh and report its failure, if any."""
+    _refresh_tasks.pop(cache_key, None)
+    if not task.cancelled() and task.exception() is not None:
+        print(f"[Cache] Background refresh failed for {cache_key}: {task.exception()}")
+
+
+def acached(
+    ttl: int = 3600,
+    key_prefix: str = "",
+    stale_ttl: int = 0,
+    single_flight: bool = True
+) -> Callable:
+    """
+    Decorator for caching results of async functions without blocking the loop.
+
+    Keys and entry format match @cached, so both decorators share entries.
+    Concurrent misses for the same key await one computation, and stale
+    entries (stale_ttl > 0) are served while a background task refreshes them.
+
+    Args:
+        ttl: Time to live in seconds (default: 1 hour)
+        key_prefix: Prefix for cache keys
+        stale_ttl: Seconds an expired value may still be served (0 = off)
+        single_flight: Deduplicate concurrent misses (default: True)
+
+    Returns:
+        Decorated coroutine function with caching
+
+    Example:
+        @acached(ttl=300, key_prefix="qa")
+        async def ask_question(pdf_id: str, question: str):
+            return await expensive_call()
+    """
+    def decorator(func: Callable[..., Awaitable[Any]]) -> Callable[..., Awaitable[Any]]:
+        @wraps(func)
+        async def wrapper(*args, **kwargs):
+            cache = get_async_cache_service()
+            cache_key = cache._make_cache_key(key_prefix, func.__name__, args, kwargs)
+
+            async def compute():
+                result = await func(*args, **kwargs)
+                await _store(cache, cache_key, result, ttl, stale_ttl)
+                return result
+
+            entry = await cache.get(cache_key)
+            if entry is not None:
+                value, fresh = _unwrap_entry(entry)
+                if not fresh and cache_key not in _refresh_tasks:
+                    task = asyncio.create_task(compute())
+                    _refresh_tasks[cache_key] = task
+                    task.add_done_callback(lambda t: _refresh_done(cache_key, t))
+                return value
+
+            if not single_flight:
+                return await compute()
+
+            future = _inflight.get(cache_key)
+            if future is not None:
+                # shield: a cancelled waiter must not cancel the shared computation
+                return await asyncio.shield(future)
+
+            task = asyncio.ensure_future(compute())
+            _inflight[cache_key] = task
+            try:
+                return await asyncio.shield(task)
+            finally:
+                if task.done():
+                    _inflight.pop(cache_key, None)
+                else:
+                    task.add_done_callback(lambda _: _inflight.pop(cache_key, None))
+
+        return wrapper
+    return decorator
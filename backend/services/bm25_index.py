@@ -0,0 +1,1044 @@
+"""
+BM25 持久化索引
+
+倒排索引以 CSR 形式保存 (postings、文档长度、idf),可写入磁盘或 Redis,
+由任意进程惰性加载;磁盘格式支持内存映射,多个 worker 共享同一份页缓存
+"""
+import copy
+import io
+import json
+import os
+import shutil
+import time
+import uuid
+import numpy as np
+from collections import Counter
+from typing import Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+from backend.config import get_settings
+
+
+class BM25Index:
+    """
+    CSR 倒排索引上的 BM25 (Okapi) 打分,参数和 idf 计算与 rank_bm25.BM25Okapi 一致
+
+    词项 t 的 postings 为 doc_ids[indptr[t]:indptr[t+1]] 及对应词频 tfs。
+    支持增量更新: 新增文档写入追加的 postings 段,删除文档只打墓碑标记,
+    文档频率、平均文档长度和 idf 随之更新,无需重建;段过多或墓碑过多时由调用方
+    merge_small_segments() / compact() 合并。磁盘存储按段保存,已写入的段不再重写
+    """
+
+    FORMAT_VERSION = 2
+    # 磁盘格式中每个数组对应一个 .npy 文件
+    ARRAYS = ('indptr', 'doc_ids', 'tfs', 'doc_lengths', 'df', 'idf', 'deleted')
+    # 追加段超过该数量时应合并末尾的小段 (调用方在压缩时检查)
+    MAX_SEGMENTS = 8
+
+    def __init__(
+        self,
+        vocabulary: Dict[str, int],
+        indptr: np.ndarray,
+        doc_ids: np.ndarray,
+        tfs: np.ndarray,
+        doc_lengths: np.ndarray,
+        df: np.ndarray,
+        idf: np.ndarray,
+        k1: float = 1.5,
+        b: float = 0.75,
+        epsilon: float = 0.25,
+        build_id: Optional[str] = None,
+        deleted: Optional[np.ndarray] = None
+    ):
+        self.vocabulary = vocabulary
+        # postings 段列表 [(indptr, doc_ids, tfs), ...],文档下标全局唯一
+        self.segments: List[Tuple[np.ndarray, np.ndarray, np.ndarray]] = [(indptr, doc_ids, tfs)]
+        # 每段包含的文档数 (段按文档下标连续排列) 及已持久化的段 ID (None 表示尚未写入)
+        self.segment_sizes: List[int] = [len(doc_lengths)]
+        self.segment_ids: List[Optional[str]] = [None]
+        self.doc_lengths = doc_lengths
+        self.df = df
+        self.idf = idf
+        self.k1 = k1
+        self.b = b
+        self.epsilon = epsilon
+        self.build_id = build_id or uuid.uuid4().hex
+        # 墓碑标记: 已删除的文档下标保留,打分时跳过
+        self.deleted = deleted if deleted is not None else np.zeros(len(doc_lengths), dtype=bool)
+
+        self.num_deleted = int(np.count_nonzero(self.deleted))
+        self.total_length = int(doc_lengths[~self.deleted].sum()) if self.num_deleted else int(doc_lengths.sum())
+        self._length_norm: Optional[np.ndarray] = None
+
+    def copy(self) -> "BM25Index":
+        """
+        写时复制用的浅拷贝: 词表和段列表复制,数组共享
+
+        增量更新总是替换数组而不原地修改,在副本上更新后整体替换引用,
+        正在其他线程打分的读者看到的旧对象保持一致
+        """
+        clone = copy.copy(self)
+        clone.vocabulary = dict(self.vocabulary)
+        clone.segments = list(self.segments)
+        clone.segment_sizes = list(self.segment_sizes)
+        clone.segment_ids = list(self.segment_ids)
+        return clone
+
+    @property
+    def num_slots(self) -> int:
+        """文档下标总数 (含已删除)"""
+        return len(self.doc_lengths)
+
+    @property
+    def corpus_size(self) -> int:
+        """未删除的文档数"""
+        return self.num_slots - self.num_deleted
+
+    @property
+    def avgdl(self) -> float:
+        """未删除文档的平均长度"""
+        return self.total_length / self.corpus_size if self.corpus_size else 0.0
+
+    @property
+    def indptr(self) -> np.ndarray:
+        return self._single_segment()[0]
+
+    @property
+    def doc_ids(self) -> np.ndarray:
+        return self._single_segment()[1]
+
+    @property
+    def tfs(self) -> np.ndarray:
+        return self._single_segment()[2]
+
+    @classmethod
+    def build(
+        cls,
+        tokenized_docs: Sequence[List[str]],
+        k1: float = 1.5,
+        b: float = 0.75,
+        epsilon: float = 0.25
+    ) -> "BM25Index":
+        """
+        从分词后的文档构建索引
+
+        Args:
+            tokenized_docs: 每个文档的 token 列表
+            k1, b, epsilon: BM25Okapi 参数
+
+        Returns:
+            BM25Index 实例
+        """
+        vocabulary: Dict[str, int] = {}
+        indptr, doc_ids, tfs, df = cls._build_segment(tokenized_docs, vocabulary, 0)
+        doc_lengths = np.fromiter((len(tokens) for tokens in tokenized_docs), dtype=np.int32)
+        return cls(
+            vocabulary=vocabulary,
+            indptr=indptr,
+            doc_ids=doc_ids,
+            tfs=tfs,
+            doc_lengths=doc_lengths,
+            df=df,
+            idf=cls.compute_idf(df, len(doc_lengths), epsilon),
+            k1=k1,
+            b=b,
+            epsilon=epsilon
+        )
+
+    @staticmethod
+    def _build_segment(
+        tokenized_docs: Sequence[List[str]],
+        vocabulary: Dict[str, int],
+        first_doc: int
+    ) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+        """
+        为一批文档建立 CSR postings 段,新词追加到 vocabulary
+
+        Returns:
+            (indptr, doc_ids, tfs, 每个词项在本段的文档频率)
+        """
+        term_ids: List[int] = []
+        doc_ids: List[int] = []
+        tfs: List[int] = []
+
+        for doc_id, tokens in enumerate(tokenized_docs, start=first_doc):
+            for term, tf in Counter(tokens).items():
+                term_ids.append(vocabulary.setdefault(term, len(vocabulary)))
+                doc_ids.append(doc_id)
+                tfs.append(tf)
+
+        term_ids = np.asarray(term_ids, dtype=np.int64)
+        # 稳定排序: 同一词项内 doc_id 保持升序
+        order = np.argsort(term_ids, kind='stable')
+        df = np.bincount(term_ids, minlength=len(vocabulary)).astype(np.int32)
+        indptr = np.zeros(len(vocabulary) + 1, dtype=np.int64)
+        np.cumsum(df, out=indptr[1:])
+        return (
+            indptr,
+            np.asarray(doc_ids, dtype=np.int32)[order],
+            np.asarray(tfs, dtype=np.int32)[order],
+            df
+        )
+
+    @staticmethod
+    def compute_idf(df: np.ndarray, corpus_size: int, epsilon: float) -> np.ndarray:
+        """
+        ATIRE idf: log(N - df + 0.5) - log(df + 0.5),负值替换为 epsilon * 平均 idf
+
+        平均值只统计语料中仍出现的词项 (df > 0),与对剩余文档重建索引一致
+
+        Args:
+            df: 每个词项的文档频率
+            corpus_size: 文档总数
+            epsilon: 负 idf 的下限系数
+
+        Returns:
+            idf 数组 (float64),df 为 0 的词项 idf 为 0
+        """
+        df = np.asarray(df, dtype=np.float64)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            idf = np.log(corpus_size - df + 0.5) - np.log(df + 0.5)
+        present = df > 0
+        if present.any():
+            idf[present & (idf < 0)] = epsilon * idf[present].mean()
+        idf[~present] = 0.0
+        return idf
+
+    def add_documents(self, tokenized_docs: Sequence[List[str]]) -> List[int]:
+        """
+        增量添加文档: 新建一个 postings 段并更新文档频率、平均长度和 idf
+
+        Args:
+            tokenized_docs: 新文档的 token 列表
+
+        Returns:
+            新文档的下标
+        """
+        first_doc = self.num_slots
+        if not tokenized_docs:
+            return []
+
+        segment_df_len = len(self.vocabulary)
+        indptr, doc_ids, tfs, segment_df = self._build_segment(tokenized_docs, self.vocabulary, first_doc)
+        new_lengths = np.fromiter((len(tokens) for tokens in tokenized_docs), dtype=np.int32)
+
+        # 非原地运算: 从磁盘内存映射加载的数组是只读的
+        df = np.zeros(len(self.vocabulary), dtype=np.int32)
+        df[:segment_df_len] = self.df
+        self.df = df + segment_df
+        self.doc_lengths = np.concatenate([self.doc_lengths, new_lengths])
+        self.deleted = np.concatenate([self.deleted, np.zeros(len(new_lengths), dtype=bool)])
+        self.total_length += int(new_lengths.sum())
+        self.segments.append((indptr, doc_ids, tfs))
+        self.segment_sizes.append(len(new_lengths))
+        self.segment_ids.append(None)
+
+        self._statistics_changed()
+        return list(range(first_doc, self.num_slots))
+
+    def remove_documents(self, doc_indices: Sequence[int], tokenized_docs: Sequence[List[str]]) -> int:
+        """
+        增量删除文档: 打墓碑标记并更新文档频率、平均长度和 idf
+
+        postings 保留到下次合并;tokenized_docs 用于定位要减少文档频率的词项,
+        因此代价只与被删除的文档大小有关
+
+        Args:
+            doc_indices: 要删除的文档下标
+            tokenized_docs: 这些文档建索引时的 token 列表 (顺序一致)
+
+        Returns:
+            实际删除的文档数 (已删除的下标被忽略)
+        """
+        removed_terms: List[int] = []
+        removed: Dict[int, None] = {}
+        for doc_id, tokens in zip(doc_indices, tokenized_docs):
+            if self.deleted[doc_id] or doc_id in removed:
+                continue
+            removed[doc_id] = None
+            removed_terms.extend(self.vocabulary[term] for term in set(tokens) if term in self.vocabulary)
+
+        if not removed:
+            return 0
+
+        removed = np.fromiter(removed, dtype=np.int64, count=len(removed))
+        self.deleted = np.array(self.deleted)
+        self.deleted[removed] = True
+        self.num_deleted += len(removed)
+        self.total_length -= int(self.doc_lengths[removed].sum())
+        self.df = self.df - np.bincount(
+            np.asarray(removed_terms, dtype=np.int64), minlength=len(self.vocabulary)
+        ).astype(self.df.dtype)
+
+        self._statistics_changed()
+        return len(removed)
+
+    def merge_segments(self, start: int = 0) -> None:
+        """
+        把第 start 段及之后的 postings 段合并为一个 CSR 段,并丢弃其中已删除文档的 postings
+
+        文档下标不变;之前的段保持原样 (已持久化的段不会重写)
+        """
+        terms, docs, tfs = self._flatten_postings(self.segments[start:])
+        order = np.lexsort((docs, terms))
+        merged = self._csr(terms[order], docs[order], tfs[order])
+        # 新建列表而非原地修改,copy() 出的副本互不影响
+        self.segments = self.segments[:start] + [merged]
+        self.segment_sizes = self.segment_sizes[:start] + [sum(self.segment_sizes[start:])]
+        self.segment_ids = self.segment_ids[:start] + [None]
+
+    def merge_small_segments(self) -> None:
+        """
+        分层合并: 从最后一段向前吸收不大于已合并部分的段,并使段数不超过 MAX_SEGMENTS
+
+        较大的旧段不参与合并,每个文档被合并的次数约为 log(总文档数 / 每次追加数),
+        合并代价随追加量均摊,不随索引 (全库) 大小增长
+        """
+        sizes = self.segment_sizes
+        start = len(sizes) - 1
+        merged = sizes[start]
+        while start > 0 and (sizes[start - 1] <= merged or start >= self.MAX_SEGMENTS):
+            start -= 1
+            merged += sizes[start]
+        if start < len(sizes) - 1:
+            self.merge_segments(start)
+
+    def compact(self) -> np.ndarray:
+        """
+        合并段并移除已删除文档,剩余文档重新连续编号
+
+        Returns:
+            保留文档的原下标 (按新下标顺序),调用方据此重排文档列表
+        """
+        live = ~self.deleted
+        kept = np.flatnonzero(live)
+        new_ids = np.cumsum(live) - 1
+
+        terms, docs, tfs = self._flatten_postings()
+        docs = new_ids[docs].astype(np.int32)
+        order = np.lexsort((docs, terms))
+        self.doc_lengths = np.asarray(self.doc_lengths)[kept]
+        self._set_single_segment(self._csr(terms[order], docs[order], tfs[order]))
+
+        self.deleted = np.zeros(len(kept), dtype=bool)
+        self.num_deleted = 0
+        self._length_norm = None
+        self.build_id = uuid.uuid4().hex
+        return kept
+
+    def _set_single_segment(self, segment: Tuple[np.ndarray, np.ndarray, np.ndarray]) -> None:
+        """用一个覆盖全部文档的新段 (尚未持久化) 替换所有段"""
+        self.segments = [segment]
+        self.segment_sizes = [self.num_slots]
+        self.segment_ids = [None]
+
+    def _flatten_postings(
+        self,
+        segments: Optional[List[Tuple[np.ndarray, np.ndarray, np.ndarray]]] = None
+    ) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """各段 (默认全部) 的 (词项, 文档, 词频) 三元组,不含已删除文档"""
+        terms, docs, tfs = [], [], []
+        for indptr, seg_docs, seg_tfs in (self.segments if segments is None else segments):
+            terms.append(np.repeat(np.arange(len(indptr) - 1, dtype=np.int64), np.diff(indptr)))
+            docs.append(np.asarray(seg_docs))
+            tfs.append(np.asarray(seg_tfs))
+        terms, docs, tfs = np.concatenate(terms), np.concatenate(docs), np.concatenate(tfs)
+        if self.num_deleted:
+            live = ~self.deleted[docs]
+            terms, docs, tfs = terms[live], docs[live], tfs[live]
+        return terms, docs, tfs
+
+    def _csr(self, terms: np.ndarray, docs: np.ndarray, tfs: np.ndarray) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """按词项排好序的三元组转为 CSR 段"""
+        indptr = np.zeros(len(self.vocabulary) + 1, dtype=np.int64)
+        np.cumsum(np.bincount(terms, minlength=len(self.vocabulary)), out=indptr[1:])
+        return indptr, docs.astype(np.int32), tfs.astype(np.int32)
+
+    def _single_segment(self) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        if len(self.segments) > 1:
+            self.merge_segments()
+        return self.segments[0]
+
+    def _statistics_changed(self) -> None:
+        """文档集合变化后刷新 idf 与长度归一化,并生成新的 build_id"""
+        self.idf = self.compute_idf(self.df, self.corpus_size, self.epsilon)
+        self._length_norm = None
+        self.build_id = uuid.uuid4().hex
+
+    @property
+    def length_norm(self) -> np.ndarray:
+        """每个文档的 k1 * (1 - b + b * dl / avgdl),首次使用时计算"""
+        if self._length_norm is None:
+            avgdl = self.avgdl or 1.0
+            self._length_norm = self.k1 * (1 - self.b + self.b * self.doc_lengths / avgdl)
+        return self._length_norm
+
+    def get_scores(self, query_tokens: List[str]) -> np.ndarray:
+        """
+        计算所有文档的 BM25 分数 (与 BM25Okapi.get_scores 相同)
+
+        只遍历查询词的 postings,不含查询词的文档分数为 0
+
+        Args:
+            query_tokens: 查询 token 列表 (重复的词会重复计分)
+
+        Returns:
+            长度为文档下标总数的分数数组,已删除文档为 0
+        """
+        docs, contributions = self._postings_contributions(query_tokens)
+        return np.bincount(docs, weights=contributions, minlength=self.num_slots).astype(np.float64)
+
+    def top_k(
+        self,
+        query_tokens: List[str],
+        k: int,
+        doc_filter: Optional[Callable[[np.ndarray], np.ndarray]] = None
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        返回分数最高的 k 个文档,只访问包含查询词的文档
+
+        查询词的 postings 拼接后按文档聚合 (np.unique + np.bincount),
+        不分配长度为文档总数的分数数组;Top-K 用 np.argpartition 选出后再排序。
+        累加顺序与 get_scores 相同,分数完全一致
+
+        Args:
+            query_tokens: 查询 token 列表 (重复的词会重复计分)
+            k: 返回数量
+            doc_filter: 可选过滤函数,输入候选文档下标数组,返回保留的布尔掩码;
+                在聚合前作用于 postings,被过滤的文档不参与打分
+
+        Returns:
+            (文档下标数组, 分数数组),按分数降序、同分按下标升序;不含 0 分文档
+        """
+        docs, contributions = self._postings_contributions(query_tokens)
+        if doc_filter is not None and len(docs):
+            keep = doc_filter(docs)
+            docs, contributions = docs[keep], contributions[keep]
+        if not len(docs) or k <= 0:
+            return np.empty(0, dtype=np.int64), np.empty(0)
+
+        candidates, inverse = np.unique(docs, return_inverse=True)
+        scores = np.bincount(inverse, weights=contributions, minlength=len(candidates))
+
+        nonzero = scores != 0
+        candidates, scores = candidates[nonzero], scores[nonzero]
+
+        if k < len(scores):
+            top = np.argpartition(-scores, k - 1)[:k]
+            candidates, scores = candidates[top], scores[top]
+
+        order = np.lexsort((candidates, -scores))
+        return candidates[order], scores[order]
+
+    def _postings_contributions(self, query_tokens: List[str]) -> Tuple[np.ndarray, np.ndarray]:
+        """按查询词顺序拼接的 (文档下标, 该词的 BM25 分量)"""
+        doc_parts, score_parts = [], []
+        for term in query_tokens:
+            term_id = self.vocabulary.get(term)
+            if term_id is None:
+                continue
+            for indptr, seg_docs, seg_tfs in self.segments:
+                # 早于该词出现的段没有它的 postings
+                if term_id >= len(indptr) - 1:
+                    continue
+                start, end = indptr[term_id], indptr[term_id + 1]
+                if start == end:
+                    continue
+                docs = seg_docs[start:end]
+                tf = seg_tfs[start:end]
+                doc_parts.append(docs)
+                score_parts.append(self.idf[term_id] * (tf * (self.k1 + 1) / (tf + self.length_norm[docs])))
+
+        if not doc_parts:
+            return np.empty(0, dtype=np.int64), np.empty(0)
+        docs, contributions = np.concatenate(doc_parts), np.concatenate(score_parts)
+        if self.num_deleted:
+            live = ~self.deleted[docs]
+            docs, contributions = docs[live], contributions[live]
+        return docs, contributions
+
+    def meta(self) -> Dict:
+        """持久化的标量字段与词表"""
+        terms = self.terms()
+        return {
+            'format_version': self.FORMAT_VERSION,
+            'build_id': self.build_id,
+            'k1': self.k1,
+            'b': self.b,
+            'epsilon': self.epsilon,
+            'terms': terms
+        }
+
+    def terms(self) -> List[str]:
+        """按词项 ID 排列的词表"""
+        terms = [None] * len(self.vocabulary)
+        for term, term_id in self.vocabulary.items():
+            terms[term_id] = term
+        return terms
+
+    def segment_meta(self, segment_ids: List[str]) -> Dict:
+        """按段持久化时的元数据: 标量字段与段 ID 列表 (词表随各段保存)"""
+        return {
+            'format_version': self.FORMAT_VERSION,
+            'build_id': self.build_id,
+            'k1': self.k1,
+            'b': self.b,
+            'epsilon': self.epsilon,
+            'segments': segment_ids
+        }
+
+    @classmethod
+    def from_segments(
+        cls,
+        meta: Dict,
+        segments: List[Tuple[np.ndarray, np.ndarray, np.ndarray]],
+        segment_lengths: List[np.ndarray],
+        terms: List[str],
+        df: np.ndarray,
+        deleted: np.ndarray
+    ) -> "BM25Index":
+        """由 segment_meta() 和各段数组还原索引,idf 由文档频率重新计算"""
+        doc_lengths = np.concatenate(segment_lengths) if segment_lengths else np.zeros(0, dtype=np.int32)
+        corpus_size = len(doc_lengths) - int(np.count_nonzero(deleted))
+        indptr, doc_ids, tfs = segments[0] if segments else cls._build_segment([], {}, 0)[:3]
+        index = cls(
+            vocabulary={term: term_id for term_id, term in enumerate(terms)},
+            indptr=indptr,
+            doc_ids=doc_ids,
+            tfs=tfs,
+            doc_lengths=doc_lengths,
+            df=df,
+            idf=cls.compute_idf(df, corpus_size, meta['epsilon']),
+            k1=meta['k1'],
+            b=meta['b'],
+            epsilon=meta['epsilon'],
+            build_id=meta['build_id'],
+            deleted=deleted
+        )
+        if segments:
+            index.segments = list(segments)
+            index.segment_sizes = [len(lengths) for lengths in segment_lengths]
+            index.segment_ids = list(meta['segments'])
+        return index
+
+    @classmethod
+    def from_arrays(cls, meta: Dict, arrays: Dict[str, np.ndarray]) -> "BM25Index":
+        """由 meta() 和各数组还原索引"""
+        if meta.get('format_version') not in (1, cls.FORMAT_VERSION):
+            raise ValueError(f"Unsupported BM25 index format: {meta.get('format_version')}")
+        return cls(
+            vocabulary={term: term_id for term_id, term in enumerate(meta['terms'])},
+            k1=meta['k1'],
+            b=meta['b'],
+            epsilon=meta['epsilon'],
+            build_id=meta['build_id'],
+            # 版本 1 没有墓碑数组
+            **{name: arrays.get(name) for name in cls.ARRAYS}
+        )
+
+    def save(self, directory: str) -> None:
+        """
+        写入目录: 每个数组一个 .npy 文件 + meta.json
+
+        Args:
+            directory: 目标目录 (不存在则创建)
+        """
+        os.makedirs(directory, exist_ok=True)
+        for name in self.ARRAYS:
+            np.save(os.path.join(directory, f'{name}.npy'), np.asarray(getattr(self, name)))
+        with open(os.path.join(directory, 'meta.json'), 'w', encoding='utf-8') as f:
+            json.dump(self.meta(), f, ensure_ascii=False)
+
+    @classmethod
+    def load(cls, directory: str, mmap: bool = True) -> "BM25Index":
+        """
+        从目录加载索引
+
+        Args:
+            directory: save() 写入的目录
+            mmap: 以只读内存映射方式打开数组 (多进程共享页缓存)
+
+        Returns:
+            BM25Index 实例
+        """
+        with open(os.path.join(directory, 'meta.json'), encoding='utf-8') as f:
+            meta = json.load(f)
+        arrays = {
+            name: np.load(path, mmap_mode='r' if mmap else None)
+            for name, path in ((name, os.path.join(directory, f'{name}.npy')) for name in cls.ARRAYS)
+            if os.path.exists(path)
+        }
+        return cls.from_arrays(meta, arrays)
+
+    def to_bytes(self) -> bytes:
+        """序列化为单个二进制块 (用于 Redis)"""
+        buffer = io.BytesIO()
+        meta = np.frombuffer(json.dumps(self.meta(), ensure_ascii=False).encode('utf-8'), dtype=np.uint8)
+        np.savez(buffer, meta=meta, **{name: np.asarray(getattr(self, name)) for name in self.ARRAYS})
+        return buffer.getvalue()
+
+    @classmethod
+    def from_bytes(cls, data: bytes) -> "BM25Index":
+        """反序列化 to_bytes() 的结果"""
+        with np.load(io.BytesIO(data)) as npz:
+            meta = json.loads(npz['meta'].tobytes().decode('utf-8'))
+            arrays = {name: npz[name] for name in cls.ARRAYS if name in npz}
+        return cls.from_arrays(meta, arrays)
+
+
+class LibraryIndex:
+    """
+    跨 PDF 的 BM25 索引
+
+    所有 PDF 的块共用一个 BM25Index,idf 和平均文档长度是全库统计量,
+    不同 PDF 的分数可以直接比较;pdf_id 过滤在打分时作用于候选 postings,
+    查询 N 个 PDF 与查询一个同样大小的文档代价相当
+    """
+
+    def __init__(self, index: Optional[BM25Index] = None, documents: Optional[List[Optional[Dict]]] = None):
+        """
+        初始化索引
+
+        Args:
+            index: 全库 BM25 索引 (默认为空索引)
+            documents: 与索引下标对齐的块 (含 pdf_id),已删除的位置为 None
+        """
+        self.index = index if index is not None else BM25Index.build([])
+        self.documents: List[Optional[Dict]] = list(documents or [])
+        self._rebuild_lookup()
+
+    def copy(self) -> "LibraryIndex":
+        """写时复制用的拷贝 (见 BM25Index.copy),块本身共享"""
+        clone = LibraryIndex.__new__(LibraryIndex)
+        clone.index = self.index.copy()
+        clone.documents = list(self.documents)
+        clone.pdf_codes = dict(self.pdf_codes)
+        clone.slots = {pdf_id: list(slots) for pdf_id, slots in self.slots.items()}
+        clone.doc_pdf = self.doc_pdf.copy()
+        return clone
+
+    def _rebuild_lookup(self):
+        """由文档列表重建 pdf 编码和每个 PDF 的下标"""
+        self.pdf_codes: Dict[str, int] = {}
+        self.slots: Dict[str, List[int]] = {}
+        codes = []
+        for slot, chunk in enumerate(self.documents):
+            if chunk is None:
+                codes.append(-1)
+                continue
+            codes.append(self.pdf_codes.setdefault(chunk['pdf_id'], len(self.pdf_codes)))
+            self.slots.setdefault(chunk['pdf_id'], []).append(slot)
+        self.doc_pdf = np.asarray(codes, dtype=np.int32)
+
+    @property
+    def pdf_ids(self) -> List[str]:
+        """已收录的 PDF"""
+        return list(self.slots)
+
+    def chunk_slots(self, pdf_id: str, chunk_ids: Optional[Iterable[str]] = None) -> List[int]:
+        """
+        PDF 的块在索引中的下标
+
+        Args:
+            pdf_id: PDF ID
+            chunk_ids: 只返回这些块 (默认全部)
+
+        Returns:
+            下标列表
+        """
+        slots = self.slots.get(pdf_id, [])
+        if chunk_ids is None:
+            return list(slots)
+        ids = set(chunk_ids)
+        return [slot for slot in slots if self.documents[slot]['id'] in ids]
+
+    def add_chunks(self, pdf_id: str, chunks: List[Dict], tokenized_docs: Sequence[List[str]]):
+        """
+        添加某个 PDF 的块
+
+        Args:
+            pdf_id: PDF ID
+            chunks: 文档块
+            tokenized_docs: 与 chunks 对应的 token 列表
+        """
+        slots = self.index.add_documents(tokenized_docs)
+        code = self.pdf_codes.setdefault(pdf_id, len(self.pdf_codes))
+        self.documents.extend({**chunk, 'pdf_id': pdf_id} for chunk in chunks)
+        self.doc_pdf = np.concatenate([self.doc_pdf, np.full(len(slots), code, dtype=np.int32)])
+        self.slots.setdefault(pdf_id, []).extend(slots)
+
+    def remove_slots(self, slots: List[int], tokenized_docs: Sequence[List[str]]) -> int:
+        """
+        删除指定下标的块
+
+        Args:
+            slots: chunk_slots() 返回的下标
+            tokenized_docs: 这些块建索引时的 token 列表
+
+        Returns:
+            实际删除的块数
+        """
+        removed = self.index.remove_documents(slots, tokenized_docs)
+        removed_by_pdf: Dict[str, set] = {}
+        for slot in set(slots):
+            chunk = self.documents[slot]
+            if chunk is None:
+                continue
+            self.documents[slot] = None
+            self.doc_pdf[slot] = -1
+            removed_by_pdf.setdefault(chunk['pdf_id'], set()).add(slot)
+
+        for pdf_id, removed_slots in removed_by_pdf.items():
+            remaining = [slot for slot in self.slots[pdf_id] if slot not in removed_slots]
+            if remaining:
+                self.slots[pdf_id] = remaining
+            else:
+                del self.slots[pdf_id]
+        return removed
+
+    def compact(self, deleted_ratio: float):
+        """已删除块占比达到 deleted_ratio 时压缩索引并重建下标,段过多时只合并末尾的小段"""
+        if self.index.num_deleted and self.index.num_deleted >= deleted_ratio * self.index.num_slots:
+            self.documents = [self.documents[i] for i in self.index.compact()]
+            self._rebuild_lookup()
+        elif len(self.index.segments) > self.index.MAX_SEGMENTS:
+            self.index.merge_small_segments()
+
+    def search(
+        self,
+        query_tokens: List[str],
+        k: int,
+        pdf_ids: Optional[Iterable[str]] = None
+    ) -> List[Tuple[Dict, float]]:
+        """
+        全库 BM25 检索
+
+        Args:
+            query_tokens: 查询 token 列表
+            k: 返回数量
+            pdf_ids: 只在这些 PDF 中检索 (默认全部)
+
+        Returns:
+            [(块, 分数), ...],按分数降序
+        """
+        doc_filter = None
+        if pdf_ids is not None:
+            codes = [self.pdf_codes[pdf_id] for pdf_id in pdf_ids if pdf_id in self.slots]
+            if not codes:
+                return []
+            if len(codes) < len(self.slots):
+                codes = np.asarray(codes, dtype=np.int32)
+                doc_filter = lambda docs: np.isin(self.doc_pdf[docs], codes)
+
+        docs, scores = self.index.top_k(query_tokens, k, doc_filter=doc_filter)
+        return [(self.documents[doc], float(score)) for doc, score in zip(docs, scores)]
+
+
+class BM25IndexStore:
+    """
+    BM25 索引及其文档块的持久化存储
+
+    backend:
+    - disk: 每个 postings 段一个不可变目录 {directory}/{pdf_id}/segments/{segment_id}/
+      (.npy 数组、新增词项和该段的文档块);版本目录 {directory}/{pdf_id}/{build_id}/
+      只含段列表、墓碑和文档频率;{directory}/{pdf_id}/CURRENT 指向当前版本,原子替换。
+      增量更新只写新段和这些小数组,加载时内存映射
+    - redis: 键 bm25:{pdf_id} (索引) 和 bm25:{pdf_id}:docs (文档块)
+    - none: 不持久化
+    """
+
+    KEY_PREFIX = 'bm25'
+    # 指向当前版本目录的文件名
+    POINTER = 'CURRENT'
+    # 段目录的父目录名
+    SEGMENTS_DIR = 'segments'
+    # 段目录中的数组
+    SEGMENT_ARRAYS = ('indptr', 'doc_ids', 'tfs', 'doc_lengths')
+    # 旧版本目录至少保留的秒数,给正在读取或刚写完尚未切换指针的进程留出时间
+    STALE_VERSION_SECONDS = 60
+
+    def __init__(
+        self,
+        backend: Optional[str] = None,
+        directory: Optional[str] = None,
+        ttl: Optional[int] = None
+    ):
+        """
+        初始化存储,未指定的参数在使用时从 Settings 读取
+
+        Args:
+            backend: disk | redis | none
+            directory: 磁盘存储根目录
+            ttl: Redis 键存活秒数
+        """
+        self._backend = backend
+        self._directory = directory
+        self._ttl = ttl
+
+    @property
+    def backend(self) -> str:
+        return self._backend or get_settings().bm25_index_backend
+
+    @property
+    def directory(self) -> str:
+        return self._directory or get_settings().bm25_index_dir
+
+    @property
+    def ttl(self) -> int:
+        return self._ttl or get_settings().bm25_index_ttl
+
+    def save(self, pdf_id: str, index: BM25Index, documents: List[Dict]) -> None:
+        """
+        保存索引和文档块,覆盖已有版本
+
+        Args:
+            pdf_id: PDF ID
+            index: BM25 索引
+            documents: 与索引文档顺序一致的文档块
+        """
+        if self.backend == 'disk':
+            self._save_disk(pdf_id, index, documents)
+        elif self.backend == 'redis':
+            cache = self._cache()
+            cache.set_bytes_many({
+                self._key(pdf_id): index.to_bytes(),
+                self._key(pdf_id, 'docs'): json.dumps(documents, ensure_ascii=False).encode('utf-8'),
+                self._key(pdf_id, 'version'): index.build_id.encode('utf-8')
+            }, ttl=self.ttl)
+
+    def load(self, pdf_id: str) -> Optional[Tuple[BM25Index, List[Dict]]]:
+        """
+        加载索引和文档块
+
+        Args:
+            pdf_id: PDF ID
+
+        Returns:
+            (BM25Index, 文档块列表),不存在时返回 None
+        """
+        if self.backend == 'disk':
+            # 指针只读一次,之后的文件都来自同一个版本目录
+            path = self._version_path(pdf_id)
+            if path is None:
+                return None
+            return self._load_disk(pdf_id, path)
+        if self.backend == 'redis':
+            data, docs = self._cache().get_bytes_many([self._key(pdf_id), self._key(pdf_id, 'docs')])
+            if data is None or docs is None:
+                return None
+            return BM25Index.from_bytes(data), json.loads(docs)
+        return None
+
+    def version(self, pdf_id: str) -> Optional[str]:
+        """
+        已保存索引的 build_id,用于发现其他进程的重建
+
+        Args:
+            pdf_id: PDF ID
+
+        Returns:
+            build_id,不存在时返回 None
+        """
+        if self.backend == 'disk':
+            version = self._read_pointer(pdf_id)
+            if version is not None:
+                return version
+            # 旧布局: 索引文件直接位于 {directory}/{pdf_id}/
+            try:
+                with open(os.path.join(self._path(pdf_id), 'VERSION'), encoding='utf-8') as f:
+                    return f.read().strip()
+            except FileNotFoundError:
+                return None
+        if self.backend == 'redis':
+            value = self._cache().get_bytes(self._key(pdf_id, 'version'))
+            return value.decode('utf-8') if value is not None else None
+        return None
+
+    def delete(self, pdf_id: str) -> None:
+        """删除已保存的索引"""
+        if self.backend == 'disk':
+            shutil.rmtree(self._path(pdf_id), ignore_errors=True)
+        elif self.backend == 'redis':
+            self._cache().delete_many([
+                self._key(pdf_id), self._key(pdf_id, 'docs'), self._key(pdf_id, 'version')
+            ])
+
+    def _save_disk(self, pdf_id: str, index: BM25Index, documents: List[Dict]) -> None:
+        """
+        写入尚未持久化的段和新的版本目录,再原子替换 CURRENT 指针
+
+        已写入的段不再重写,增量更新的代价与变更大小 (加上墓碑和文档频率数组) 成正比;
+        任意时刻 CURRENT 都指向完整的版本,读者不会看到缺失或写了一半的索引
+        """
+        root = self._path(pdf_id)
+        os.makedirs(root, exist_ok=True)
+        version_path = os.path.join(root, index.build_id)
+
+        if not os.path.exists(version_path):
+            segment_ids = self._save_segments(root, index, documents)
+            tmp_path = os.path.join(root, f".tmp-{uuid.uuid4().hex}")
+            os.makedirs(tmp_path)
+            np.save(os.path.join(tmp_path, 'deleted.npy'), np.asarray(index.deleted))
+            np.save(os.path.join(tmp_path, 'df.npy'), np.asarray(index.df))
+            with open(os.path.join(tmp_path, 'meta.json'), 'w', encoding='utf-8') as f:
+                json.dump(index.segment_meta(segment_ids), f)
+            try:
+                os.rename(tmp_path, version_path)
+            except OSError:
+                # 其他进程已写入同一版本
+                shutil.rmtree(tmp_path, ignore_errors=True)
+
+        previous = self._read_pointer(pdf_id)
+        self._write_pointer(root, index.build_id)
+        self._remove_stale_versions(root, keep={index.build_id, previous})
+
+    def _save_segments(self, root: str, index: BM25Index, documents: List[Dict]) -> List[str]:
+        """
+        写入本存储中还没有的段,并把段 ID 记录到索引上
+
+        Returns:
+            各段的 ID (与 index.segments 顺序一致)
+        """
+        segments_root = os.path.join(root, self.SEGMENTS_DIR)
+        os.makedirs(segments_root, exist_ok=True)
+        terms = None
+        segment_ids = []
+        first_doc = first_term = 0
+
+        for i, ((indptr, doc_ids, tfs), size) in enumerate(zip(index.segments, index.segment_sizes)):
+            # 每段的词表覆盖其创建时的全部词项,新增词项位于上一段之后
+            end_term = len(indptr) - 1
+            segment_id = index.segment_ids[i]
+            if segment_id is None or not os.path.isdir(os.path.join(segments_root, segment_id)):
+                if terms is None:
+                    terms = index.terms()
+                segment_id = uuid.uuid4().hex
+                tmp_path = os.path.join(segments_root, f".tmp-{segment_id}")
+                os.makedirs(tmp_path)
+                arrays = {
+                    'indptr': indptr,
+                    'doc_ids': doc_ids,
+                    'tfs': tfs,
+                    'doc_lengths': index.doc_lengths[first_doc:first_doc + size]
+                }
+                for name in self.SEGMENT_ARRAYS:
+                    np.save(os.path.join(tmp_path, f'{name}.npy'), np.asarray(arrays[name]))
+                with open(os.path.join(tmp_path, 'terms.json'), 'w', encoding='utf-8') as f:
+                    json.dump(terms[first_term:end_term], f, ensure_ascii=False)
+                with open(os.path.join(tmp_path, 'documents.json'), 'w', encoding='utf-8') as f:
+                    json.dump(documents[first_doc:first_doc + size], f, ensure_ascii=False)
+                os.rename(tmp_path, os.path.join(segments_root, segment_id))
+                index.segment_ids[i] = segment_id
+
+            segment_ids.append(segment_id)
+            first_doc += size
+            first_term = end_term
+        return segment_ids
+
+    def _load_disk(self, pdf_id: str, path: str) -> Tuple[BM25Index, List[Optional[Dict]]]:
+        """从版本目录加载索引和文档块 (兼容整体保存的旧格式)"""
+        mmap_mode = 'r' if get_settings().bm25_index_mmap else None
+        with open(os.path.join(path, 'meta.json'), encoding='utf-8') as f:
+            meta = json.load(f)
+        if 'segments' not in meta:
+            with open(os.path.join(path, 'documents.json'), encoding='utf-8') as f:
+                documents = json.load(f)
+            return BM25Index.load(path, mmap=mmap_mode is not None), documents
+
+        segments_root = os.path.join(self._path(pdf_id), self.SEGMENTS_DIR)
+        segments, segment_lengths, terms, documents = [], [], [], []
+        for segment_id in meta['segments']:
+            segment_path = os.path.join(segments_root, segment_id)
+            indptr, doc_ids, tfs, doc_lengths = (
+                np.load(os.path.join(segment_path, f'{name}.npy'), mmap_mode=mmap_mode)
+                for name in self.SEGMENT_ARRAYS
+            )
+            segments.append((indptr, doc_ids, tfs))
+            segment_lengths.append(doc_lengths)
+            with open(os.path.join(segment_path, 'terms.json'), encoding='utf-8') as f:
+                terms.extend(json.load(f))
+            with open(os.path.join(segment_path, 'documents.json'), encoding='utf-8') as f:
+                documents.extend(json.load(f))
+
+        deleted = np.load(os.path.join(path, 'deleted.npy'), mmap_mode=mmap_mode)
+        df = np.load(os.path.join(path, 'df.npy'), mmap_mode=mmap_mode)
+        index = BM25Index.from_segments(meta, segments, segment_lengths, terms, df, deleted)
+        # 段文件不可变,删除的块只体现在墓碑上
+        for slot in np.flatnonzero(deleted):
+            documents[slot] = None
+        return index, documents
+
+    def _read_pointer(self, pdf_id: str) -> Optional[str]:
+        """CURRENT 中记录的版本,不存在时返回 None"""
+        try:
+            with open(os.path.join(self._path(pdf_id), self.POINTER), encoding='utf-8') as f:
+                return f.read().strip() or None
+        except FileNotFoundError:
+            return None
+
+    def _write_pointer(self, root: str, version: str) -> None:
+        """写临时文件后 os.replace,切换是原子的"""
+        tmp_pointer = os.path.join(root, f".{self.POINTER}-{uuid.uuid4().hex}")
+        with open(tmp_pointer, 'w', encoding='utf-8') as f:
+            f.write(version)
+        os.replace(tmp_pointer, os.path.join(root, self.POINTER))
+
+    def _version_path(self, pdf_id: str) -> Optional[str]:
+        """当前版本目录 (兼容旧布局),不存在时返回 None"""
+        root = self._path(pdf_id)
+        version = self._read_pointer(pdf_id)
+        if version is not None:
+            return os.path.join(root, version)
+        if os.path.exists(os.path.join(root, 'meta.json')):
+            return root
+        return None
+
+    def _remove_stale_versions(self, root: str, keep: set) -> None:
+        """
+        删除旧版本目录、不再被引用的段和遗留的临时文件
+
+        保留的版本 (当前和上一个) 及其引用的段总是保留;其余条目修改时间超过
+        STALE_VERSION_SECONDS 才删除,已内存映射旧文件的进程不受影响
+        (文件被删除后映射仍然有效)
+        """
+        keep = {version for version in keep if version}
+        referenced = set()
+        for version in keep:
+            try:
+                with open(os.path.join(root, version, 'meta.json'), encoding='utf-8') as f:
+                    referenced.update(json.load(f).get('segments', []))
+            except FileNotFoundError:
+                continue
+
+        self._remove_stale(root, keep | {self.POINTER, self.SEGMENTS_DIR})
+        segments_root = os.path.join(root, self.SEGMENTS_DIR)
+        if os.path.isdir(segments_root):
+            self._remove_stale(segments_root, referenced)
+
+    def _remove_stale(self, directory: str, keep: set) -> None:
+        """删除 directory 中不在 keep 里且已过期的子目录和临时文件"""
+        cutoff = time.time() - self.STALE_VERSION_SECONDS
+        for name in os.listdir(directory):
+            path = os.path.join(directory, name)
+            if name in keep or not os.path.isdir(path) and not name.startswith('.'):
+                continue
+            try:
+                if os.path.getmtime(path) > cutoff:
+                    continue
+                if os.path.isdir(path):
+                    shutil.rmtree(path, ignore_errors=True)
+                else:
+                    os.remove(path)
+            except FileNotFoundError:
+                continue
+
+    def _path(self, pdf_id: str) -> str:
+        if os.path.basename(pdf_id) != pdf_id or pdf_id in ('', '.', '..'):
+            raise ValueError(f"Invalid pdf_id for BM25 index path: {pdf_id!r}")
+        return os.path.join(self.directory, pdf_id)
+
+    def _key(self, pdf_id: str, suffix: str = '') -> str:
+        key = f"{self.KEY_PREFIX}:{pdf_id}"
+        return f"{key}:{suffix}" if suffix else key
+
+    def _cache(self):
+        from backend.services.cache_service import get_cache_service
+        return get_cache_service()
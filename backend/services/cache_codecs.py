@@ -0,0 +1,191 @@
+"""Pluggable value codecs and compression for the Redis cache.
+
+Encoded values carry a 3-byte header so readers know how they were written:
+
+    b'\\x00' | codec id (1 byte) | compression id (1 byte) | payload
+
+Values written before the codec layer existed are plain JSON text, which can
+never start with a NUL byte, so they are still decoded as JSON.
+"""
+import json
+from typing import Any, Callable, Dict, Optional, Tuple
+
+try:
+    import msgpack
+except ImportError:  # optional dependency
+    msgpack = None
+
+try:
+    import zstandard
+except ImportError:  # optional dependency
+    zstandard = None
+
+try:
+    import lz4.frame as lz4_frame
+except ImportError:  # optional dependency
+    lz4_frame = None
+
+
+HEADER_MAGIC = 0x00
+HEADER_SIZE = 3
+
+
+class Codec:
+    """Base class for value codecs registered with register_codec()."""
+
+    name: str = ""
+    codec_id: int = 0
+
+    def dumps(self, value: Any) -> bytes:
+        raise NotImplementedError
+
+    def loads(self, data: bytes) -> Any:
+        raise NotImplementedError
+
+
+class JSONCodec(Codec):
+    """UTF-8 JSON, the historical cache format."""
+
+    name = "json"
+    codec_id = 1
+
+    def dumps(self, value: Any) -> bytes:
+        return json.dumps(value).encode('utf-8')
+
+    def loads(self, data: bytes) -> Any:
+        return json.loads(data)
+
+
+class MsgpackCodec(Codec):
+    """MessagePack: compact binary encoding, much faster than JSON for chunk lists."""
+
+    name = "msgpack"
+    codec_id = 2
+
+    def dumps(self, value: Any) -> bytes:
+        return msgpack.packb(value, use_bin_type=True)
+
+    def loads(self, data: bytes) -> Any:
+        return msgpack.unpackb(data, raw=False, strict_map_key=False)
+
+
+_codecs_by_name: Dict[str, Codec] = {}
+_codecs_by_id: Dict[int, Codec] = {}
+
+
+def register_codec(codec: Codec) -> None:
+    """
+    Register a codec so it can be selected by name and decoded by id.
+
+    Args:
+        codec: Codec instance with a unique name and codec_id (1-255)
+    """
+    if not 0 < codec.codec_id < 256:
+        raise ValueError(f"Codec id must be in 1..255, got {codec.codec_id}")
+    _codecs_by_name[codec.name] = codec
+    _codecs_by_id[codec.codec_id] = codec
+
+
+def get_codec(name: str) -> Codec:
+    """
+    Look up a codec by name, falling back to JSON if it is unavailable.
+
+    Args:
+        name: Codec name (e.g. "json", "msgpack")
+
+    Returns:
+        Registered codec
+    """
+    return _codecs_by_name.get(name) or _codecs_by_name["json"]
+
+
+register_codec(JSONCodec())
+if msgpack is not None:
+    register_codec(MsgpackCodec())
+
+
+# compression id -> (name, compress, decompress)
+_compressors: Dict[int, Tuple[str, Callable[[bytes], bytes], Callable[[bytes], bytes]]] = {}
+
+if zstandard is not None:
+    _compressors[1] = (
+        "zstd",
+        lambda data: zstandard.ZstdCompressor(level=3).compress(data),
+        lambda data: zstandard.ZstdDecompressor().decompress(data),
+    )
+if lz4_frame is not None:
+    _compressors[2] = ("lz4", lz4_frame.compress, lz4_frame.decompress)
+
+
+def get_compression_id(name: str) -> int:
+    """
+    Map a compression name to its id; unknown or unavailable names mean none.
+
+    Args:
+        name: "zstd", "lz4" or "none"
+
+    Returns:
+        Compression id (0 = uncompressed)
+    """
+    for compression_id, (compression_name, _, _) in _compressors.items():
+        if compression_name == name:
+            return compression_id
+    return 0
+
+
+def encode_value(
+    value: Any,
+    codec: Codec,
+    compression_id: int = 0,
+    compress_min_bytes: int = 1024
+) -> bytes:
+    """
+    Serialize a value with a codec header, compressing large payloads.
+
+    Args:
+        value: Value to serialize
+        codec: Codec to write with
+        compression_id: Compression to apply (0 = none)
+        compress_min_bytes: Only compress payloads at least this large
+
+    Returns:
+        Header + payload bytes
+    """
+    payload = codec.dumps(value)
+    if compression_id and len(payload) >= compress_min_bytes:
+        payload = _compressors[compression_id][1](payload)
+    else:
+        compression_id = 0
+    return bytes((HEADER_MAGIC, codec.codec_id, compression_id)) + payload
+
+
+def decode_value(data: Optional[Any]) -> Any:
+    """
+    Deserialize a cached value written by encode_value or legacy JSON.
+
+    Args:
+        data: Raw value from Redis (bytes, or str for legacy/decoded clients)
+
+    Returns:
+        Decoded value, or None if data is None
+
+    Raises:
+        ValueError: If the header names an unknown codec or compression
+    """
+    if data is None:
+        return None
+    if isinstance(data, str) or not data or data[0] != HEADER_MAGIC:
+        # Legacy entry: bare JSON text
+        return json.loads(data)
+
+    codec_id, compression_id = data[1], data[2]
+    payload = data[HEADER_SIZE:]
+    if compression_id:
+        if compression_id not in _compressors:
+            raise ValueError(f"Unknown cache compression id {compression_id}")
+        payload = _compressors[compression_id][2](payload)
+
+    codec = _codecs_by_id.get(codec_id)
+    if codec is None:
+        raise ValueError(f"Unknown cache codec id {codec_id}")
+    return codec.loads(payload)
@@ -2,14 +2,27 @@
 import json
 import hashlib
 import threading
+import time
+import uuid
 import redis
+from concurrent.futures import Future
 from functools import wraps
-from typing import Any, Optional, Callable
+from typing import Any, Dict, List, Optional, Callable, Tuple
 from backend.config import get_settings
+from backend.services.cache_codecs import (
+    decode_value,
+    encode_value,
+    get_codec,
+    get_compression_id
+)
+from backend.services.local_cache import LocalLRUCache
 
 
 class CacheService:
-    """Redis cache service with JSON serialization and TTL support."""
+    """Redis cache service with pluggable serialization and TTL support."""
+
+    # Keys per DEL command when deleting in bulk
+    DELETE_BATCH_SIZE = 500
 
     def __init__(self):
         """Initialize Redis connection with error handling and auth support."""
@@ -20,7 +33,8 @@ class CacheService:
                 port=settings.redis_port,
                 db=settings.redis_db,
                 password=getattr(settings, 'redis_password', None),
-                decode_responses=True,
+                # Raw bytes so binary codecs and float32 vectors round-trip
+                decode_responses=False,
                 socket_connect_timeout=5,
                 socket_timeout=5
             )
@@ -29,21 +43,61 @@ class CacheService:
         except redis.ConnectionError as e:
             raise ConnectionError(f"Failed to connect to Redis: {e}")
 
+        # Values are written with this codec; reads detect the codec per value
+        self.codec = get_codec(settings.cache_codec)
+        self.compression_id = get_compression_id(settings.cache_compression)
+        self.compress_min_bytes = settings.cache_compress_min_bytes
+
+        # Optional in-process L1 tier, kept coherent across workers via pub/sub
+        self.local: Optional[LocalLRUCache] = None
+        self.invalidation_channel = settings.cache_invalidation_channel
+        self._instance_id = uuid.uuid4().hex
+        self._pubsub_thread = None
+        if settings.cache_l1_enabled:
+            self.enable_local_cache(settings.cache_l1_max_items, settings.cache_l1_ttl)
+
+    def enable_local_cache(self, max_items: int = 1024, ttl: int = 30) -> None:
+        """
+        Put an in-process LRU/TTL cache in front of Redis for get/set/delete.
+
+        Writes and deletes publish the affected keys on the invalidation
+        channel; every other CacheService subscribed to it evicts them from
+        its own L1. The L1 TTL bounds staleness if a message is missed.
+
+        Args:
+            max_items: Maximum number of L1 entries
+            ttl: Maximum L1 lifetime of an entry in seconds
+        """
+        self.local = LocalLRUCache(max_items=max_items, ttl=ttl)
+        pubsub = self.redis.pubsub(ignore_subscribe_messages=True)
+        pubsub.subscribe(**{self.invalidation_channel: self._handle_invalidation})
+        self._pubsub_thread = pubsub.run_in_thread(sleep_time=1.0, daemon=True)
+
+    def close(self) -> None:
+        """Stop the invalidation listener and release Redis connections."""
+        if self._pubsub_thread is not None:
+            self._pubsub_thread.stop()
+            self._pubsub_thread = None
+        self.redis.close()
+
     def set(self, key: str, value: Any, ttl: int = 3600) -> None:
         """
         Set a value in cache with TTL.
 
         Args:
             key: Cache key
-            value: Value to cache (will be JSON serialized)
+            value: Value to cache (serialized with the configured codec)
             ttl: Time to live in seconds (default: 1 hour)
 
         Raises:
             redis.RedisError: If Redis operation fails
         """
         try:
-            serialized = json.dumps(value)
-            self.redis.setex(key, ttl, serialized)
+            encoded = self._encode(value)
+            self.redis.setex(key, ttl, encoded)
+            if self.local is not None:
+                self.local.set(key, encoded, ttl=ttl)
+                self._publish_invalidation(keys=[key])
         except redis.RedisError as e:
             raise redis.RedisError(f"Failed to set cache key '{key}': {e}") from e
 
@@ -61,13 +115,94 @@ class CacheService:
             redis.RedisError: If Redis operation fails
         """
         try:
+            if self.local is not None:
+                value = self.local.get(key)
+                if value is not None:
+                    return decode_value(value)
+
             value = self.redis.get(key)
-            if value is None:
-                return None
-            return json.loads(value)
+            if value is not None and self.local is not None:
+                self.local.set(key, value)
+            return decode_value(value)
+        except redis.RedisError as e:
+            raise redis.RedisError(f"Failed to get cache key '{key}': {e}") from e
+
+    def set_bytes(self, key: str, value: bytes, ttl: int = 3600) -> None:
+        """
+        Set a raw binary value in cache with TTL (no JSON serialization).
+
+        Args:
+            key: Cache key
+            value: Bytes to store as-is
+            ttl: Time to live in seconds (default: 1 hour)
+
+        Raises:
+            redis.RedisError: If Redis operation fails
+        """
+        try:
+            self.redis.setex(key, ttl, value)
+        except redis.RedisError as e:
+            raise redis.RedisError(f"Failed to set cache key '{key}': {e}") from e
+
+    def get_bytes(self, key: str) -> Optional[bytes]:
+        """
+        Get a raw binary value from cache.
+
+        Args:
+            key: Cache key
+
+        Returns:
+            Stored bytes or None if not found
+
+        Raises:
+            redis.RedisError: If Redis operation fails
+        """
+        try:
+            return self.redis.get(key)
         except redis.RedisError as e:
             raise redis.RedisError(f"Failed to get cache key '{key}': {e}") from e
 
+    def get_bytes_many(self, keys: List[str]) -> List[Optional[bytes]]:
+        """
+        Get several raw binary values in one MGET round trip.
+
+        Args:
+            keys: Cache keys
+
+        Returns:
+            Stored bytes (or None for misses) in the same order as keys
+
+        Raises:
+            redis.RedisError: If Redis operation fails
+        """
+        if not keys:
+            return []
+        try:
+            return self.redis.mget(keys)
+        except redis.RedisError as e:
+            raise redis.RedisError(f"Failed to get {len(keys)} cache keys: {e}") from e
+
+    def set_bytes_many(self, mapping: Dict[str, bytes], ttl: int = 3600) -> None:
+        """
+        Set several raw binary values with TTL in one pipelined round trip.
+
+        Args:
+            mapping: Cache key -> bytes
+            ttl: Time to live in seconds (default: 1 hour)
+
+        Raises:
+            redis.RedisError: If Redis operation fails
+        """
+        if not mapping:
+            return
+        try:
+            pipe = self.redis.pipeline(transaction=False)
+            for key, value in mapping.items():
+                pipe.setex(key, ttl, value)
+            pipe.execute()
+        except redis.RedisError as e:
+            raise redis.RedisError(f"Failed to set {len(mapping)} cache keys: {e}") from e
+
     def delete(self, key: str) -> None:
         """
         Delete a key from cache.
@@ -80,22 +215,130 @@ class CacheService:
         """
         try:
             self.redis.delete(key)
+            if self.local is not None:
+                self.local.delete(key)
+                self._publish_invalidation(keys=[key])
         except redis.RedisError as e:
             raise redis.RedisError(f"Failed to delete cache key '{key}': {e}") from e
 
-    def clear_pattern(self, pattern: str) -> None:
+    def get_many(self, keys: List[str]) -> Dict[str, Any]:
+        """
+        Get several values in one MGET round trip.
+
+        Args:
+            keys: Cache keys
+
+        Returns:
+            Dict of key -> deserialized value for the keys that were found
+
+        Raises:
+            redis.RedisError: If Redis operation fails
+        """
+        results: Dict[str, Any] = {}
+        missing = list(dict.fromkeys(keys))
+        try:
+            if self.local is not None:
+                remote = []
+                for key in missing:
+                    value = self.local.get(key)
+                    if value is not None:
+                        results[key] = decode_value(value)
+                    else:
+                        remote.append(key)
+                missing = remote
+
+            if missing:
+                for key, value in zip(missing, self.redis.mget(missing)):
+                    if value is None:
+                        continue
+                    if self.local is not None:
+                        self.local.set(key, value)
+                    results[key] = decode_value(value)
+            return results
+        except redis.RedisError as e:
+            raise redis.RedisError(f"Failed to get {len(keys)} cache keys: {e}") from e
+
+    def set_many(
+        self,
+        mapping: Dict[str, Any],
+        ttl: int = 3600,
+        ttls: Optional[Dict[str, int]] = None
+    ) -> None:
+        """
+        Set several values in one pipelined round trip.
+
+        Args:
+            mapping: Cache key -> value
+            ttl: Default time to live in seconds (default: 1 hour)
+            ttls: Optional per-key TTL overrides
+
+        Raises:
+            redis.RedisError: If Redis operation fails
+        """
+        if not mapping:
+            return
+        ttls = ttls or {}
+        try:
+            pipe = self.redis.pipeline(transaction=False)
+            for key, value in mapping.items():
+                key_ttl = ttls.get(key, ttl)
+                encoded = self._encode(value)
+                pipe.setex(key, key_ttl, encoded)
+                if self.local is not None:
+                    self.local.set(key, encoded, ttl=key_ttl)
+            pipe.execute()
+
+            if self.local is not None:
+                self._publish_invalidation(keys=list(mapping))
+        except redis.RedisError as e:
+            raise redis.RedisError(f"Failed to set {len(mapping)} cache keys: {e}") from e
+
+    def delete_many(self, keys: List[str]) -> int:
+        """
+        Delete several keys, in pipelined DEL batches.
+
+        Args:
+            keys: Cache keys to delete
+
+        Returns:
+            Number of keys that existed and were deleted
+
+        Raises:
+            redis.RedisError: If Redis operation fails
+        """
+        if not keys:
+            return 0
+        try:
+            deleted = self._delete_batched(keys)
+            if self.local is not None:
+                for key in keys:
+                    self.local.delete(key)
+                self._publish_invalidation(keys=list(keys))
+            return deleted
+        except redis.RedisError as e:
+            raise redis.RedisError(f"Failed to delete {len(keys)} cache keys: {e}") from e
+
+    def clear_pattern(self, pattern: str) -> int:
         """
         Clear all keys matching a pattern using SCAN (production-safe).
 
+        Keys are deleted in pipelined batches as the scan proceeds, so the
+        full key list is never held in memory or sent as one giant DEL.
+
         Args:
             pattern: Redis pattern (e.g., "pdf:123:*")
 
+        Returns:
+            Number of keys deleted
+
         Raises:
             redis.RedisError: If Redis operation fails
         """
         try:
             cursor = 0
-            keys = []
+            deleted = 0
+            pipe = self.redis.pipeline(transaction=False)
+            queued = 0
             # Use SCAN instead of KEYS to avoid blocking Redis
             while True:
                 cursor, partial_keys = self.redis.scan(
@@ -103,16 +346,56 @@ class CacheService:
                     match=pattern,
                     count=100
                 )
-                keys.extend(partial_keys)
+                if partial_keys:
+                    pipe.delete(*partial_keys)
+                    queued += len(partial_keys)
+                if queued >= self.DELETE_BATCH_SIZE:
+                    deleted += sum(pipe.execute())
+                    queued = 0
                 if cursor == 0:
                     break
 
-            # Bulk delete for better performance
-            if keys:
-                self.redis.delete(*keys)
+            if queued:
+                deleted += sum(pipe.execute())
+
+            if self.local is not None:
+                self.local.delete_pattern(pattern)
+                self._publish_invalidation(pattern=pattern)
+            return deleted
         except redis.RedisError as e:
             raise redis.RedisError(f"Failed to clear pattern '{pattern}': {e}") from e
 
+    def _delete_batched(self, keys: List[str]) -> int:
+        """Queue one DEL per DELETE_BATCH_SIZE keys and send them in one pipeline."""
+        pipe = self.redis.pipeline(transaction=False)
+        for start in range(0, len(keys), self.DELETE_BATCH_SIZE):
+            pipe.delete(*keys[start:start + self.DELETE_BATCH_SIZE])
+        return sum(pipe.execute())
+
+    def _publish_invalidation(self, keys: Optional[List[str]] = None, pattern: Optional[str] = None) -> None:
+        """Tell other processes to drop keys (or a pattern) from their L1."""
+        message = {'origin': self._instance_id, 'keys': keys or [], 'pattern': pattern}
+        self.redis.publish(self.invalidation_channel, json.dumps(message))
+
+    def _handle_invalidation(self, message: Dict) -> None:
+        """Pub/sub callback: evict keys invalidated by another process."""
+        if self.local is None:
+            return
+        try:
+            data = json.loads(message['data'])
+        except (TypeError, ValueError):
+            return
+        if data.get('origin') == self._instance_id:
+            return
+        for key in data.get('keys', []):
+            self.local.delete(key)
+        if data.get('pattern'):
+            self.local.delete_pattern(data['pattern'])
+
+    def _encode(self, value: Any) -> bytes:
+        """Serialize a value with the configured codec and compression."""
+        return encode_value(value, self.codec, self.compression_id, self.compress_min_bytes)
+
     def _make_cache_key(self, prefix: str, func_name: str, args: tuple, kwargs: dict) -> str:
         """
         Generate cache key from function name and arguments using JSON + hash.
@@ -126,11 +409,29 @@ class CacheService:
         Returns:
             Cache key string with hash to prevent collisions
         """
-        # Use JSON serialization + MD5 hash to prevent collisions
-        args_dict = {"args": args, "kwargs": kwargs}
-        args_json = json.dumps(args_dict, sort_keys=True)
-        hash_val = hashlib.md5(args_json.encode()).hexdigest()[:12]
-        return f"{prefix}:{func_name}:{hash_val}"
+        return make_cache_key(prefix, func_name, args, kwargs)
+
+
+def make_cache_key(prefix: str, func_name: str, args: tuple, kwargs: dict) -> str:
+    """
+    Generate cache key from function name and arguments using JSON + hash.
+
+    Shared by the sync and async cache services so both address the same keys.
+
+    Args:
+        prefix: Prefix for the cache key
+        func_name: Function name
+        args: Function positional arguments
+        kwargs: Function keyword arguments
+
+    Returns:
+        Cache key string with hash to prevent collisions
+    """
+    # Use JSON serialization + MD5 hash to prevent collisions
+    args_dict = {"args": args, "kwargs": kwargs}
+    args_json = json.dumps(args_dict, sort_keys=True)
+    hash_val = hashlib.md5(args_json.encode()).hexdigest()[:12]
+    return f"{prefix}:{func_name}:{hash_val}"
 
 
 # Global singleton instance with thread-safe initialization
@@ -154,19 +455,189 @@ def get_cache_service() -> CacheService:
     return _cache_service_instance
 
 
-def cached(ttl: int = 3600, key_prefix: str = "") -> Callable:
+class SingleFlight:
+    """Collapse concurrent calls for the same key into one execution (per process)."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls: Dict[str, Future] = {}
+
+    def do(self, key: str, fn: Callable[[], Any]) -> Any:
+        """
+        Run fn once for all concurrent callers of the same key.
+
+        Args:
+            key: Deduplication key
+            fn: Zero-argument callable producing the result
+
+        Returns:
+            The result of the single execution (exceptions propagate to all)
+        """
+        with self._lock:
+            future = self._calls.get(key)
+            leader = future is None
+            if leader:
+                future = Future()
+                self._calls[key] = future
+
+        if not leader:
+            return future.result()
+
+        try:
+            result = fn()
+            future.set_result(result)
+            return result
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        finally:
+            with self._lock:
+                self._calls.pop(key, None)
+
+
+_single_flight = SingleFlight()
+_refreshing: set = set()
+_refreshing_lock = threading.Lock()
+
+# Marker for entries written with a stale-while-revalidate window
+_SWR_MARKER = "__swr__"
+
+
+def _wrap_entry(value: Any, ttl: int, stale_ttl: int) -> Any:
+    """Store the freshness deadline next to the value when SWR is enabled."""
+    if not stale_ttl:
+        return value
+    return {_SWR_MARKER: 1, "value": value, "fresh_until": time.time() + ttl}
+
+
+def _unwrap_entry(entry: Any) -> Tuple[Any, bool]:
+    """Return (value, is_fresh) for a cached entry."""
+    if isinstance(entry, dict) and entry.get(_SWR_MARKER) == 1:
+        return entry["value"], time.time() < entry["fresh_until"]
+    return entry, True
+
+
+def _compute_locked(
+    cache: CacheService,
+    cache_key: str,
+    compute: Callable[[], Any],
+    ttl: int,
+    stale_ttl: int,
+    lock_timeout: float
+) -> Any:
+    """
+    Compute a missing value with a Redis lock so one process recomputes.
+
+    Callers that lose the lock poll the cache until the winner stores the
+    value. If the lock is released without a value (the winner failed or
+    got None), they race for the lock again instead of waiting it out. If
+    nothing appears within lock_timeout they compute it themselves rather
+    than fail.
+    """
+    lock_name = f"lock:{cache_key}"
+    deadline = time.monotonic() + lock_timeout
+    while True:
+        lock = cache.redis.lock(lock_name, timeout=lock_timeout)
+        if lock.acquire(blocking=False):
+            try:
+                # Another process may have filled the key while we waited
+                entry = cache.get(cache_key)
+                if entry is not None:
+                    return _unwrap_entry(entry)[0]
+                result = compute()
+                if result is not None:
+                    cache.set(cache_key, _wrap_entry(result, ttl, stale_ttl), ttl=ttl + stale_ttl)
+                return result
+            finally:
+                try:
+                    lock.release()
+                except redis.exceptions.LockError:
+                    pass  # lock expired while computing
+
+        released = False
+        while not released and time.monotonic() < deadline:
+            time.sleep(0.05)
+            entry = cache.get(cache_key)
+            if entry is not None:
+                return _unwrap_entry(entry)[0]
+            released = not cache.redis.exists(lock_name)
+        if not released:
+            break
+
+    result = compute()
+    if result is not None:
+        cache.set(cache_key, _wrap_entry(result, ttl, stale_ttl), ttl=ttl + stale_ttl)
+    return result
+
+
+def _refresh_in_background(
+    cache: CacheService,
+    cache_key: str,
+    compute: Callable[[], Any],
+    ttl: int,
+    stale_ttl: int,
+    lock_timeout: float
+) -> None:
+    """Recompute a stale entry on a daemon thread, once across all processes."""
+    with _refreshing_lock:
+        if cache_key in _refreshing:
+            return
+        _refreshing.add(cache_key)
+
+    def refresh():
+        lock = cache.redis.lock(f"lock:{cache_key}", timeout=lock_timeout)
+        try:
+            if not lock.acquire(blocking=False):
+                return  # another process is already refreshing
+            try:
+                result = compute()
+                if result is not None:
+                    cache.set(cache_key, _wrap_entry(result, ttl, stale_ttl), ttl=ttl + stale_ttl)
+            finally:
+                try:
+                    lock.release()
+                except redis.exceptions.LockError:
+                    pass
+        except Exception as e:
+            print(f"[Cache] Background refresh failed for {cache_key}: {e}")
+        finally:
+            with _refreshing_lock:
+                _refreshing.discard(cache_key)
+
+    threading.Thread(target=refresh, daemon=True).start()
+
+
+def cached(
+    ttl: int = 3600,
+    key_prefix: str = "",
+    stale_ttl: int = 0,
+    single_flight: bool = True,
+    lock_timeout: float = 30.0
+) -> Callable:
     """
     Decorator for automatic caching of function results.
 
+    Goes through CacheService.get/set, so hot keys are served from the
+    in-process L1 tier when it is enabled.
+
+    On a miss, concurrent callers in one process share a single execution,
+    and a Redis lock makes one process recompute while the others wait for
+    its result. With stale_ttl, entries stay servable for stale_ttl seconds
+    after they expire: callers get the stale value immediately while one
+    caller refreshes it in the background.
+
     Args:
         ttl: Time to live in seconds (default: 1 hour)
         key_prefix: Prefix for cache keys
+        stale_ttl: Seconds an expired value may still be served (0 = off)
+        single_flight: Deduplicate concurrent misses (default: True)
+        lock_timeout: Max seconds to hold the recompute lock / wait for it
 
     Returns:
         Decorated function with caching
 
     Example:
-        @cached(ttl=300, key_prefix="qa")
+        @cached(ttl=300, key_prefix="qa", stale_ttl=60)
         def ask_question(pdf_id: int, question: str):
             # Expensive operation
             return answer
@@ -177,15 +648,27 @@ def cached(ttl: int = 3600, key_prefix: str = "") -> Callable:
             cache = get_cache_service()
             cache_key = cache._make_cache_key(key_prefix, func.__name__, args, kwargs)
 
-            # Try to get from cache
-            cached_value = cache.get(cache_key)
-            if cached_value is not None:
-                return cached_value
+            def compute():
+                return func(*args, **kwargs)
 
-            # Call the function and cache the result
-            result = func(*args, **kwargs)
-            cache.set(cache_key, result, ttl=ttl)
-            return result
+            # Try to get from cache
+            entry = cache.get(cache_key)
+            if entry is not None:
+                value, fresh = _unwrap_entry(entry)
+                if not fresh:
+                    _refresh_in_background(cache, cache_key, compute, ttl, stale_ttl, lock_timeout)
+                return value
+
+            if not single_flight:
+                result = compute()
+                cache.set(cache_key, _wrap_entry(result, ttl, stale_ttl), ttl=ttl + stale_ttl)
+                return result
+
+            # Call the function once and cache the result
+            return _single_flight.do(
+                cache_key,
+                lambda: _compute_locked(cache, cache_key, compute, ttl, stale_ttl, lock_timeout)
+            )
 
         return wrapper
     return decorator
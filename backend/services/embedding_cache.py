@@ -0,0 +1,85 @@
+"""Content-addressed embedding cache stored in Redis as float32 binary."""
+import hashlib
+import redis
+import numpy as np
+from typing import Dict, List, Optional
+from backend.config import get_settings
+from backend.services.cache_service import get_cache_service
+
+
+class EmbeddingCache:
+    """Embedding cache keyed by (model, sha256(text)) on top of CacheService."""
+
+    KEY_PREFIX = "emb"
+
+    def __init__(self, model: str, ttl: Optional[int] = None):
+        """
+        Initialize the cache for one embedding model.
+
+        Args:
+            model: Embedding model name, part of every key
+            ttl: Time to live in seconds (default: settings.embedding_cache_ttl)
+        """
+        self.model = model
+        self.ttl = ttl if ttl is not None else get_settings().embedding_cache_ttl
+
+    def make_key(self, text: str) -> str:
+        """
+        Build the content-addressed key for a text.
+
+        Args:
+            text: Input text
+
+        Returns:
+            Key of the form "emb:{model}:{sha256 hex}"
+        """
+        digest = hashlib.sha256(text.encode('utf-8')).hexdigest()
+        return f"{self.KEY_PREFIX}:{self.model}:{digest}"
+
+    def get_many(self, texts: List[str]) -> List[Optional[List[float]]]:
+        """
+        Look up embeddings for several texts in one round trip.
+
+        Redis failures degrade to a full miss so callers fall back to the API.
+
+        Args:
+            texts: Input texts
+
+        Returns:
+            Embedding or None for each text, in input order
+        """
+        if not texts:
+            return []
+        try:
+            cache = get_cache_service()
+            values = cache.get_bytes_many([self.make_key(text) for text in texts])
+        except (ConnectionError, redis.RedisError):
+            return [None] * len(texts)
+        return [self._decode(value) if value is not None else None for value in values]
+
+    def set_many(self, embeddings: Dict[str, List[float]]) -> None:
+        """
+        Store embeddings for several texts in one pipelined round trip.
+
+        Redis failures are ignored; the cache is best-effort.
+
+        Args:
+            embeddings: Text -> embedding
+        """
+        if not embeddings:
+            return
+        mapping = {self.make_key(text): self._encode(vector) for text, vector in embeddings.items()}
+        try:
+            get_cache_service().set_bytes_many(mapping, ttl=self.ttl)
+        except (ConnectionError, redis.RedisError):
+            pass
+
+    @staticmethod
+    def _encode(vector: List[float]) -> bytes:
+        """Pack a vector as little-endian float32 (4 bytes per dimension)"""
+        return np.asarray(vector, dtype='<f4').tobytes()
+
+    @staticmethod
+    def _decode(value: bytes) -> List[float]:
+        """Unpack a little-endian float32 vector"""
+        return np.frombuffer(value, dtype='<f4').tolist()
@@ -1,34 +1,105 @@
 """
 混合检索器
 
-Dense (向量) + Sparse (BM25) 双路召回 + RRF 融合
+Dense (向量) + Sparse (BM25) 双路召回 + RRF / 归一化分数融合
 """
-from typing import List, Dict, Optional
+import threading
+import time
+import numpy as np
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+from typing import Callable, List, Dict, Optional
+from backend.config import get_settings
 from backend.services.sparse_retrieval import get_sparse_retriever
 
+# HybridRetriever.fuse 支持的融合方式
+FUSION_MODES = ('rrf', 'minmax', 'zscore', 'dbsf')
+
+# 每一路召回一个线程池,所有检索器共用
+RETRIEVAL_LEGS = ('sparse', 'dense')
+_executors: Dict[str, ThreadPoolExecutor] = {}
+_executor_lock = threading.Lock()
+
+
+def get_retrieval_executor(leg: str) -> ThreadPoolExecutor:
+    """
+    获取某一路召回的线程池 (首次使用时创建)
+
+    超时的调用无法取消、仍占着线程;两路分开后,变慢的向量检索占满线程时
+    BM25 一路不会排队等到超时
+    """
+    executor = _executors.get(leg)
+    if executor is None:
+        with _executor_lock:
+            executor = _executors.get(leg)
+            if executor is None:
+                executor = _executors[leg] = ThreadPoolExecutor(
+                    max_workers=get_settings().hybrid_max_workers,
+                    thread_name_prefix=f'hybrid-{leg}'
+                )
+    return executor
+
+
+def shutdown_retrieval_executor() -> None:
+    """关闭两路线程池,下次使用时重新创建"""
+    with _executor_lock:
+        executors = list(_executors.values())
+        _executors.clear()
+    for executor in executors:
+        executor.shutdown(wait=False, cancel_futures=True)
+
 
 class HybridRetriever:
     """混合检索器 - 企业级 RAG 核心"""
 
-    def __init__(self):
-        """初始化混合检索器"""
+    def __init__(self, embedding_service=None, vector_store=None):
+        """
+        初始化混合检索器
+
+        Args:
+            embedding_service: 向量化服务 (默认使用服务容器中的共享实例)
+            vector_store: Qdrant 向量库 (默认使用服务容器中的共享实例)
+        """
         self.sparse_retriever = get_sparse_retriever()
+        self._embedding_service = embedding_service
+        self._vector_store = vector_store
         self._mock_dense_retrieval = False  # 测试模式
 
-    def index_documents(self, pdf_id: str, chunks: List[Dict]):
+        settings = get_settings()
+        self.dense_timeout = settings.hybrid_dense_timeout
+        self.sparse_timeout = settings.hybrid_sparse_timeout
+        self.candidates = settings.hybrid_candidates
+        self.fusion = settings.hybrid_fusion
+        self.rrf_k = settings.hybrid_rrf_k
+
+    @property
+    def embedding_service(self):
+        """向量化服务,首次使用时从服务容器获取"""
+        if self._embedding_service is None:
+            from backend.container import get_container
+            self._embedding_service = get_container().embedding_service
+        return self._embedding_service
+
+    @property
+    def vector_store(self):
+        """Qdrant 向量库,首次使用时从服务容器获取"""
+        if self._vector_store is None:
+            from backend.container import get_container
+            self._vector_store = get_container().vector_store
+        return self._vector_store
+
+    def index_sparse(self, pdf_id: str, chunks: List[Dict]):
         """
-        索引文档
+        只建立 BM25 索引 (测试和基准用)
+
+        向量一路由 PDFPipeline.process_pdf 写入 Qdrant,与 BM25 共用块 ID;
+        两路都需要时走 pipeline
 
         Args:
             pdf_id: PDF ID
-            chunks: 文档块列表
+            chunks: 文档块列表 (需带 id)
         """
-        # 索引到 BM25
         self.sparse_retriever.index_document(pdf_id, chunks)
-
-        # TODO: 索引到 Qdrant (向量数据库)
-        # 当前阶段暂不实现,等 Phase 3 集成
-        print(f"[Hybrid] Indexed {len(chunks)} chunks for {pdf_id}")
+        print(f"[Hybrid] Indexed {len(chunks)} chunks for {pdf_id} (BM25 only)")
 
     def retrieve(
         self,
@@ -36,7 +107,8 @@ class HybridRetriever:
         pdf_id: str,
         top_k: int = 5,
         dense_weight: float = 0.5,
-        sparse_weight: float = 0.5
+        sparse_weight: float = 0.5,
+        fusion: Optional[str] = None
     ) -> List[Dict]:
         """
         混合检索
@@ -45,88 +117,301 @@ class HybridRetriever:
             query: 查询文本
             pdf_id: PDF ID
             top_k: 返回 Top-K
-            dense_weight: 向量检索权重 (暂未使用)
-            sparse_weight: BM25 权重 (暂未使用)
+            dense_weight: 向量检索权重
+            sparse_weight: BM25 权重
+            fusion: 融合方式 rrf | minmax | zscore | dbsf (默认取配置)
 
         Returns:
             融合后的检索结果
         """
-        # 1. BM25 稀疏检索
-        sparse_results = self.sparse_retriever.retrieve(
-            query,
-            pdf_id,
-            top_k=20
+        return self._retrieve_legs(
+            lambda: self.sparse_retriever.retrieve(query, pdf_id, self.candidates),
+            lambda: self.dense_retrieve(query, pdf_id, self.candidates),
+            top_k, dense_weight, sparse_weight, fusion
         )
 
-        # 2. 向量密集检索
+    def retrieve_library(
+        self,
+        query: str,
+        pdf_ids: Optional[List[str]] = None,
+        top_k: int = 5,
+        dense_weight: float = 0.5,
+        sparse_weight: float = 0.5,
+        fusion: Optional[str] = None
+    ) -> List[Dict]:
+        """
+        跨 PDF 混合检索
+
+        BM25 一路使用全库索引 (全局 idf),向量一路用 pdf_id 的 MatchAny 过滤,
+        结果带 pdf_id
+
+        Args:
+            query: 查询文本
+            pdf_ids: 只在这些 PDF 中检索 (默认全部)
+            top_k: 返回 Top-K
+            dense_weight: 向量检索权重
+            sparse_weight: BM25 权重
+            fusion: 融合方式 rrf | minmax | zscore | dbsf (默认取配置)
+
+        Returns:
+            融合后的检索结果
+        """
+        return self._retrieve_legs(
+            lambda: self.sparse_retriever.retrieve_library(query, pdf_ids, self.candidates),
+            lambda: self.dense_retrieve_library(query, pdf_ids, self.candidates),
+            top_k, dense_weight, sparse_weight, fusion
+        )
+
+    def _retrieve_legs(
+        self,
+        sparse_call: Callable[[], List[Dict]],
+        dense_call: Callable[[], List[Dict]],
+        top_k: int,
+        dense_weight: float,
+        sparse_weight: float,
+        fusion: Optional[str]
+    ) -> List[Dict]:
+        """并发执行两路召回并融合"""
+        # 1. 两路在各自的线程池中并发召回,延迟取较慢的一路;各自超时/失败时返回空结果
+        started = time.monotonic()
+        sparse_future = get_retrieval_executor('sparse').submit(sparse_call)
         if self._mock_dense_retrieval:
-            # 测试模式: 使用 sparse 结果模拟
-            dense_results = sparse_results.copy()
+            dense_future = None
         else:
-            # TODO: 调用 Qdrant 检索 (Phase 3 实现)
-            dense_results = []
+            dense_future = get_retrieval_executor('dense').submit(dense_call)
 
-        # 3. RRF 融合
-        if dense_results:
-            merged = self.rrf_fusion(dense_results, sparse_results)
+        sparse_results = self._collect('sparse', sparse_future, started + self.sparse_timeout)
+        if dense_future is None:
+            # 测试模式: 使用 sparse 结果模拟
+            dense_results = list(sparse_results)
         else:
-            # 如果没有向量结果,只用 BM25
-            merged = sparse_results
+            dense_results = self._collect('dense', dense_future, started + self.dense_timeout)
 
-        # 4. 取 Top-K
+        # 2. 分数融合 (某一路无命中、超时或失败时同样融合,结果字段保持一致)
+        merged = self.fuse(
+            dense_results, sparse_results,
+            mode=fusion or self.fusion,
+            dense_weight=dense_weight,
+            sparse_weight=sparse_weight,
+            k=self.rrf_k
+        )
+
+        # 3. 取 Top-K
         return merged[:top_k]
 
+    def dense_retrieve(self, query: str, pdf_id: str, top_k: int = 20) -> List[Dict]:
+        """
+        向量检索 (Qdrant)
+
+        Args:
+            query: 查询文本
+            pdf_id: PDF ID
+            top_k: 返回 Top-K 结果
+
+        Returns:
+            检索结果列表,id 与 BM25 索引中的块 ID 一致
+        """
+        query_vector = self.embedding_service.get_embedding(query, timeout=self.dense_timeout)
+        return self._format_dense_hits(self.vector_store.search(query_vector, pdf_id, limit=top_k))
+
+    def dense_retrieve_library(
+        self,
+        query: str,
+        pdf_ids: Optional[List[str]] = None,
+        top_k: int = 20
+    ) -> List[Dict]:
+        """
+        跨 PDF 向量检索
+
+        Args:
+            query: 查询文本
+            pdf_ids: 只在这些 PDF 中检索 (默认全部)
+            top_k: 返回 Top-K 结果
+
+        Returns:
+            检索结果列表,每个结果包含 pdf_id
+        """
+        query_vector = self.embedding_service.get_embedding(query, timeout=self.dense_timeout)
+        return self._format_dense_hits(self.vector_store.search_library(query_vector, pdf_ids, limit=top_k))
+
+    @staticmethod
+    def _format_dense_hits(hits) -> List[Dict]:
+        """Qdrant 命中转为与 BM25 结果相同的结构"""
+        results = []
+        for hit in hits:
+            payload = hit.payload
+            results.append({
+                # 旧数据没有 source_id,退化为 Qdrant 点 ID (只能在本路内去重)
+                'id': payload.get('source_id') or payload['chunk_id'],
+                'pdf_id': payload['pdf_id'],
+                'text': payload['text'],
+                'page': payload['page_num'],
+                'page_end': payload.get('page_end', payload['page_num']),
+                'chunk_id': payload['chunk_id'],
+                'score': hit.score,
+                'retrieval_method': 'dense'
+            })
+        return results
+
+    def _collect(self, leg: str, future, deadline: float) -> List[Dict]:
+        """
+        等待一路召回结果,超时或出错时返回空列表
+
+        超时的查询不会被中断,在后台线程中结束后丢弃结果;向量一路的 HTTP 调用
+        同样以 dense_timeout 为超时,线程不会被长时间占用
+        """
+        try:
+            return future.result(timeout=max(deadline - time.monotonic(), 0))
+        except FutureTimeoutError:
+            future.cancel()
+            print(f"[Hybrid] {leg} retrieval timed out, falling back")
+        except Exception as e:
+            print(f"[Hybrid] {leg} retrieval failed, falling back: {e}")
+        return []
+
     def rrf_fusion(
         self,
         dense_results: List[Dict],
         sparse_results: List[Dict],
-        k: int = 60
+        k: int = 60,
+        dense_weight: float = 1.0,
+        sparse_weight: float = 1.0
     ) -> List[Dict]:
         """
         RRF (Reciprocal Rank Fusion) 融合算法
 
-        Score = sum(1 / (k + rank))
+        Score = sum(weight / (k + rank))
 
         Args:
             dense_results: 向量检索结果
             sparse_results: BM25 检索结果
             k: 常数 (通常 60)
+            dense_weight: 向量检索权重
+            sparse_weight: BM25 权重
 
         Returns:
             融合后的结果列表
         """
-        scores = {}
-        doc_map = {}
+        return self.fuse(
+            dense_results, sparse_results, mode='rrf',
+            dense_weight=dense_weight, sparse_weight=sparse_weight, k=k
+        )
 
-        # 处理 dense 结果
-        for rank, doc in enumerate(dense_results, start=1):
-            doc_id = doc['id']
-            scores[doc_id] = scores.get(doc_id, 0) + 1 / (k + rank)
-            if doc_id not in doc_map:
-                doc_map[doc_id] = doc
+    def fuse(
+        self,
+        dense_results: List[Dict],
+        sparse_results: List[Dict],
+        mode: str = 'rrf',
+        dense_weight: float = 1.0,
+        sparse_weight: float = 1.0,
+        k: int = 60
+    ) -> List[Dict]:
+        """
+        融合两路召回结果
+
+        mode:
+        - rrf: 加权 RRF,weight / (k + rank),只看排名
+        - minmax: 每路分数 min-max 归一化到 [0, 1] 后加权求和
+        - zscore: 每路分数标准化 (减均值除标准差) 后加权求和
+        - dbsf: 分布归一化 (Distribution-Based Score Fusion),
+          把 [均值 - 3σ, 均值 + 3σ] 映射到 [0, 1] 并截断后加权求和
+
+        某一路未召回的文档在该路取最低的归一化分数 (rrf 为 0)
+
+        Args:
+            dense_results: 向量检索结果
+            sparse_results: BM25 检索结果
+            mode: 融合方式 (见上)
+            dense_weight: 向量检索权重
+            sparse_weight: BM25 权重
+            k: RRF 常数
+
+        Returns:
+            融合后的结果列表,每个结果包含 fusion_score 以及
+            dense_rank/dense_score/sparse_rank/sparse_score (未召回时为 None)
+        """
+        if mode not in FUSION_MODES:
+            raise ValueError(f"Unknown fusion mode '{mode}', expected one of {FUSION_MODES}")
+
+        # 两路结果的并集 (先出现的文档作为结果基础)
+        doc_map: Dict[str, Dict] = {}
+        for doc in list(dense_results) + list(sparse_results):
+            doc_map.setdefault(doc['id'], doc)
+        doc_ids = list(doc_map)
+        position = {doc_id: i for i, doc_id in enumerate(doc_ids)}
+
+        fused = np.zeros(len(doc_ids), dtype=np.float64)
+        legs = {}
+        for leg, results, weight in (
+            ('dense', dense_results, dense_weight),
+            ('sparse', sparse_results, sparse_weight)
+        ):
+            positions = np.fromiter((position[doc['id']] for doc in results), dtype=np.int64, count=len(results))
+            ranks = np.arange(1, len(results) + 1)
+            scores = np.fromiter((doc.get('score', 0.0) for doc in results), dtype=np.float64, count=len(results))
+            legs[leg] = (positions, ranks, scores)
+            if not len(results):
+                continue
 
-        # 处理 sparse 结果
-        for rank, doc in enumerate(sparse_results, start=1):
-            doc_id = doc['id']
-            scores[doc_id] = scores.get(doc_id, 0) + 1 / (k + rank)
-            if doc_id not in doc_map:
-                doc_map[doc_id] = doc
+            normalized = self._normalize_leg(mode, ranks, scores, k)
+            contribution = np.full(len(doc_ids), 0.0 if mode == 'rrf' else normalized.min())
+            # 同一路内的重复 ID 只计第一次出现
+            _, first = np.unique(positions, return_index=True)
+            contribution[positions[first]] = normalized[first]
+            fused += weight * contribution
 
-        # 排序
-        ranked = sorted(scores.items(), key=lambda x: x[1], reverse=True)
+        order = np.argsort(-fused, kind='stable')
+
+        # 每路的排名和原始分数 (调试用)
+        leg_rank = {leg: np.zeros(len(doc_ids), dtype=np.int64) for leg in legs}
+        leg_score = {leg: np.zeros(len(doc_ids), dtype=np.float64) for leg in legs}
+        for leg, (positions, ranks, scores) in legs.items():
+            # 倒序写入,重复 ID 保留第一次出现的排名
+            leg_rank[leg][positions[::-1]] = ranks[::-1]
+            leg_score[leg][positions[::-1]] = scores[::-1]
 
-        # 构建结果
         results = []
-        for doc_id, score in ranked:
-            doc = doc_map[doc_id].copy()
-            doc['rrf_score'] = score
+        for i in order:
+            doc = doc_map[doc_ids[i]].copy()
+            score = float(fused[i])
+            doc['fusion_score'] = score
+            if mode == 'rrf':
+                doc['rrf_score'] = score
+            doc['fusion'] = mode
+            for leg in legs:
+                found = leg_rank[leg][i] > 0
+                doc[f'{leg}_rank'] = int(leg_rank[leg][i]) if found else None
+                doc[f'{leg}_score'] = float(leg_score[leg][i]) if found else None
             doc['retrieval_method'] = 'hybrid'
             results.append(doc)
 
-        print(f"[Hybrid] RRF fusion: {len(results)} unique documents")
+        print(f"[Hybrid] {mode} fusion: {len(results)} unique documents")
 
         return results
 
+    @staticmethod
+    def _normalize_leg(mode: str, ranks: np.ndarray, scores: np.ndarray, k: int) -> np.ndarray:
+        """按融合方式归一化一路的分数"""
+        if mode == 'rrf':
+            return 1.0 / (k + ranks)
+
+        if mode == 'minmax':
+            low, high = scores.min(), scores.max()
+            if high == low:
+                return np.ones_like(scores)
+            return (scores - low) / (high - low)
+
+        mean, std = scores.mean(), scores.std()
+        if std == 0:
+            # 分数全相同: zscore 为 0,dbsf 取区间中点
+            return np.full_like(scores, 0.0 if mode == 'zscore' else 0.5)
+        if mode == 'zscore':
+            return (scores - mean) / std
+
+        # dbsf
+        low = mean - 3 * std
+        return np.clip((scores - low) / (6 * std), 0.0, 1.0)
+
 
 # 全局单例
 _hybrid_retriever = None
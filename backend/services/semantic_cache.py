@@ -0,0 +1,236 @@
+"""
+语义答案缓存
+
+按问题向量的余弦相似度复用同一 PDF 下的历史答案,跳过检索和 LLM 调用
+
+缓存保存在各进程内存中;重新索引由 Celery worker 完成,因此失效通过 Redis 中
+按 pdf_id 递增的代数 (generation) 传播,查询时代数不一致的桶整体丢弃
+"""
+import asyncio
+import threading
+import time
+import numpy as np
+from collections import OrderedDict
+from typing import Callable, Dict, List, Optional
+from backend.config import get_settings
+
+
+class _PDFBucket:
+    """单个 PDF 的缓存条目 (LRU 顺序) 及其向量矩阵"""
+
+    def __init__(self, generation: int = 0):
+        # 创建时的失效代数,与 Redis 中的代数不一致即视为过期
+        self.generation = generation
+        # {entry_id: (expires_at, 归一化向量, 答案 payload)}
+        self.entries: "OrderedDict[int, tuple]" = OrderedDict()
+        self._matrix: Optional[np.ndarray] = None
+        self._ids: List[int] = []
+
+    def matrix(self):
+        """返回 (条目 ID 列表, 向量矩阵),条目变化后惰性重建"""
+        if self._matrix is None:
+            self._ids = list(self.entries)
+            self._matrix = np.stack([self.entries[i][1] for i in self._ids]) if self._ids else None
+        return self._ids, self._matrix
+
+    def mark_dirty(self):
+        """条目增删后使向量矩阵失效"""
+        self._matrix = None
+
+
+class SemanticAnswerCache:
+    """按 pdf_id 分桶的语义答案缓存,支持 TTL + LRU 淘汰"""
+
+    GENERATION_KEY = 'semantic_cache:generation:{pdf_id}'
+    # Redis 连接失败后,至少间隔多少秒再重试
+    REDIS_RETRY_SECONDS = 30
+
+    def __init__(
+        self,
+        threshold: Optional[float] = None,
+        ttl: Optional[int] = None,
+        max_entries: Optional[int] = None,
+        redis_client=None,
+        redis_factory: Optional[Callable] = None
+    ):
+        """
+        初始化缓存
+
+        Args:
+            threshold: 命中所需的最小余弦相似度
+            ttl: 条目存活秒数
+            max_entries: 每个 PDF 最多保留的条目数
+            redis_client: 同步 Redis 客户端,用于跨进程失效;None 时仅在本进程内失效
+            redis_factory: 返回 Redis 客户端的函数,未传 redis_client 时惰性调用,
+                失败后每隔 REDIS_RETRY_SECONDS 秒重试
+        """
+        settings = get_settings()
+        self.threshold = threshold if threshold is not None else settings.semantic_cache_threshold
+        self.ttl = ttl if ttl is not None else settings.semantic_cache_ttl
+        self.max_entries = max_entries if max_entries is not None else settings.semantic_cache_max_entries
+
+        self.redis = redis_client
+        self._redis_factory = redis_factory
+        self._redis_retry_at = 0.0
+        self._buckets: Dict[str, _PDFBucket] = {}
+        self._lock = threading.Lock()
+        self._next_id = 0
+        self.hits = 0
+        self.misses = 0
+
+    def lookup(self, pdf_id: str, question_vector: List[float]) -> Optional[Dict]:
+        """
+        查找语义相近问题的缓存答案
+
+        Args:
+            pdf_id: PDF ID
+            question_vector: 问题向量
+
+        Returns:
+            缓存的答案 (answer, cited_pages, sources),未命中返回 None
+        """
+        query = self._normalize(question_vector)
+        generation = self._generation(pdf_id)
+        now = time.monotonic()
+
+        with self._lock:
+            bucket = self._current_bucket(pdf_id, generation)
+            if bucket is not None:
+                self._evict_expired(bucket, now)
+                ids, matrix = bucket.matrix()
+                if matrix is not None:
+                    similarities = matrix @ query
+                    best = int(np.argmax(similarities))
+                    if similarities[best] >= self.threshold:
+                        entry_id = ids[best]
+                        bucket.entries.move_to_end(entry_id)
+                        self.hits += 1
+                        return dict(bucket.entries[entry_id][2])
+
+            self.misses += 1
+            return None
+
+    async def alookup(self, pdf_id: str, question_vector: List[float]) -> Optional[Dict]:
+        """lookup 的异步版本: 同步的 Redis 读取在线程中执行,不阻塞事件循环"""
+        return await asyncio.to_thread(self.lookup, pdf_id, question_vector)
+
+    async def astore(self, pdf_id: str, question_vector: List[float], answer: Dict) -> None:
+        """store 的异步版本 (见 alookup)"""
+        await asyncio.to_thread(self.store, pdf_id, question_vector, answer)
+
+    def store(self, pdf_id: str, question_vector: List[float], answer: Dict) -> None:
+        """
+        缓存一个答案
+
+        Args:
+            pdf_id: PDF ID
+            question_vector: 问题向量
+            answer: 答案 payload (answer, cited_pages, sources)
+        """
+        vector = self._normalize(question_vector)
+        generation = self._generation(pdf_id)
+
+        with self._lock:
+            bucket = self._current_bucket(pdf_id, generation)
+            if bucket is None:
+                bucket = self._buckets[pdf_id] = _PDFBucket(generation or 0)
+            entry_id = self._next_id
+            self._next_id += 1
+            bucket.entries[entry_id] = (time.monotonic() + self.ttl, vector, dict(answer))
+            while len(bucket.entries) > self.max_entries:
+                bucket.entries.popitem(last=False)
+            bucket.mark_dirty()
+
+    def invalidate(self, pdf_id: str) -> None:
+        """
+        PDF 重新索引后清除其全部缓存答案
+
+        本进程立即清除;同时递增 Redis 中的代数,其他进程在下次查询时丢弃旧桶
+        """
+        with self._lock:
+            self._buckets.pop(pdf_id, None)
+
+        redis_client = self._redis_client()
+        if redis_client is not None:
+            try:
+                redis_client.incr(self.GENERATION_KEY.format(pdf_id=pdf_id))
+            except Exception as e:
+                print(f"[SemanticCache] Failed to publish invalidation for {pdf_id}: {e}")
+
+    def stats(self) -> Dict:
+        """命中率统计"""
+        total = self.hits + self.misses
+        with self._lock:
+            entries = sum(len(b.entries) for b in self._buckets.values())
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': self.hits / total if total else 0.0,
+            'entries': entries,
+            'pdfs': len(self._buckets)
+        }
+
+    def _generation(self, pdf_id: str) -> Optional[int]:
+        """读取 Redis 中的失效代数;未配置或读取失败时返回 None (不做跨进程校验)"""
+        redis_client = self._redis_client()
+        if redis_client is None:
+            return None
+        try:
+            value = redis_client.get(self.GENERATION_KEY.format(pdf_id=pdf_id))
+        except Exception as e:
+            print(f"[SemanticCache] Failed to read generation for {pdf_id}: {e}")
+            return None
+        return int(value) if value else 0
+
+    def _redis_client(self):
+        """Redis 客户端;尚未连接时通过 redis_factory 惰性连接 (失败后限频重试)"""
+        if self.redis is not None or self._redis_factory is None:
+            return self.redis
+        now = time.monotonic()
+        if now < self._redis_retry_at:
+            return None
+        try:
+            self.redis = self._redis_factory()
+        except Exception as e:
+            self._redis_retry_at = now + self.REDIS_RETRY_SECONDS
+            print(f"[SemanticCache] Redis unavailable, invalidation stays in-process for now: {e}")
+        return self.redis
+
+    def _current_bucket(self, pdf_id: str, generation: Optional[int]) -> Optional[_PDFBucket]:
+        """返回 pdf_id 的缓存桶;其他进程已失效 (代数变化) 时丢弃并返回 None (需持有锁)"""
+        bucket = self._buckets.get(pdf_id)
+        if bucket is not None and generation is not None and bucket.generation != generation:
+            del self._buckets[pdf_id]
+            return None
+        return bucket
+
+    def _evict_expired(self, bucket: _PDFBucket, now: float) -> None:
+        """删除过期条目"""
+        expired = [i for i, (expires_at, _, _) in bucket.entries.items() if expires_at <= now]
+        for entry_id in expired:
+            del bucket.entries[entry_id]
+        if expired:
+            bucket.mark_dirty()
+
+    @staticmethod
+    def _normalize(vector: List[float]) -> np.ndarray:
+        """L2 归一化,之后点积即余弦相似度"""
+        array = np.asarray(vector, dtype=np.float32)
+        norm = np.linalg.norm(array)
+        return array / norm if norm > 0 else array
+
+
+# 全局单例
+_semantic_cache = None
+
+
+def get_semantic_cache() -> SemanticAnswerCache:
+    """获取全局语义答案缓存实例 (Redis 不可用期间仅在本进程内失效,之后自动重连)"""
+    global _semantic_cache
+    if _semantic_cache is None:
+        def redis_factory():
+            from backend.services.cache_service import get_cache_service
+            return get_cache_service().redis
+
+        _semantic_cache = SemanticAnswerCache(redis_factory=redis_factory)
+    return _semantic_cache
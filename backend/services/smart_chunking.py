@@ -4,7 +4,9 @@
 基于语义边界的动态分块,保持语义完整性
 """
 import re
-from typing import List, Dict
+from collections import deque
+from itertools import islice
+from typing import Dict, Iterable, Iterator, List, Tuple
 
 
 class SmartChunker:
@@ -25,45 +27,80 @@ class SmartChunker:
             overlap: 重叠 token 数
 
         Returns:
-            分块列表,每个块包含 text 和 tokens
+            分块列表,每个块包含 text, tokens 及 char_start/char_end 字符偏移
         """
-        # 1. 句子分割
-        sentences = self.split_sentences(text)
+        chunks = self.chunk_pages([{'page_num': 1, 'text': text}], max_tokens, overlap)
+        for chunk in chunks:
+            del chunk['page'], chunk['page_end']
+        return chunks
 
-        if not sentences:
-            return []
+    def chunk_pages(
+        self,
+        pages: Iterable[Dict],
+        max_tokens: int = 512,
+        overlap: int = 50
+    ) -> List[Dict]:
+        """
+        按页流式分块,保留每个块的页码范围和字符偏移
+
+        页面逐个读取,不拼接全文;页与页之间视为段落边界。
+        对经过 PDFProcessor._clean_text 清洗 (无换行、首尾无空白) 的非空页面,
+        且页面不以句子分隔符 (。!?;) 开头时,结果与对 '\n\n'.join(页面文本)
+        调用 chunk 一致;否则分隔符不会与上一页末句合并,切分可能不同
 
+        Args:
+            pages: 页面可迭代对象,每页包含 page_num 和 text
+            max_tokens: 最大 token 数
+            overlap: 重叠 token 数
+
+        Returns:
+            分块列表,每个块包含 text, tokens, page (起始页), page_end (结束页),
+            char_start (起始页内偏移), char_end (结束页内偏移,不含)
+        """
         chunks = []
+        # 当前块的句子: (句子, 页码, 页内起始偏移, 页内结束偏移)
         current_chunk = []
         current_tokens = 0
 
-        for i, sent in enumerate(sentences):
-            sent_tokens = self.count_tokens(sent)
+        def emit():
+            first, last = current_chunk[0], current_chunk[-1]
+            chunks.append({
+                'text': ''.join(s[0] for s in current_chunk),
+                'tokens': current_tokens,
+                'page': first[1],
+                'page_end': last[1],
+                'char_start': first[2],
+                'char_end': last[3]
+            })
+
+        def carry_overlap():
+            # 3. Overlap 处理: 保留最后两句
+            if overlap > 0 and len(current_chunk) >= 2:
+                kept = current_chunk[-2:]
+                return kept, sum(self.count_tokens(s[0]) for s in kept)
+            return [], 0
+
+        sentences = self._iter_page_sentences(pages)
+        lookahead = deque(islice(sentences, 3))
+
+        while lookahead:
+            sent = lookahead.popleft()
+            next_item = next(sentences, None)
+            if next_item is not None:
+                lookahead.append(next_item)
+
+            sent_tokens = self.count_tokens(sent[0])
 
             # 2. 检查语义边界
-            next_sents = sentences[i+1:i+3] if i+1 < len(sentences) else []
-            is_boundary = self.is_semantic_boundary(sent, next_sents)
+            next_sents = [s[0] for s in islice(lookahead, 2)]
+            is_boundary = self.is_semantic_boundary(sent[0], next_sents)
 
             # 如果是边界且当前块已有内容,切分
             # 段落边界(\n\n)优先级更高,不需要 token 限制
-            is_paragraph_boundary = '\n\n' in sent
+            is_paragraph_boundary = '\n\n' in sent[0]
             if is_boundary and current_chunk and (is_paragraph_boundary or current_tokens > 200):
-                chunk_text = ''.join(current_chunk)
-                chunks.append({
-                    'text': chunk_text,
-                    'tokens': current_tokens
-                })
-
-                # 3. Overlap 处理
-                if overlap > 0 and len(current_chunk) >= 2:
-                    overlap_sents = current_chunk[-2:]
-                    current_chunk = overlap_sents
-                    current_tokens = sum(
-                        self.count_tokens(s) for s in overlap_sents
-                    )
-                else:
-                    current_chunk = []
-                    current_tokens = 0
+                emit()
+                current_chunk, current_tokens = carry_overlap()
 
             # 添加当前句子
             current_chunk.append(sent)
@@ -71,33 +108,34 @@ class SmartChunker:
 
             # 4. 超长强制切分
             if current_tokens >= max_tokens:
-                chunk_text = ''.join(current_chunk)
-                chunks.append({
-                    'text': chunk_text,
-                    'tokens': current_tokens
-                })
-
-                # Overlap
-                if overlap > 0 and len(current_chunk) >= 2:
-                    overlap_sents = current_chunk[-2:]
-                    current_chunk = overlap_sents
-                    current_tokens = sum(
-                        self.count_tokens(s) for s in overlap_sents
-                    )
-                else:
-                    current_chunk = []
-                    current_tokens = 0
+                emit()
+                current_chunk, current_tokens = carry_overlap()
 
         # 最后一个块
         if current_chunk:
-            chunk_text = ''.join(current_chunk)
-            chunks.append({
-                'text': chunk_text,
-                'tokens': current_tokens
-            })
+            emit()
 
         return chunks
 
+    def _iter_page_sentences(self, pages: Iterable[Dict]) -> Iterator[Tuple[str, int, int, int]]:
+        """
+        逐页切分句子,产出 (句子, 页码, 页内起始偏移, 页内结束偏移)
+
+        上一页的末句追加 '\n\n' 作为段落边界 (不计入字符偏移)
+        """
+        previous = None
+        for page in pages:
+            page_start = True
+            for sent, start in self._split_sentence_spans(page['text']):
+                if previous is not None:
+                    if page_start:
+                        previous = (previous[0] + '\n\n',) + previous[1:]
+                    yield previous
+                page_start = False
+                previous = (sent, page['page_num'], start, start + len(sent))
+        if previous is not None:
+            yield previous
+
     def is_semantic_boundary(self, current: str, next_sents: List[str]) -> bool:
         """
         判断是否语义边界
@@ -135,22 +173,36 @@ class SmartChunker:
         Returns:
             句子列表
         """
+        return [sent for sent, _ in self._split_sentence_spans(text)]
+
+    def _split_sentence_spans(self, text: str) -> List[Tuple[str, int]]:
+        """
+        句子分割,同时返回每个句子在 text 中的起始偏移
+
+        Args:
+            text: 输入文本
+
+        Returns:
+            (句子, 起始偏移) 列表
+        """
         # 使用标点符号分割
         sentences = re.split(r'([。!?;;\n]+)', text)
 
         # 合并标点到句子
         result = []
+        offset = 0
         for i in range(0, len(sentences)-1, 2):
             sent = sentences[i]
             if i+1 < len(sentences):
                 sent += sentences[i+1]
 
             if sent.strip():
-                result.append(sent)
+                result.append((sent, offset))
+            offset += len(sent)
 
         # 处理最后一个句子(如果没有标点)
         if len(sentences) % 2 == 1 and sentences[-1].strip():
-            result.append(sentences[-1])
+            result.append((sentences[-1], offset))
 
         return result
 
@@ -3,23 +3,94 @@ BM25 稀疏检索器
 
 使用 BM25 算法进行关键词检索,适合精确匹配场景
 """
-from rank_bm25 import BM25Okapi
 import jieba
-import numpy as np
-from typing import List, Dict, Optional
+import logging
+import multiprocessing
+import os
+import threading
+from contextlib import contextmanager
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache
+from typing import Callable, Iterable, List, Dict, Optional, Sequence
+from backend.config import get_settings
+from backend.services.bm25_index import BM25Index, BM25IndexStore, LibraryIndex
+
+logger = logging.getLogger(__name__)
+
+
+def _tokenize(text: str) -> List[str]:
+    """jieba 分词并过滤空白 token"""
+    return [t.strip() for t in jieba.cut(text) if t.strip()]
+
+
+def _tokenize_texts(texts: Sequence[str]) -> List[List[str]]:
+    """进程池 worker 入口: 对一批文本分词"""
+    return [_tokenize(text) for text in texts]
+
+
+def warm_up_tokenizer():
+    """
+    预加载 jieba 词典 (首次加载约 1 秒)
+
+    在 API 启动和 Celery worker 启动时调用,避免首个请求承担冷启动;
+    之后 fork 的子进程直接继承已加载的词典
+    """
+    jieba.initialize()
 
 
 class SparseRetriever:
     """BM25 稀疏检索器"""
 
-    def __init__(self):
-        """初始化检索器"""
-        # {pdf_id: BM25Okapi 实例}
-        self.bm25_index: Dict[str, BM25Okapi] = {}
+    # 已删除块占比达到该值时压缩索引
+    COMPACT_DELETED_RATIO = 0.25
+    # 全库索引在存储中的名字 (pdf_id 为 UUID,不会冲突)
+    LIBRARY_ID = '_library'
+    # 全库索引锁的过期时间和最长等待时间 (秒)
+    LIBRARY_LOCK_TIMEOUT = 120
+    LIBRARY_LOCK_WAIT = 60
+    # 全库索引更新失败后,延迟多少秒在后台重新同步
+    LIBRARY_RETRY_DELAY = 30
+
+    def __init__(self, store: Optional[BM25IndexStore] = None):
+        """
+        初始化检索器
+
+        Args:
+            store: 索引持久化存储 (默认按 Settings 配置)
+        """
+        # {pdf_id: BM25Index 实例}
+        self.bm25_index: Dict[str, BM25Index] = {}
 
         # {pdf_id: [文档列表]}
         self.documents: Dict[str, List[Dict]] = {}
 
+        # 索引写入共享存储,其他进程 (API / Celery worker) 按需加载
+        self.store = store if store is not None else BM25IndexStore()
+
+        # 写时复制: 修改在索引副本上进行,完成后替换引用;写者之间用 _write_lock 串行,
+        # _swap_lock 保证读者拿到的索引和文档列表属于同一版本
+        self._write_lock = threading.RLock()
+        self._swap_lock = threading.Lock()
+
+        settings = get_settings()
+        # 跨 PDF 检索用的全库索引 (全局 idf)
+        self.library: Optional[LibraryIndex] = None
+        self.library_enabled = settings.bm25_library_enabled
+        # 全库索引更新失败、等待后台同步的 PDF
+        self._library_pending: set = set()
+        self._reconcile_timer: Optional[threading.Timer] = None
+        self._reconcile_lock = threading.Lock()
+        self.tokenize_workers = settings.bm25_tokenize_workers or os.cpu_count() or 1
+        self.parallel_min_texts = settings.bm25_tokenize_parallel_min
+        # 查询分词 LRU 缓存 (返回 tuple,避免调用方修改缓存内容)
+        self._cached_query_tokens = lru_cache(maxsize=settings.bm25_query_cache_size)(
+            lambda query: tuple(_tokenize(query))
+        )
+
+    def warm_up(self):
+        """预加载分词词典"""
+        warm_up_tokenizer()
+
     def tokenize(self, text: str) -> List[str]:
         """
         中文分词
@@ -30,13 +101,58 @@ class SparseRetriever:
         Returns:
             分词后的 token 列表
         """
-        # 使用 jieba 分词
-        tokens = list(jieba.cut(text))
+        return _tokenize(text)
+
+    def tokenize_batch(self, texts: Sequence[str]) -> List[List[str]]:
+        """
+        批量分词,文本较多时用进程池并行
+
+        Args:
+            texts: 文本列表
+
+        Returns:
+            与输入顺序一致的 token 列表
+        """
+        workers = min(self.tokenize_workers, len(texts))
+        if workers <= 1 or len(texts) < self.parallel_min_texts or self._in_daemon_process():
+            return _tokenize_texts(texts)
+
+        # 切成多于进程数的批次,长短不一的文本也能均衡
+        batches = self._split_batches(texts, workers * 4)
+        tokenized = []
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            # executor.map 按提交顺序返回
+            for batch in executor.map(_tokenize_texts, batches):
+                tokenized.extend(batch)
+        return tokenized
+
+    def tokenize_query(self, query: str) -> List[str]:
+        """
+        查询分词 (LRU 缓存)
+
+        Args:
+            query: 查询文本
+
+        Returns:
+            分词后的 token 列表
+        """
+        return list(self._cached_query_tokens(query))
 
-        # 过滤空白符
-        tokens = [t.strip() for t in tokens if t.strip()]
+    def _split_batches(self, texts: Sequence[str], count: int) -> List[Sequence[str]]:
+        """切分为 count 个连续、大小接近的批次"""
+        size, remainder = divmod(len(texts), count)
+        batches = []
+        start = 0
+        for i in range(count):
+            end = start + size + (1 if i < remainder else 0)
+            if end > start:
+                batches.append(texts[start:end])
+            start = end
+        return batches
 
-        return tokens
+    def _in_daemon_process(self) -> bool:
+        """守护进程 (如 Celery prefork 子进程) 不能再创建进程池"""
+        return multiprocessing.current_process().daemon
 
     def index_document(self, pdf_id: str, chunks: List[Dict]):
         """
@@ -46,20 +162,133 @@ class SparseRetriever:
             pdf_id: PDF 唯一 ID
             chunks: 文档块列表,每个块包含 id, text, page
         """
-        # 分词所有文档
-        tokenized_docs = []
-        for chunk in chunks:
-            tokens = self.tokenize(chunk['text'])
-            tokenized_docs.append(tokens)
+        # 分词所有文档 (大文档并行)
+        tokenized_docs = self.tokenize_batch([chunk['text'] for chunk in chunks])
 
         # 建立 BM25 索引
-        self.bm25_index[pdf_id] = BM25Okapi(tokenized_docs)
+        index = BM25Index.build(tokenized_docs)
+
+        # 替换全库索引中该 PDF 的块
+        def replace(library: LibraryIndex):
+            old_slots = library.chunk_slots(pdf_id)
+            if old_slots:
+                library.remove_slots(old_slots, self.tokenize_batch(
+                    [library.documents[slot]['text'] for slot in old_slots]
+                ))
+            library.add_chunks(pdf_id, chunks, tokenized_docs)
 
-        # 存储原始文档
-        self.documents[pdf_id] = chunks
+        with self._write_lock:
+            # 先持久化再替换,失败时仅本进程可用
+            self._persist(pdf_id, index, chunks)
+            self._publish(pdf_id, index, chunks)
+            self._update_library(pdf_id, replace)
 
         print(f"[BM25] Indexed {len(chunks)} chunks for PDF {pdf_id}")
 
+    def add_chunks(self, pdf_id: str, chunks: List[Dict]):
+        """
+        向已有索引增量添加文档块,只对新块分词
+
+        Args:
+            pdf_id: PDF 唯一 ID
+            chunks: 新增的文档块,每个块包含 id, text, page
+        """
+        if self._get_index(pdf_id) is None:
+            self.index_document(pdf_id, chunks)
+            return
+
+        tokenized_docs = self.tokenize_batch([chunk['text'] for chunk in chunks])
+        with self._write_lock:
+            current, documents = self._snapshot(pdf_id)
+            if current is None:
+                # 分词期间被其他线程清除
+                self.index_document(pdf_id, chunks)
+                return
+            index = current.copy()
+            index.add_documents(tokenized_docs)
+            documents = self._maybe_compact(index, documents + list(chunks))
+
+            self._persist(pdf_id, index, documents)
+            self._publish(pdf_id, index, documents)
+            self._update_library(pdf_id, lambda library: library.add_chunks(pdf_id, chunks, tokenized_docs))
+        print(f"[BM25] Added {len(chunks)} chunks to PDF {pdf_id}")
+
+    def remove_chunks(self, pdf_id: str, chunk_ids: List[str]) -> int:
+        """
+        从索引中增量删除文档块,只对被删除的块重新分词以更新词频统计
+
+        Args:
+            pdf_id: PDF 唯一 ID
+            chunk_ids: 要删除的块 ID
+
+        Returns:
+            实际删除的块数
+        """
+        with self._write_lock:
+            self._get_index(pdf_id)
+            current, documents = self._snapshot(pdf_id)
+            if current is None:
+                return 0
+
+            ids = set(chunk_ids)
+            slots = [i for i, chunk in enumerate(documents) if chunk is not None and chunk['id'] in ids]
+            if not slots:
+                return 0
+
+            tokenized_docs = self.tokenize_batch([documents[i]['text'] for i in slots])
+            index = current.copy()
+            index.remove_documents(slots, tokenized_docs)
+            tokens_by_id = {documents[i]['id']: tokens for i, tokens in zip(slots, tokenized_docs)}
+            # 已删除的位置留空,保持文档列表与索引下标对齐
+            documents = list(documents)
+            for i in slots:
+                documents[i] = None
+            documents = self._maybe_compact(index, documents)
+
+            self._persist(pdf_id, index, documents)
+            self._publish(pdf_id, index, documents)
+
+            def remove(library: LibraryIndex):
+                library_slots = library.chunk_slots(pdf_id, tokens_by_id)
+                library.remove_slots(library_slots, [
+                    tokens_by_id[library.documents[slot]['id']] for slot in library_slots
+                ])
+
+            self._update_library(pdf_id, remove)
+        print(f"[BM25] Removed {len(slots)} chunks from PDF {pdf_id}")
+        return len(slots)
+
+    def _maybe_compact(self, index: BM25Index, documents: List[Optional[Dict]]) -> List[Optional[Dict]]:
+        """
+        已删除块超过一定比例时压缩 (尚未发布的) 索引和文档列表,追加段过多时合并末尾的小段
+
+        Returns:
+            与压缩后的索引下标对齐的文档列表
+        """
+        if index.num_deleted and index.num_deleted >= self.COMPACT_DELETED_RATIO * index.num_slots:
+            return [documents[i] for i in index.compact()]
+        if len(index.segments) > index.MAX_SEGMENTS:
+            index.merge_small_segments()
+        return documents
+
+    def _publish(self, pdf_id: str, index: BM25Index, documents: List[Optional[Dict]]):
+        """同时替换 PDF 的索引和文档列表"""
+        with self._swap_lock:
+            self.bm25_index[pdf_id] = index
+            self.documents[pdf_id] = documents
+
+    def _snapshot(self, pdf_id: str):
+        """同一版本的 (索引, 文档列表),不存在时为 (None, None)"""
+        with self._swap_lock:
+            return self.bm25_index.get(pdf_id), self.documents.get(pdf_id)
+
+    def _persist(self, pdf_id: str, index: BM25Index, documents: List[Optional[Dict]]):
+        """保存索引到共享存储,失败时仅本进程可用"""
+        try:
+            self.store.save(pdf_id, index, documents)
+        except Exception as e:
+            print(f"[BM25] Failed to persist index for PDF {pdf_id}: {e}")
+
     def retrieve(
         self,
         query: str,
@@ -77,29 +306,24 @@ class SparseRetriever:
         Returns:
             检索结果列表,每个结果包含原始文档 + score
         """
-        # 检查索引是否存在
-        if pdf_id not in self.bm25_index:
+        # 检查索引是否存在 (本进程没有时从共享存储加载)
+        self._get_index(pdf_id)
+        index, documents = self._snapshot(pdf_id)
+        if index is None:
             print(f"[BM25] No index found for PDF {pdf_id}")
             return []
 
         # 查询分词
-        tokenized_query = self.tokenize(query)
+        tokenized_query = self.tokenize_query(query)
 
-        # BM25 打分
-        scores = self.bm25_index[pdf_id].get_scores(tokenized_query)
-
-        # 排序并取 Top-K
-        top_indices = np.argsort(scores)[::-1][:top_k]
+        # BM25 打分: 只计算包含查询词的文档,Top-K 已按分数降序
+        top_indices, scores = index.top_k(tokenized_query, top_k)
 
         # 构建结果
         results = []
-        for idx in top_indices:
-            # 跳过分数为 0 的结果
-            if scores[idx] == 0:
-                continue
-
-            chunk = self.documents[pdf_id][idx].copy()
-            chunk['score'] = float(scores[idx])
+        for idx, score in zip(top_indices, scores):
+            chunk = documents[idx].copy()
+            chunk['score'] = float(score)
             chunk['retrieval_method'] = 'bm25'
             results.append(chunk)
 
@@ -108,11 +332,220 @@ class SparseRetriever:
         return results
 
     def clear_index(self, pdf_id: str):
-        """清除指定 PDF 的索引"""
-        if pdf_id in self.bm25_index:
-            del self.bm25_index[pdf_id]
-            del self.documents[pdf_id]
-            print(f"[BM25] Cleared index for PDF {pdf_id}")
+        """清除指定 PDF 的索引 (含持久化副本)"""
+        with self._write_lock:
+            try:
+                self.store.delete(pdf_id)
+            except Exception as e:
+                print(f"[BM25] Failed to delete persisted index for PDF {pdf_id}: {e}")
+
+            with self._swap_lock:
+                cleared = self.bm25_index.pop(pdf_id, None) is not None
+                self.documents.pop(pdf_id, None)
+            if cleared:
+                print(f"[BM25] Cleared index for PDF {pdf_id}")
+
+            def remove(library: LibraryIndex):
+                slots = library.chunk_slots(pdf_id)
+                if slots:
+                    library.remove_slots(slots, self.tokenize_batch(
+                        [library.documents[slot]['text'] for slot in slots]
+                    ))
+
+            self._update_library(pdf_id, remove)
+
+    def retrieve_library(
+        self,
+        query: str,
+        pdf_ids: Optional[Iterable[str]] = None,
+        top_k: int = 20
+    ) -> List[Dict]:
+        """
+        跨 PDF 的 BM25 检索,使用全库统计量,各 PDF 的分数可直接比较
+
+        Args:
+            query: 查询文本
+            pdf_ids: 只在这些 PDF 中检索 (默认全部已索引的 PDF)
+            top_k: 返回 Top-K 结果
+
+        Returns:
+            检索结果列表,每个结果包含原始文档 + pdf_id + score
+        """
+        library = self._get_library()
+        if library is None:
+            print("[BM25] No library index found")
+            return []
+
+        hits = library.search(self.tokenize_query(query), top_k, pdf_ids=pdf_ids)
+
+        results = []
+        for chunk, score in hits:
+            chunk = chunk.copy()
+            chunk['score'] = score
+            chunk['retrieval_method'] = 'bm25'
+            results.append(chunk)
+
+        print(f"[BM25] Retrieved {len(results)} library results for query: {query[:30]}...")
+
+        return results
+
+    def _update_library(self, pdf_id: str, change: Callable[[LibraryIndex], None]):
+        """
+        修改全库索引 (尽力而为)
+
+        单 PDF 索引此时已经保存,全库索引更新失败 (如等待锁超时) 不影响主流程:
+        记录日志,稍后在后台按单 PDF 索引重新同步该 PDF
+        """
+        if not self.library_enabled:
+            return
+        try:
+            self._apply_library_change(change)
+        except Exception as e:
+            logger.warning("BM25 library update for PDF %s failed, reconciling in the background: %s", pdf_id, e)
+            self._schedule_reconcile(pdf_id)
+
+    def _apply_library_change(self, change: Callable[[LibraryIndex], None]):
+        """
+        在分布式锁内修改全库索引并持久化
+
+        多个进程都会写全库索引,修改前在锁内重新加载最新版本,避免覆盖彼此的更新
+        """
+        with self._write_lock, self._library_lock():
+            current = self._get_library()
+            # 在副本上修改,持久化后整体替换,并发的全库检索只会看到完整的版本
+            library = current.copy() if current is not None else LibraryIndex()
+            change(library)
+            library.compact(self.COMPACT_DELETED_RATIO)
+            try:
+                self.store.save(self.LIBRARY_ID, library.index, library.documents)
+            except Exception as e:
+                logger.warning("Failed to persist BM25 library index: %s", e)
+            self.library = library
+
+    def _schedule_reconcile(self, pdf_id: str):
+        """把 PDF 加入待同步集合,LIBRARY_RETRY_DELAY 秒后在后台线程同步"""
+        with self._reconcile_lock:
+            self._library_pending.add(pdf_id)
+            if self._reconcile_timer is None:
+                self._reconcile_timer = threading.Timer(self.LIBRARY_RETRY_DELAY, self.reconcile_library)
+                self._reconcile_timer.daemon = True
+                self._reconcile_timer.start()
+
+    def reconcile_library(self):
+        """
+        按单 PDF 索引的当前内容重新同步待同步 PDF 在全库索引中的块
+
+        由后台定时器调用;失败时保留待同步集合并再次排期
+        """
+        with self._reconcile_lock:
+            pending, self._library_pending = self._library_pending, set()
+            self._reconcile_timer = None
+        if not pending:
+            return
+
+        def sync(library: LibraryIndex):
+            for pdf_id in pending:
+                old_slots = library.chunk_slots(pdf_id)
+                if old_slots:
+                    library.remove_slots(old_slots, self.tokenize_batch(
+                        [library.documents[slot]['text'] for slot in old_slots]
+                    ))
+                if self._get_index(pdf_id) is not None:
+                    chunks = [chunk for chunk in self.documents[pdf_id] if chunk is not None]
+                    library.add_chunks(pdf_id, chunks, self.tokenize_batch([chunk['text'] for chunk in chunks]))
+
+        try:
+            self._apply_library_change(sync)
+        except Exception as e:
+            logger.warning("BM25 library reconcile for %d PDFs failed, retrying later: %s", len(pending), e)
+            for pdf_id in pending:
+                self._schedule_reconcile(pdf_id)
+            return
+        logger.info("Reconciled BM25 library index for %d PDFs", len(pending))
+
+    @contextmanager
+    def _library_lock(self):
+        """
+        Redis 锁 (仅在使用共享存储时)
+
+        Redis 不可用时退化为无锁 (单机部署);锁被其他进程长时间占用时抛出异常,
+        不在无锁状态下修改,避免覆盖其他进程的更新
+
+        Raises:
+            TimeoutError: 等待锁超时
+        """
+        lock = None
+        if self.store.backend != 'none':
+            try:
+                from backend.services.cache_service import get_cache_service
+                lock = get_cache_service().redis.lock(
+                    f'lock:bm25:{self.LIBRARY_ID}',
+                    timeout=self.LIBRARY_LOCK_TIMEOUT,
+                    blocking_timeout=self.LIBRARY_LOCK_WAIT
+                )
+                acquired = lock.acquire()
+            except Exception as e:
+                logger.warning("BM25 library lock unavailable, updating without it: %s", e)
+                lock, acquired = None, True
+
+            if not acquired:
+                raise TimeoutError(f"Timed out after {self.LIBRARY_LOCK_WAIT}s waiting for the BM25 library index lock")
+
+        try:
+            yield
+        finally:
+            if lock is not None:
+                try:
+                    lock.release()
+                except Exception as e:
+                    logger.warning("Failed to release BM25 library lock: %s", e)
+
+    def _get_library(self) -> Optional[LibraryIndex]:
+        """返回全库索引,必要时从共享存储加载 (其他进程更新后重新加载)"""
+        library = self.library
+        loaded = self._load_if_changed(self.LIBRARY_ID, library.index if library is not None else None)
+        if loaded is not None:
+            loaded_library = LibraryIndex(*loaded)
+            with self._swap_lock:
+                # 加载期间本进程已替换为更新的版本时,不用加载结果覆盖它
+                if self.library is library:
+                    self.library = loaded_library
+                library = self.library
+            print(f"[BM25] Loaded library index ({loaded_library.index.corpus_size} chunks)")
+        return library
+
+    def _get_index(self, pdf_id: str) -> Optional[BM25Index]:
+        """
+        返回 PDF 的索引,必要时从共享存储惰性加载
+
+        已加载的索引若被其他进程重建 (build_id 变化),重新加载
+        """
+        index = self.bm25_index.get(pdf_id)
+        loaded = self._load_if_changed(pdf_id, index)
+        if loaded is not None:
+            with self._swap_lock:
+                # 加载期间本进程已替换为更新的版本时,不用加载结果覆盖它
+                if self.bm25_index.get(pdf_id) is index:
+                    self.bm25_index[pdf_id], self.documents[pdf_id] = loaded
+                index = self.bm25_index[pdf_id]
+            print(f"[BM25] Loaded index for PDF {pdf_id} ({loaded[0].corpus_size} chunks)")
+        return index
+
+    def _load_if_changed(self, name: str, current: Optional[BM25Index]):
+        """
+        共享存储中的版本与 current 不同时加载
+
+        Returns:
+            (BM25Index, 文档列表),无需加载、不存在或加载失败时返回 None
+        """
+        try:
+            version = self.store.version(name)
+            if version is None or (current is not None and current.build_id == version):
+                return None
+            return self.store.load(name)
+        except Exception as e:
+            print(f"[BM25] Failed to load persisted index {name}: {e}")
+            return None
 
 
 # 全局单例
@@ -0,0 +1,87 @@
+"""Task progress events published over Redis pub/sub and streamed to clients."""
+import json
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, Optional
+from backend.config import get_settings
+
+# States after which no further events are published for a task
+TERMINAL_STATES = frozenset({'SUCCESS', 'FAILURE', 'REVOKED'})
+
+
+def task_channel(task_id: str) -> str:
+    """Pub/sub channel carrying the events of one task."""
+    return f"{get_settings().task_events_channel_prefix}:{task_id}"
+
+
+def publish_task_event(task_id: str, state: str, data: Optional[Dict[str, Any]] = None) -> None:
+    """
+    Publish a task state change (best effort).
+
+    Subscribers only see events published while they are connected, so a
+    failure here is logged and ignored; GET /tasks/{task_id} still works.
+
+    Args:
+        task_id: Celery task ID
+        state: Task state (PROGRESS, SUCCESS, FAILURE, ...)
+        data: Progress metadata, result or error details
+    """
+    from backend.services.cache_service import get_cache_service
+
+    payload = json.dumps({'state': state, 'result': data}, ensure_ascii=False, default=str)
+    try:
+        get_cache_service().redis.publish(task_channel(task_id), payload)
+    except Exception as e:
+        print(f"[TaskEvents] Failed to publish {state} for {task_id}: {e}")
+
+
+async def subscribe_task_events(
+    task_id: str,
+    get_snapshot: Callable[[], Awaitable[Dict[str, Any]]],
+    heartbeat: Optional[float] = None
+) -> AsyncIterator[Optional[Dict[str, Any]]]:
+    """
+    Yield a task's events until it reaches a terminal state.
+
+    The channel is subscribed before the current state is read, so no update
+    published in between is lost. When nothing arrived within the heartbeat
+    interval the state is read again: a terminal state ends the stream (no
+    event is published for revoked tasks or failed chords), otherwise None
+    is yielded, letting the caller keep the stream alive.
+
+    Args:
+        task_id: Celery task ID
+        get_snapshot: Coroutine function returning the current
+            {'state': ..., 'result': ...}, yielded first and polled on heartbeat
+        heartbeat: Seconds to wait for an event before yielding None
+
+    Yields:
+        Event dicts ({'state': ..., 'result': ...}) or None on heartbeat
+    """
+    from backend.services.async_cache_service import get_async_cache_service
+
+    if heartbeat is None:
+        heartbeat = get_settings().task_events_heartbeat
+
+    pubsub = get_async_cache_service().redis.pubsub()
+    await pubsub.subscribe(task_channel(task_id))
+    try:
+        snapshot = await get_snapshot()
+        yield snapshot
+        if snapshot['state'] in TERMINAL_STATES:
+            return
+
+        while True:
+            message = await pubsub.get_message(ignore_subscribe_messages=True, timeout=heartbeat)
+            if message is None:
+                snapshot = await get_snapshot()
+                if snapshot['state'] in TERMINAL_STATES:
+                    yield snapshot
+                    return
+                yield None
+                continue
+            event = json.loads(message['data'])
+            yield event
+            if event['state'] in TERMINAL_STATES:
+                return
+    finally:
+        await pubsub.unsubscribe()
+        await pubsub.aclose()
@@ -1,15 +1,19 @@
 """PDF processing Celery tasks with progress tracking and error handling."""
-from celery import Task
-from typing import Dict, Any
+from celery import Task, chord
+from celery.exceptions import Ignore
+from typing import Dict, Any, Iterable, List, Optional
 from backend.celery_app import celery_app
+from backend.config import get_settings
 from backend.pdf_processor import PDFProcessor
 from backend.services.smart_chunking import get_smart_chunker
 from backend.services.sparse_retrieval import get_sparse_retriever
 from backend.services.cache_service import get_cache_service
-
+from backend.services.semantic_cache import get_semantic_cache
+from backend.services.task_events import publish_task_event
+from backend.container import get_container
 
 class CallbackTask(Task):
-    """Base task class with progress tracking support."""
+    """Base task class with progress tracking and pub/sub progress events."""
 
     def update_progress(self, current_step: int, total_steps: int, message: str = ""):
         """
@@ -21,68 +25,89 @@ class CallbackTask(Task):
             message: Optional progress message
         """
         progress_percent = int((current_step / total_steps) * 100)
-        self.update_state(
-            state='PROGRESS',
-            meta={
-                'current': current_step,
-                'total': total_steps,
-                'percent': progress_percent,
-                'message': message
-            }
-        )
+        meta = {
+            'current': current_step,
+            'total': total_steps,
+            'percent': progress_percent,
+            'message': message
+        }
+        self.update_state(state='PROGRESS', meta=meta)
+        if self.request.id:
+            publish_task_event(self.request.id, 'PROGRESS', meta)
+
+    def on_success(self, retval, task_id, args, kwargs):
+        """Publish the final result once it is stored in the result backend."""
+        publish_task_event(task_id, 'SUCCESS', retval)
+
+    def on_failure(self, exc, task_id, args, kwargs, einfo):
+        """Publish the failure so event subscribers stop waiting."""
+        publish_task_event(task_id, 'FAILURE', {'error': str(exc)})
 
 
 @celery_app.task(bind=True, base=CallbackTask)
-def process_pdf_task(self, pdf_path: str, pdf_id: str) -> Dict[str, Any]:
+def process_pdf_task(
+    self,
+    pdf_path: str,
+    pdf_id: str,
+    index_vectors: bool = False,
+    sharded: Optional[bool] = None
+) -> Dict[str, Any]:
     """
     Asynchronously process a PDF: extract text, chunk, index, and cache.
 
+    Large documents (pdf_shard_min_pages or more, or sharded=True) are
+    handed to a chord of page-range subtasks instead; see
+    build_sharded_workflow. The task ID then resolves to the merge result.
+
     This task performs the following steps:
     1. Extract text from PDF pages
     2. Apply smart chunking with semantic boundaries
     3. Build BM25 sparse retrieval index
     4. Cache chunks in Redis
-    5. Return completion status
+    5. Optionally embed chunks and store them in Qdrant (needed by /chat)
+    6. Return completion status
 
     Args:
         pdf_path: Absolute path to the PDF file
         pdf_id: Unique identifier for this PDF
+        index_vectors: Also embed chunks and upsert them to the vector store
+        sharded: Force (True) or disable (False) sharding; None decides by page count
 
     Returns:
         Dict containing:
             - status: 'completed'
             - pdf_id: The PDF identifier
             - chunks_count: Number of chunks created
+            - page_count: Number of pages extracted
             - message: Success message
 
     Raises:
         Exception: Any processing error will be caught and stored in task state
     """
-    total_steps = 4
+    total_steps = 5 if index_vectors else 4
+    settings = get_settings()
 
     try:
+        pdf_processor = PDFProcessor()
+        if sharded is not False:
+            ranges = pdf_processor.page_ranges(pdf_path, settings.pdf_shard_pages)
+            page_count = ranges[-1][1] if ranges else 0
+            min_pages = settings.pdf_shard_min_pages
+            if len(ranges) > 1 and (sharded or (min_pages and page_count >= min_pages)):
+                self.update_progress(0, total_steps, f"Dispatching {len(ranges)} page-range shards")
+                # The chord's merge task takes over this task ID: replace() raises
+                # Ignore, or runs the workflow and returns its result when eager
+                return self.replace(build_sharded_workflow(
+                    pdf_path, pdf_id, ranges, index_vectors, task_id=self.request.id
+                ))
+
         # Step 1: Extract text from PDF
         self.update_progress(0, total_steps, "Extracting text from PDF")
-        pdf_processor = PDFProcessor()
         pages = pdf_processor.extract_pages(pdf_path)
 
-        # Combine all page text
-        full_text = '\n\n'.join([page['text'] for page in pages])
-
         # Step 2: Smart chunking with semantic boundaries
         self.update_progress(1, total_steps, "Applying smart chunking")
-        chunker = get_smart_chunker()
-        raw_chunks = chunker.chunk(full_text, max_tokens=512, overlap=50)
-
-        # Format chunks with IDs and page numbers
-        chunks = []
-        for idx, chunk in enumerate(raw_chunks):
-            chunks.append({
-                'id': f"{pdf_id}_chunk_{idx}",
-                'text': chunk['text'],
-                'page': 1,  # Default page, can be enhanced to track actual page
-                'tokens': chunk['tokens']
-            })
+        chunks = _chunk_pages(pages, f"{pdf_id}_chunk")
 
         # Step 3: Build BM25 index
         self.update_progress(2, total_steps, "Building BM25 index")
@@ -94,16 +119,27 @@ def process_pdf_task(self, pdf_path: str, pdf_id: str) -> Dict[str, Any]:
         cache = get_cache_service()
         cache.set(f'pdf:chunks:{pdf_id}', chunks, ttl=3600)
 
+        # Step 5: Embed and store in the vector database
+        if index_vectors:
+            self.update_progress(4, total_steps, "Embedding and storing vectors")
+            _embed_and_store(pdf_id, chunks)
+
+        # Cached answers in every API process refer to the previous index
+        get_semantic_cache().invalidate(pdf_id)
+
         # Complete
-        self.update_progress(4, total_steps, "Processing complete")
+        self.update_progress(total_steps, total_steps, "Processing complete")
 
         return {
             'status': 'completed',
             'pdf_id': pdf_id,
             'chunks_count': len(chunks),
+            'page_count': len(pages),
             'message': f'Successfully processed PDF with {len(chunks)} chunks'
         }
 
+    except Ignore:
+        raise
     except Exception as e:
         # Update state to FAILURE with error details
         self.update_state(
@@ -116,3 +152,155 @@ def process_pdf_task(self, pdf_path: str, pdf_id: str) -> Dict[str, Any]:
         )
         # Re-raise the exception so Celery marks the task as failed
         raise
+
+
+def build_sharded_workflow(
+    pdf_path: str,
+    pdf_id: str,
+    ranges: List,
+    index_vectors: bool = False,
+    task_id: Optional[str] = None
+):
+    """
+    Build the fan-out workflow for one PDF.
+
+    Every page range gets an extract-and-chunk subtask on the pdf_processing
+    queue, followed (when index_vectors) by an embed-and-upsert subtask on
+    the embedding queue. merge_shards_task runs once all shards finished and
+    builds the BM25 index and chunk cache for the whole document.
+
+    If a shard fails, the merge task never runs, so its failure handler
+    cannot report the error; sharded_workflow_failed_task publishes the
+    FAILURE event for task_id instead.
+
+    Args:
+        pdf_path: Absolute path to the PDF file
+        pdf_id: Unique identifier for this PDF
+        ranges: [(start, end), ...] 0-based page ranges
+        index_vectors: Also embed shard chunks and upsert them to the vector store
+        task_id: ID of the task the workflow replaces (receives the failure event)
+
+    Returns:
+        Celery chord signature
+    """
+    shards = []
+    for start, end in ranges:
+        shard = extract_shard_task.s(pdf_path, pdf_id, start, end)
+        if index_vectors:
+            shard = shard | embed_shard_task.s(pdf_id)
+        shards.append(shard)
+    workflow = chord(shards, merge_shards_task.s(pdf_id))
+    if task_id:
+        workflow.link_error(sharded_workflow_failed_task.s(task_id))
+    return workflow
+
+
+@celery_app.task(name='backend.tasks.pdf.extract_shard')
+def extract_shard_task(pdf_path: str, pdf_id: str, start: int, end: int) -> Dict[str, Any]:
+    """
+    Extract and chunk pages [start, end) of a PDF.
+
+    Chunks do not span shard borders. IDs are derived from the shard's first
+    page, so they are final here: the vector store (embed_shard_task) and the
+    BM25 index (merge_shards_task) use the same IDs.
+
+    Returns:
+        Dict with start, end, page_count and chunks (without embeddings)
+    """
+    pages = PDFProcessor().extract_page_range(pdf_path, start, end)
+    return {
+        'start': start,
+        'end': end,
+        'page_count': len(pages),
+        'chunks': _chunk_pages(pages, f"{pdf_id}_shard_{start}_chunk")
+    }
+
+
+@celery_app.task(name='backend.tasks.embedding.embed_shard')
+def embed_shard_task(shard: Dict[str, Any], pdf_id: str) -> Dict[str, Any]:
+    """
+    Embed a shard's chunks and upsert them to the vector store.
+
+    Vectors go straight to Qdrant so they never travel through the result
+    backend; the shard is passed on unchanged.
+    """
+    _embed_and_store(pdf_id, shard['chunks'])
+    return shard
+
+
+@celery_app.task(bind=True, base=CallbackTask, name='backend.tasks.pdf.merge_shards')
+def merge_shards_task(self, shards: List[Dict[str, Any]], pdf_id: str) -> Dict[str, Any]:
+    """
+    Chord callback: merge shard chunks in page order and build the indexes.
+
+    Returns:
+        Same shape as process_pdf_task, plus the number of shards
+    """
+    total_steps = 2
+    shards = sorted(shards, key=lambda shard: shard['start'])
+
+    # Shard chunk IDs are final (the vectors were stored under them)
+    chunks = [chunk for shard in shards for chunk in shard['chunks']]
+
+    self.update_progress(0, total_steps, "Building BM25 index")
+    get_sparse_retriever().index_document(pdf_id, chunks)
+
+    self.update_progress(1, total_steps, "Caching chunks")
+    get_cache_service().set(f'pdf:chunks:{pdf_id}', chunks, ttl=3600)
+    get_semantic_cache().invalidate(pdf_id)
+
+    self.update_progress(total_steps, total_steps, "Processing complete")
+
+    return {
+        'status': 'completed',
+        'pdf_id': pdf_id,
+        'chunks_count': len(chunks),
+        'page_count': sum(shard['page_count'] for shard in shards),
+        'shards': len(shards),
+        'message': f'Successfully processed PDF with {len(chunks)} chunks in {len(shards)} shards'
+    }
+
+
+@celery_app.task(name='backend.tasks.pdf.sharded_workflow_failed')
+def sharded_workflow_failed_task(request, exc, traceback, task_id: str) -> None:
+    """
+    Errback of the sharded workflow: publish FAILURE for the replaced task.
+
+    The result backend already marks task_id failed (ChordError); this only
+    lets event subscribers stop waiting.
+    """
+    publish_task_event(task_id, 'FAILURE', {'error': str(exc)})
+
+
+def _chunk_pages(pages: Iterable[Dict], id_prefix: str) -> List[Dict]:
+    """Smart-chunk extracted pages into chunk dicts with IDs and page spans"""
+    # Pages are chunked one by one, without building a full-document string
+    raw_chunks = get_smart_chunker().chunk_pages(pages, max_tokens=512, overlap=50)
+
+    # Format chunks with IDs, page span and character offsets within those pages
+    chunks = []
+    for idx, chunk in enumerate(raw_chunks):
+        chunks.append({
+            'id': f"{id_prefix}_{idx}",
+            'text': chunk['text'],
+            'page': chunk['page'],
+            'page_end': chunk['page_end'],
+            'char_start': chunk['char_start'],
+            'char_end': chunk['char_end'],
+            'tokens': chunk['tokens']
+        })
+    return chunks
+
+
+def _embed_and_store(pdf_id: str, chunks: List[Dict]) -> None:
+    """Embed chunks and upsert them to the vector store"""
+    if not chunks:
+        return
+    services = get_container()
+    embeddings = services.embedding_service.get_embeddings_batch(
+        [chunk['text'] for chunk in chunks]
+    )
+    services.vector_store.add_chunks(pdf_id, [
+        {**chunk, 'embedding': embedding}
+        for chunk, embedding in zip(chunks, embeddings)
+    ])
@@ -89,7 +89,10 @@ class AnswerValidator:
         }
 
         # 提取可用页码
-        available_pages = set(chunk.get('page', chunk.get('page_num', 0)) for chunk in chunks)
+        available_pages = set()
+        for chunk in chunks:
+            page = chunk.get('page', chunk.get('page_num', 0))
+            available_pages.update(range(page, chunk.get('page_end', page) + 1))
         result['available_pages'] = sorted(list(available_pages))
 
         # 检查是否有引用
@@ -1,17 +1,58 @@
-from qdrant_client import QdrantClient
-from qdrant_client.models import Distance, VectorParams, PointStruct
-from typing import List, Dict
+from qdrant_client import QdrantClient, AsyncQdrantClient
+from qdrant_client.models import (
+    Distance,
+    VectorParams,
+    PointStruct,
+    Filter,
+    FieldCondition,
+    MatchAny,
+    MatchValue
+)
+from typing import List, Dict, Optional
+import math
 import uuid
 from backend.config import get_settings
+from backend.http_transport import build_limits, http2_enabled, pool_stats_for
 
 settings = get_settings()
 
 class VectorStore:
-    def __init__(self):
-        self.client = QdrantClient(url=settings.qdrant_url)
+    def __init__(self, client: QdrantClient = None, async_client: AsyncQdrantClient = None):
+        # Qdrant builds its own httpx clients; configure them from the same settings
+        transport_options = {
+            'limits': build_limits(),
+            'http2': http2_enabled(),
+            'timeout': int(settings.http_read_timeout)
+        }
+        self.client = client or QdrantClient(url=settings.qdrant_url, **transport_options)
+        # Searches get their own client whose HTTP timeout matches the hybrid dense
+        # budget, so a hung search releases its retrieval thread (Qdrant takes whole seconds)
+        self.search_client = client or QdrantClient(
+            url=settings.qdrant_url,
+            **{**transport_options, 'timeout': max(1, math.ceil(settings.hybrid_dense_timeout))}
+        )
+        self.async_client = async_client or AsyncQdrantClient(url=settings.qdrant_url, **transport_options)
         self.collection_name = "pdf_chunks"
         self._ensure_collection()
 
+    async def aclose(self):
+        """Release pooled connections of all clients"""
+        self.client.close()
+        if self.search_client is not self.client:
+            self.search_client.close()
+        await self.async_client.close()
+
+    def pool_stats(self) -> Dict:
+        """Connection pool statistics of the Qdrant REST clients"""
+        try:
+            return {
+                'sync': pool_stats_for(self.client._client.openapi_client.client._client),
+                'async': pool_stats_for(self.async_client._client.openapi_client.client._async_client)
+            }
+        except AttributeError:
+            # qdrant-client internals changed
+            return {'available': False}
+
     def _ensure_collection(self):
         """Create collection if not exists"""
         collections = self.client.get_collections().collections
@@ -35,9 +76,12 @@ class VectorStore:
                 payload={
                     'pdf_id': pdf_id,
                     'page_num': chunk['page'],
+                    'page_end': chunk.get('page_end', chunk['page']),
                     'text': chunk['text'],
                     'chunk_type': chunk.get('type', 'paragraph'),
-                    'chunk_id': point_id
+                    'chunk_id': point_id,
+                    # ID used by the BM25 index, so hybrid fusion can match both legs
+                    'source_id': chunk.get('id')
                 }
             ))
 
@@ -48,14 +92,37 @@ class VectorStore:
 
     def search(self, query_vector: List[float], pdf_id: str, limit: int = 10):
         """Search for relevant chunks"""
-        results = self.client.search(
+        response = self.search_client.query_points(
+            collection_name=self.collection_name,
+            query=query_vector,
+            query_filter=Filter(
+                must=[FieldCondition(key="pdf_id", match=MatchValue(value=pdf_id))]
+            ),
+            limit=limit
+        )
+        return response.points
+
+    def search_library(self, query_vector: List[float], pdf_ids: Optional[List[str]] = None, limit: int = 10):
+        """Search chunks across several PDFs (all PDFs when pdf_ids is None)"""
+        query_filter = None
+        if pdf_ids is not None:
+            query_filter = Filter(must=[FieldCondition(key="pdf_id", match=MatchAny(any=list(pdf_ids)))])
+        response = self.search_client.query_points(
+            collection_name=self.collection_name,
+            query=query_vector,
+            query_filter=query_filter,
+            limit=limit
+        )
+        return response.points
+
+    async def asearch(self, query_vector: List[float], pdf_id: str, limit: int = 10):
+        """Search for relevant chunks without blocking the event loop"""
+        response = await self.async_client.query_points(
             collection_name=self.collection_name,
-            query_vector=query_vector,
-            query_filter={
-                "must": [
-                    {"key": "pdf_id", "match": {"value": pdf_id}}
-                ]
-            },
+            query=query_vector,
+            query_filter=Filter(
+                must=[FieldCondition(key="pdf_id", match=MatchValue(value=pdf_id))]
+            ),
             limit=limit
         )
-        return results
+        return response.points
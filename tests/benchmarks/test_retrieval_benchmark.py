@@ -22,7 +22,7 @@ class TestRetrievalBenchmark:
         # Hybrid
         hybrid = get_hybrid_retriever()
         hybrid._mock_dense_retrieval = True
-        hybrid.index_documents(pdf_id, docs)
+        hybrid.index_sparse(pdf_id, docs)
 
         return {
             'pdf_id': pdf_id,
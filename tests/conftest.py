@@ -0,0 +1,11 @@
+"""Shared pytest fixtures."""
+import pytest
+from backend.config import get_settings
+
+
+@pytest.fixture(autouse=True)
+def isolated_bm25_store(tmp_path, monkeypatch):
+    """Persist BM25 indexes under a per-test directory instead of data/bm25."""
+    settings = get_settings()
+    monkeypatch.setattr(settings, 'bm25_index_backend', 'disk')
+    monkeypatch.setattr(settings, 'bm25_index_dir', str(tmp_path / 'bm25'))
@@ -74,3 +74,112 @@ def test_chat_missing_fields(client):
     )
 
     assert response.status_code == 422  # Validation error
+
+
+def test_chat_semantic_cache_hit(client):
+    """测试相同问题第二次直接命中语义缓存"""
+    from unittest.mock import AsyncMock, Mock, patch
+    from backend.services.semantic_cache import SemanticAnswerCache
+
+    retrieval = Mock()
+    retrieval.embedding_service.aget_embedding = AsyncMock(return_value=[1.0, 0.0, 0.0])
+    retrieval.aretrieve = AsyncMock(return_value=[{'text': '深度学习是机器学习的分支', 'page': 3}])
+    qa = Mock()
+    qa.aanswer = AsyncMock(return_value={'answer': '见第3页 [来源: 第3页]', 'cited_pages': [3]})
+    answer_cache = SemanticAnswerCache(threshold=0.95, ttl=60, max_entries=10)
+
+    with patch('backend.main.get_retrieval_service', return_value=retrieval), \
+         patch('backend.main.get_qa_service', return_value=qa), \
+         patch('backend.main.get_answer_cache', return_value=answer_cache):
+        payload = {"pdf_id": "pdf-1", "question": "什么是深度学习?"}
+        first = client.post("/chat", json=payload)
+        second = client.post("/chat", json=payload)
+
+    assert first.status_code == 200
+    assert second.json() == first.json()
+    assert qa.aanswer.await_count == 1
+    assert retrieval.aretrieve.await_count == 1
+    assert answer_cache.stats()['hits'] == 1
+
+
+def test_semantic_cache_stats_endpoint(client):
+    """测试语义缓存统计接口"""
+    from unittest.mock import patch
+    from backend.services.semantic_cache import SemanticAnswerCache
+
+    answer_cache = SemanticAnswerCache(threshold=0.95, ttl=60, max_entries=10)
+    answer_cache.store('pdf-1', [1.0, 0.0], {'answer': 'a'})
+    answer_cache.lookup('pdf-1', [1.0, 0.0])
+
+    with patch('backend.main.get_answer_cache', return_value=answer_cache):
+        response = client.get("/health/semantic-cache")
+    with patch('backend.main.get_answer_cache', return_value=None):
+        disabled = client.get("/health/semantic-cache")
+
+    assert response.status_code == 200
+    assert response.json()['enabled'] is True
+    assert response.json()['hits'] == 1
+    assert response.json()['entries'] == 1
+    assert disabled.json() == {"enabled": False}
+
+
+def test_chat_stream_endpoint(client):
+    """测试流式问答接口的 SSE 事件"""
+    import json
+    from unittest.mock import AsyncMock, Mock, patch
+
+    async def fake_stream(question, chunks):
+        yield {'type': 'token', 'text': '见第3页'}
+        yield {'type': 'token', 'text': ' [来源: 第3页]'}
+        yield {'type': 'done', 'answer': '见第3页 [来源: 第3页]', 'cited_pages': [3], 'model': 'm'}
+
+    retrieval = Mock()
+    retrieval.aretrieve = AsyncMock(return_value=[{'text': '深度学习是机器学习的分支', 'page': 3}])
+    qa = Mock()
+    qa.astream_answer = fake_stream
+
+    with patch('backend.main.get_retrieval_service', return_value=retrieval), \
+         patch('backend.main.get_qa_service', return_value=qa), \
+         patch('backend.main.get_answer_cache', return_value=None):
+        response = client.post(
+            "/chat/stream",
+            json={"pdf_id": "pdf-1", "question": "什么是深度学习?"}
+        )
+
+    assert response.status_code == 200
+    assert response.headers['content-type'].startswith('text/event-stream')
+
+    events = []
+    for block in response.text.strip().split('\n\n'):
+        event_line, data_line = block.split('\n')
+        events.append((event_line[len('event: '):], json.loads(data_line[len('data: '):])))
+
+    assert [name for name, _ in events] == ['token', 'token', 'done']
+    assert events[-1][1]['cited_pages'] == [3]
+    assert events[-1][1]['sources'][0]['page'] == 3
+
+
+def test_upload_pdf_async(client):
+    """测试异步上传立即返回 task_id"""
+    import os
+    from unittest.mock import Mock, patch
+
+    with patch('backend.main.process_pdf_task') as mock_task:
+        mock_task.delay.return_value = Mock(id='task-123')
+        with open("tests/fixtures/sample.pdf", "rb") as f:
+            response = client.post(
+                "/upload/async",
+                files={"file": ("sample.pdf", f, "application/pdf")}
+            )
+
+    assert response.status_code == 202
+    data = response.json()
+    assert data['task_id'] == 'task-123'
+    assert data['status'] == 'queued'
+    assert data['status_url'] == '/tasks/task-123'
+
+    args, kwargs = mock_task.delay.call_args
+    assert os.path.isabs(args[0])
+    assert args[1] == data['pdf_id']
+    assert kwargs == {'index_vectors': True}
+    os.remove(args[0])
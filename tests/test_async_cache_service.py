@@ -0,0 +1,127 @@
+"""Tests for the asyncio Redis cache service."""
+import asyncio
+import time
+import pytest
+from unittest.mock import AsyncMock, MagicMock, patch
+from backend.services.async_cache_service import AsyncCacheService, acached
+from backend.services.cache_codecs import encode_value, get_codec
+from backend.services.cache_service import make_cache_key
+
+
+@pytest.fixture
+def async_cache():
+    """Create an async cache service with a mocked Redis client."""
+    with patch('backend.services.async_cache_service.aioredis.Redis') as mock_redis:
+        mock_client = MagicMock()
+        mock_client.get = AsyncMock(return_value=None)
+        mock_client.setex = AsyncMock()
+        mock_client.mget = AsyncMock()
+        mock_redis.return_value = mock_client
+        service = AsyncCacheService()
+        with patch('backend.services.async_cache_service.get_async_cache_service', return_value=service):
+            yield service
+
+
+@pytest.mark.asyncio
+async def test_set_and_get(async_cache):
+    """Values round-trip through the shared codec layer."""
+    await async_cache.set("k", {"a": 1}, ttl=60)
+
+    written = async_cache.redis.setex.call_args[0][2]
+    async_cache.redis.get.return_value = written
+
+    assert await async_cache.get("k") == {"a": 1}
+    assert async_cache.redis.setex.call_args[0][:2] == ("k", 60)
+
+
+@pytest.mark.asyncio
+async def test_get_many(async_cache):
+    """get_many returns only the keys that were found."""
+    async_cache.redis.mget.return_value = [b'[1]', None]
+
+    assert await async_cache.get_many(["a", "b"]) == {"a": [1]}
+
+
+@pytest.mark.asyncio
+async def test_acached_uses_sync_key_scheme(async_cache):
+    """@acached addresses the same keys as @cached."""
+    @acached(ttl=60, key_prefix="qa")
+    async def answer(pdf_id, question):
+        return f"{pdf_id}:{question}"
+
+    result = await answer("pdf1", "q")
+
+    assert result == "pdf1:q"
+    key = async_cache.redis.setex.call_args[0][0]
+    assert key == make_cache_key("qa", "answer", ("pdf1", "q"), {})
+
+
+@pytest.mark.asyncio
+async def test_acached_single_flight(async_cache):
+    """Concurrent misses await a single computation."""
+    calls = {"value": 0}
+
+    @acached(ttl=60, key_prefix="qa")
+    async def slow(x):
+        calls["value"] += 1
+        await asyncio.sleep(0.05)
+        return x * 2
+
+    results = await asyncio.gather(*(slow(4) for _ in range(5)))
+
+    assert results == [8] * 5
+    assert calls["value"] == 1
+
+
+@pytest.mark.asyncio
+async def test_acached_stale_while_revalidate(async_cache):
+    """Stale entries are returned at once and refreshed in the background."""
+    stale_entry = {"__swr__": 1, "value": "stale", "fresh_until": time.time() - 1}
+    async_cache.redis.get.return_value = encode_value(stale_entry, get_codec("json"))
+    refreshed = asyncio.Event()
+
+    @acached(ttl=60, key_prefix="qa", stale_ttl=30)
+    async def fetch():
+        refreshed.set()
+        return "fresh"
+
+    assert await fetch() == "stale"
+    await asyncio.wait_for(refreshed.wait(), timeout=1)
+    await asyncio.sleep(0)
+    assert async_cache.redis.setex.call_args[0][1] == 90
+
+
+@pytest.mark.asyncio
+async def test_writes_publish_l1_invalidations(async_cache):
+    """With L1 enabled, async writes evict the keys from sync processes' L1."""
+    import json
+    from backend.services.cache_service import CacheService
+
+    async_cache.publish_invalidations = True
+    async_cache.redis.publish = AsyncMock()
+    async_cache.redis.delete = AsyncMock()
+
+    await async_cache.set("k", [1], ttl=60)
+    await async_cache.delete("k")
+
+    messages = [call.args for call in async_cache.redis.publish.call_args_list]
+    assert [channel for channel, _ in messages] == [async_cache.invalidation_channel] * 2
+    assert [json.loads(payload)['keys'] for _, payload in messages] == [["k"], ["k"]]
+
+    # A sync CacheService with L1 accepts the message
+    sync_cache = CacheService.__new__(CacheService)
+    sync_cache._instance_id = 'sync-worker'
+    sync_cache.local = MagicMock()
+    sync_cache._handle_invalidation({'data': messages[0][1].encode()})
+    sync_cache.local.delete.assert_called_once_with("k")
+
+
+@pytest.mark.asyncio
+async def test_writes_skip_publish_without_l1(async_cache):
+    """Without the L1 tier nothing is published."""
+    async_cache.publish_invalidations = False
+    async_cache.redis.publish = AsyncMock()
+
+    await async_cache.set("k", [1], ttl=60)
+
+    async_cache.redis.publish.assert_not_called()
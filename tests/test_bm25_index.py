@@ -0,0 +1,406 @@
+"""BM25 持久化索引测试"""
+import numpy as np
+import pytest
+from unittest.mock import Mock
+from rank_bm25 import BM25Okapi
+from backend.services.bm25_index import BM25Index, BM25IndexStore
+from backend.services.sparse_retrieval import SparseRetriever
+
+
+CORPUS = [
+    ['深度', '学习', '是', '机器', '学习', '的', '分支'],
+    ['机器', '学习', '包括', '监督', '学习'],
+    ['神经网络', '由', '输入层', '隐藏层', '和', '输出层', '组成'],
+    ['深度', '神经网络', '训练'],
+]
+
+QUERIES = [['深度', '学习'], ['神经网络'], ['学习', '学习'], ['不存在']]
+
+
+class TestBM25Index:
+    """测试 CSR 索引与 rank_bm25 一致"""
+
+    def test_scores_match_rank_bm25(self):
+        """测试打分与 BM25Okapi 相同"""
+        reference = BM25Okapi(CORPUS)
+        index = BM25Index.build(CORPUS)
+
+        assert index.avgdl == pytest.approx(reference.avgdl)
+        for query in QUERIES:
+            np.testing.assert_allclose(index.get_scores(query), reference.get_scores(query))
+
+    def test_save_and_mmap_load(self, tmp_path):
+        """测试磁盘往返并以内存映射加载"""
+        index = BM25Index.build(CORPUS)
+        index.save(str(tmp_path / 'idx'))
+
+        loaded = BM25Index.load(str(tmp_path / 'idx'), mmap=True)
+
+        assert isinstance(loaded.doc_ids, np.memmap)
+        assert loaded.build_id == index.build_id
+        for query in QUERIES:
+            np.testing.assert_allclose(loaded.get_scores(query), index.get_scores(query))
+
+    def test_bytes_roundtrip(self):
+        """测试 Redis 二进制格式往返"""
+        index = BM25Index.build(CORPUS)
+
+        loaded = BM25Index.from_bytes(index.to_bytes())
+
+        assert loaded.vocabulary == index.vocabulary
+        np.testing.assert_array_equal(loaded.idf, index.idf)
+
+
+class TestBM25IndexStore:
+    """测试索引存储"""
+
+    def test_disk_store_roundtrip(self, tmp_path):
+        """测试磁盘存储保存、版本、覆盖和删除"""
+        store = BM25IndexStore(backend='disk', directory=str(tmp_path))
+        docs = [{'id': f'c{i}', 'text': ''.join(tokens), 'page': 1} for i, tokens in enumerate(CORPUS)]
+        index = BM25Index.build(CORPUS)
+
+        assert store.load('pdf1') is None
+        store.save('pdf1', index, docs)
+        assert store.version('pdf1') == index.build_id
+
+        rebuilt = BM25Index.build(CORPUS[:2])
+        store.save('pdf1', rebuilt, docs[:2])
+        loaded, loaded_docs = store.load('pdf1')
+        assert loaded.build_id == rebuilt.build_id
+        assert loaded_docs == docs[:2]
+
+        store.delete('pdf1')
+        assert store.version('pdf1') is None
+
+    def test_disk_store_switches_versions_atomically(self, tmp_path, monkeypatch):
+        """测试每次保存写入新版本目录并切换 CURRENT,上一个版本保留给正在读取的进程"""
+        monkeypatch.setattr(BM25IndexStore, 'STALE_VERSION_SECONDS', 0)
+        store = BM25IndexStore(backend='disk', directory=str(tmp_path))
+        docs = [{'id': f'c{i}'} for i in range(len(CORPUS))]
+        versions = [BM25Index.build(CORPUS[:n]) for n in (2, 3, 4)]
+
+        for index in versions:
+            store.save('pdf1', index, docs[:index.corpus_size])
+            assert (tmp_path / 'pdf1' / 'CURRENT').read_text() == index.build_id
+            loaded, loaded_docs = store.load('pdf1')
+            assert loaded.build_id == index.build_id
+            assert len(loaded_docs) == index.corpus_size
+
+        # 更早的版本及其段被清理,临时文件不残留
+        assert sorted(p.name for p in (tmp_path / 'pdf1').iterdir()) == sorted(
+            ['CURRENT', 'segments', versions[1].build_id, versions[2].build_id]
+        )
+        assert len(list((tmp_path / 'pdf1' / 'segments').iterdir())) == 2
+
+    def test_disk_store_appends_segments(self, tmp_path):
+        """测试增量更新只写入新段,已写入的段文件不变,加载结果与内存中一致"""
+        store = BM25IndexStore(backend='disk', directory=str(tmp_path))
+        docs = [{'id': f'c{i}'} for i in range(len(CORPUS))]
+        index = BM25Index.build(CORPUS[:2])
+        store.save('pdf1', index, docs[:2])
+        segments_dir = tmp_path / 'pdf1' / 'segments'
+        base = {str(p.relative_to(segments_dir)): p.stat().st_mtime_ns for p in segments_dir.rglob('*')}
+
+        index.add_documents(CORPUS[2:])
+        index.remove_documents([0], [CORPUS[0]])
+        store.save('pdf1', index, [None] + docs[1:])
+
+        # 段未合并,原有段文件未被重写,只多了一个新段
+        assert len(index.segments) == 2
+        after = {str(p.relative_to(segments_dir)): p.stat().st_mtime_ns for p in segments_dir.rglob('*')}
+        assert {name: after.get(name) for name in base} == base
+        assert len(list(segments_dir.iterdir())) == 2
+
+        loaded, loaded_docs = store.load('pdf1')
+        assert loaded_docs == [None] + docs[1:]
+        assert loaded.build_id == index.build_id
+        assert loaded.segment_ids == index.segment_ids
+        for query in QUERIES + [['训练', '输出层']]:
+            np.testing.assert_allclose(loaded.get_scores(query), index.get_scores(query))
+
+    def test_tiered_merge_keeps_large_segments(self, tmp_path):
+        """测试段过多时只合并末尾的小段,大段在内存和磁盘上都不重写,结果与重建一致"""
+        store = BM25IndexStore(backend='disk', directory=str(tmp_path))
+        corpus = CORPUS * 10
+        index = BM25Index.build(corpus)
+        store.save('pdf1', index, [{'id': f'c{i}'} for i in range(len(corpus))])
+        base_segment, base_id = index.segments[0], index.segment_ids[0]
+
+        extra = [['新增', '文档', str(i)] for i in range(3 * BM25Index.MAX_SEGMENTS)]
+        for tokens in extra:
+            index.add_documents([tokens])
+            if len(index.segments) > index.MAX_SEGMENTS:
+                index.merge_small_segments()
+            assert len(index.segments) <= index.MAX_SEGMENTS
+        index.remove_documents([len(corpus)], [extra[0]])
+        store.save('pdf1', index, [{'id': f'c{i}'} for i in range(index.num_slots)])
+
+        assert index.segments[0] is base_segment
+        assert index.segment_ids[0] == base_id
+        assert sum(index.segment_sizes) == index.num_slots
+
+        reference = BM25Okapi(corpus + extra[1:])
+        loaded, _ = store.load('pdf1')
+        live = [i for i in range(index.num_slots) if i != len(corpus)]
+        for query in QUERIES + [['新增', '5']]:
+            np.testing.assert_allclose(index.get_scores(query)[live], reference.get_scores(query))
+            np.testing.assert_allclose(loaded.get_scores(query), index.get_scores(query))
+
+    def test_redis_store_roundtrip(self):
+        """测试 Redis 存储使用单次批量读写"""
+        data = {}
+        cache = Mock()
+        cache.set_bytes_many.side_effect = lambda mapping, ttl: data.update(mapping)
+        cache.get_bytes_many.side_effect = lambda keys: [data.get(k) for k in keys]
+        cache.get_bytes.side_effect = data.get
+        store = BM25IndexStore(backend='redis', ttl=60)
+        store._cache = lambda: cache
+
+        index = BM25Index.build(CORPUS)
+        store.save('pdf1', index, [{'id': 'c0'}])
+
+        assert store.version('pdf1') == index.build_id
+        loaded, docs = store.load('pdf1')
+        assert docs == [{'id': 'c0'}]
+        np.testing.assert_allclose(loaded.get_scores(['深度']), index.get_scores(['深度']))
+
+    def test_rejects_path_like_pdf_id(self, tmp_path):
+        """测试 pdf_id 不能跳出存储目录"""
+        store = BM25IndexStore(backend='disk', directory=str(tmp_path))
+
+        with pytest.raises(ValueError):
+            store.load('../etc')
+
+
+def test_retriever_loads_index_built_by_another_process():
+    """测试其他进程 (如 Celery worker) 建立的索引可被惰性加载"""
+    docs = [
+        {'id': 'doc1', 'text': '深度学习是机器学习的一个分支', 'page': 1},
+        {'id': 'doc2', 'text': '神经网络由输入层和输出层组成', 'page': 2},
+        {'id': 'doc3', 'text': '强化学习通过奖励信号训练智能体', 'page': 3},
+    ]
+    worker = SparseRetriever()
+    worker.index_document('shared_pdf', docs)
+
+    api = SparseRetriever()
+    results = api.retrieve('深度学习', 'shared_pdf', top_k=1)
+
+    assert results[0]['id'] == 'doc1'
+    assert 'shared_pdf' in api.bm25_index
+
+    # 重建后其他进程读取新版本
+    docs = docs[1:] + [{'id': 'doc4', 'text': '卷积网络常用于图像识别', 'page': 4}]
+    worker.index_document('shared_pdf', docs)
+    results = api.retrieve('深度学习', 'shared_pdf', top_k=5)
+    assert 'doc1' not in [r['id'] for r in results]
+    assert api.documents['shared_pdf'] == docs
+
+
+def test_top_k_matches_rank_bm25_ranking():
+    """测试 Top-K 结果与 BM25Okapi 全量打分排序一致"""
+    rng = np.random.default_rng(7)
+    vocab = [f'w{i}' for i in range(200)]
+    corpus = [list(rng.choice(vocab, size=rng.integers(5, 60))) for _ in range(500)]
+    reference = BM25Okapi(corpus)
+    index = BM25Index.build(corpus)
+
+    for _ in range(20):
+        query = list(rng.choice(vocab, size=3))
+        expected = reference.get_scores(query)
+        docs, scores = index.top_k(query, 10)
+
+        np.testing.assert_allclose(scores, expected[docs], rtol=1e-12)
+        np.testing.assert_array_equal(scores, index.get_scores(query)[docs])
+        assert np.all(np.diff(scores) <= 0)
+        # 第 k 名之后没有更高的分数
+        assert np.sort(expected[expected != 0])[::-1][:10] == pytest.approx(scores)
+
+
+def test_top_k_edge_cases():
+    """测试无匹配词和 k 大于候选数"""
+    index = BM25Index.build(CORPUS)
+
+    docs, scores = index.top_k(['不存在'], 5)
+    assert len(docs) == 0 and len(scores) == 0
+
+    docs, _ = index.top_k(['输入层', '训练'], 100)
+    assert sorted(docs.tolist()) == [2, 3]
+
+
+class TestIncrementalUpdates:
+    """测试增量添加/删除与重建结果一致"""
+
+    def assert_matches_rebuild(self, index, live_docs, live_slots):
+        reference = BM25Okapi(live_docs)
+        assert index.corpus_size == len(live_docs)
+        assert index.avgdl == pytest.approx(reference.avgdl)
+        for query in QUERIES + [['训练', '输出层'], ['新增', '文档']]:
+            np.testing.assert_allclose(index.get_scores(query)[live_slots], reference.get_scores(query))
+
+    def test_add_documents(self):
+        """测试追加文档后统计量与重建一致"""
+        index = BM25Index.build(CORPUS[:2])
+        extra = CORPUS[2:] + [['新增', '文档', '学习']]
+
+        slots = index.add_documents(extra)
+
+        assert slots == [2, 3, 4]
+        assert len(index.segments) == 2
+        self.assert_matches_rebuild(index, CORPUS + extra[2:], [0, 1, 2, 3, 4])
+
+    def test_remove_documents(self):
+        """测试删除文档后统计量与重建一致"""
+        index = BM25Index.build(CORPUS + [['新增', '文档']])
+
+        assert index.remove_documents([1, 1], [CORPUS[1], CORPUS[1]]) == 1
+
+        self.assert_matches_rebuild(index, [CORPUS[0], CORPUS[2], CORPUS[3], ['新增', '文档']], [0, 2, 3, 4])
+        docs, _ = index.top_k(['监督'], 5)
+        assert 1 not in docs
+
+    def test_compact_and_persist_after_updates(self, tmp_path):
+        """测试压缩后重新编号,更新后的索引可以保存再加载"""
+        index = BM25Index.build(CORPUS)
+        index.add_documents([['新增', '文档', '学习']])
+        index.remove_documents([0], [CORPUS[0]])
+
+        index.save(str(tmp_path / 'idx'))
+        loaded = BM25Index.load(str(tmp_path / 'idx'))
+        np.testing.assert_allclose(loaded.get_scores(['学习']), index.get_scores(['学习']))
+
+        kept = loaded.compact()
+        assert kept.tolist() == [1, 2, 3, 4]
+        self.assert_matches_rebuild(loaded, CORPUS[1:] + [['新增', '文档', '学习']], [0, 1, 2, 3])
+
+
+def test_retriever_incremental_chunks():
+    """测试 SparseRetriever 增量添加/删除块"""
+    docs = [
+        {'id': 'doc1', 'text': '深度学习是机器学习的一个分支', 'page': 1},
+        {'id': 'doc2', 'text': '神经网络由输入层和输出层组成', 'page': 2},
+        {'id': 'doc3', 'text': '强化学习通过奖励信号训练智能体', 'page': 3},
+    ]
+    retriever = SparseRetriever()
+    retriever.index_document('pdf', docs)
+
+    retriever.add_chunks('pdf', [{'id': 'doc4', 'text': '卷积神经网络常用于图像识别', 'page': 4}])
+    assert 'doc4' in [r['id'] for r in retriever.retrieve('图像识别', 'pdf')]
+
+    assert retriever.remove_chunks('pdf', ['doc1', 'missing']) == 1
+    assert 'doc1' not in [r['id'] for r in retriever.retrieve('深度学习', 'pdf')]
+
+    # 删除比例达到阈值后压缩,文档列表与索引仍然对齐
+    retriever.remove_chunks('pdf', ['doc3'])
+    assert [d['id'] for d in retriever.documents['pdf']] == ['doc2', 'doc4']
+    assert retriever.bm25_index['pdf'].num_slots == 2
+
+    # 其他进程加载到更新后的版本
+    other = SparseRetriever()
+    other.retrieve('图像识别', 'pdf')
+    assert [d['id'] for d in other.documents['pdf']] == ['doc2', 'doc4']
+    assert other.bm25_index['pdf'].build_id == retriever.bm25_index['pdf'].build_id
+
+
+def test_updates_do_not_change_published_index():
+    """增量更新在副本上进行,并发读者持有的旧索引和文档列表保持一致"""
+    docs = [
+        {'id': 'doc1', 'text': '深度学习是机器学习的一个分支', 'page': 1},
+        {'id': 'doc2', 'text': '神经网络由输入层和输出层组成', 'page': 2},
+    ]
+    retriever = SparseRetriever()
+    retriever.index_document('pdf', docs)
+    retriever._get_library()
+    index, documents = retriever._snapshot('pdf')
+    library = retriever.library
+    scores = index.get_scores(['神经网络'])
+
+    retriever.add_chunks('pdf', [{'id': 'doc3', 'text': '卷积神经网络常用于图像识别', 'page': 3}])
+    retriever.remove_chunks('pdf', ['doc1'])
+
+    assert retriever.bm25_index['pdf'] is not index
+    assert len(index.segments) == 1 and index.num_slots == len(documents) == 2
+    np.testing.assert_allclose(index.get_scores(['神经网络']), scores)
+    assert retriever.library is not library
+    assert sorted(chunk['id'] for chunk in library.documents) == ['doc1', 'doc2']
+
+
+class TestLibrarySearch:
+    """跨 PDF 检索测试"""
+
+    DOCS = {
+        'pdf_a': [
+            {'id': 'a1', 'text': '深度学习是机器学习的一个分支', 'page': 1},
+            {'id': 'a2', 'text': '神经网络由输入层和输出层组成', 'page': 2},
+        ],
+        'pdf_b': [
+            {'id': 'b1', 'text': '强化学习通过奖励信号训练智能体', 'page': 1},
+            {'id': 'b2', 'text': '卷积神经网络常用于图像识别', 'page': 2},
+        ],
+        'pdf_c': [
+            {'id': 'c1', 'text': '数据库索引可以加速查询', 'page': 1},
+            {'id': 'c2', 'text': '事务保证数据的一致性', 'page': 2},
+        ],
+    }
+
+    @pytest.fixture
+    def retriever(self):
+        retriever = SparseRetriever()
+        for pdf_id, docs in self.DOCS.items():
+            retriever.index_document(pdf_id, docs)
+        return retriever
+
+    def test_scores_use_global_statistics(self, retriever):
+        """分数与把全部 PDF 的块放进一个 BM25Okapi 一致"""
+        chunks = [chunk for docs in self.DOCS.values() for chunk in docs]
+        tokens = retriever.tokenize_batch([chunk['text'] for chunk in chunks])
+        expected = BM25Okapi(tokens).get_scores(retriever.tokenize_query('神经网络'))
+
+        results = retriever.retrieve_library('神经网络', top_k=10)
+        scores = {r['id']: r['score'] for r in results}
+        for chunk, score in zip(chunks, expected):
+            if score > 0:
+                assert scores[chunk['id']] == pytest.approx(score)
+        assert {r['pdf_id'] for r in results} == {'pdf_a', 'pdf_b'}
+
+    def test_pdf_filter(self, retriever):
+        results = retriever.retrieve_library('神经网络', pdf_ids=['pdf_b', 'pdf_c'])
+        assert [r['id'] for r in results] == ['b2']
+        assert retriever.retrieve_library('神经网络', pdf_ids=['missing']) == []
+
+    def test_reindex_and_clear_replace_pdf_chunks(self, retriever):
+        retriever.index_document('pdf_a', [{'id': 'a3', 'text': '图像识别依赖卷积网络', 'page': 1}])
+        ids = [r['id'] for r in retriever.retrieve_library('图像识别', top_k=10)]
+        assert 'a3' in ids
+        assert 'a1' not in [r['id'] for r in retriever.retrieve_library('深度学习', top_k=10)]
+
+        retriever.clear_index('pdf_b')
+        retriever.remove_chunks('pdf_a', ['a3'])
+        # 其他进程加载到同一份全库索引
+        other = SparseRetriever()
+        assert other.retrieve_library('图像识别', top_k=10) == []
+        assert sorted(other._get_library().pdf_ids) == ['pdf_c']
+
+    def test_library_lock_timeout_does_not_fail_ingestion(self, retriever, monkeypatch):
+        """锁等待超时时单 PDF 索引照常可用,全库索引稍后在后台同步"""
+        from unittest.mock import patch
+
+        cache = Mock()
+        cache.redis.lock.return_value.acquire.return_value = False
+        before = retriever._get_library().index.build_id
+        scheduled = []
+        monkeypatch.setattr(retriever, '_schedule_reconcile', scheduled.append)
+
+        with patch('backend.services.cache_service.get_cache_service', return_value=cache):
+            retriever.add_chunks('pdf_c', [{'id': 'c3', 'text': '倒排索引结构', 'page': 3}])
+
+        # 不在无锁状态下修改全库索引
+        assert SparseRetriever()._get_library().index.build_id == before
+        cache.redis.lock.return_value.release.assert_not_called()
+        assert scheduled == ['pdf_c']
+        assert retriever.retrieve('倒排索引', 'pdf_c')[0]['id'] == 'c3'
+
+        retriever._library_pending.add('pdf_c')
+        retriever.reconcile_library()
+        assert [r['id'] for r in retriever.retrieve_library('倒排索引', top_k=10)] == ['c3', 'c1']
+        assert 'c3' not in [r['id'] for r in retriever.retrieve_library('倒排索引', pdf_ids=['pdf_a'], top_k=10)]
@@ -1,4 +1,5 @@
 """Tests for Redis cache service."""
+import json
 import pytest
 import time
 from unittest.mock import MagicMock, patch
@@ -77,9 +78,11 @@ def test_clear_pattern(cache_service):
         0,  # cursor (0 means end)
         ["pdf:123:chunk:1", "pdf:123:chunk:2", "pdf:123:metadata"]
     )
+    pipe = cache_service.redis.pipeline.return_value
+    pipe.execute.return_value = [3]
 
     # Act
-    cache_service.clear_pattern("pdf:123:*")
+    deleted = cache_service.clear_pattern("pdf:123:*")
 
     # Assert
     cache_service.redis.scan.assert_called_once_with(
@@ -87,12 +90,32 @@ def test_clear_pattern(cache_service):
         match="pdf:123:*",
         count=100
     )
-    # Should call delete once with all keys (bulk delete)
-    cache_service.redis.delete.assert_called_once_with(
+    # Should queue one bulk delete in the pipeline
+    pipe.delete.assert_called_once_with(
         "pdf:123:chunk:1",
         "pdf:123:chunk:2",
         "pdf:123:metadata"
     )
+    pipe.execute.assert_called_once()
+    assert deleted == 3
+
+
+def test_clear_pattern_deletes_while_scanning(cache_service):
+    """Pattern clearing flushes delete batches during the scan."""
+    cache_service.DELETE_BATCH_SIZE = 2
+    cache_service.redis.scan.side_effect = [
+        (7, ["a:1", "a:2"]),
+        (9, []),
+        (0, ["a:3"])
+    ]
+    pipe = cache_service.redis.pipeline.return_value
+    pipe.execute.side_effect = [[2], [1]]
+
+    deleted = cache_service.clear_pattern("a:*")
+
+    assert deleted == 3
+    assert pipe.execute.call_count == 2
+    cache_service.redis.delete.assert_not_called()
 
 
 def test_cache_decorator(cache_service):
@@ -121,3 +144,250 @@ def test_cache_decorator(cache_service):
     # Note: With cache hit, we'd expect call_count to still be 1
 
 
+
+def test_set_writes_codec_header(cache_service):
+    """Values are written with a header naming the codec."""
+    cache_service.set("test_key", {"a": 1}, ttl=60)
+
+    written = cache_service.redis.setex.call_args[0][2]
+    assert isinstance(written, bytes)
+    assert written[0] == 0x00
+    assert written[1] == cache_service.codec.codec_id
+
+
+@pytest.mark.parametrize("codec_name", ["json", "msgpack"])
+@pytest.mark.parametrize("compression", ["none", "zstd", "lz4"])
+def test_codec_round_trip(codec_name, compression):
+    """Every codec/compression pair round-trips chunk lists."""
+    if compression == "lz4":
+        # lz4 is an optional alternative to zstd and not in requirements.txt
+        pytest.importorskip("lz4")
+    from backend.services.cache_codecs import (
+        decode_value, encode_value, get_codec, get_compression_id
+    )
+    chunks = [{"id": f"pdf_chunk_{i}", "text": "机器学习 " * 50, "page": i} for i in range(20)]
+    codec = get_codec(codec_name)
+
+    encoded = encode_value(chunks, codec, get_compression_id(compression), compress_min_bytes=64)
+
+    assert decode_value(encoded) == chunks
+    if compression != "none":
+        assert encoded[2] != 0
+        assert len(encoded) < len(json.dumps(chunks).encode('utf-8'))
+
+
+def test_small_values_not_compressed():
+    """Payloads under the threshold skip compression."""
+    from backend.services.cache_codecs import encode_value, get_codec, get_compression_id
+
+    encoded = encode_value([1, 2, 3], get_codec("msgpack"), get_compression_id("zstd"), 1024)
+
+    assert encoded[2] == 0
+
+
+def test_legacy_json_entries_still_readable(cache_service):
+    """Entries written before the codec layer (bare JSON bytes) decode as JSON."""
+    cache_service.redis.get.return_value = b'[{"id": "doc1", "page": 1}]'
+
+    assert cache_service.get("pdf:chunks:old") == [{"id": "doc1", "page": 1}]
+
+
+def test_local_cache_serves_hot_keys(cache_service):
+    """With L1 enabled, repeated gets hit Redis only once."""
+    cache_service.enable_local_cache(max_items=10, ttl=60)
+    cache_service.redis.get.return_value = b'{"data": "value"}'
+
+    assert cache_service.get("hot") == {"data": "value"}
+    assert cache_service.get("hot") == {"data": "value"}
+
+    cache_service.redis.get.assert_called_once_with("hot")
+    cache_service.redis.pubsub.return_value.subscribe.assert_called_once()
+
+
+def test_local_cache_write_publishes_invalidation(cache_service):
+    """Writes update L1 locally and publish the key for other workers."""
+    cache_service.enable_local_cache(max_items=10, ttl=60)
+
+    cache_service.set("k", [1, 2], ttl=60)
+
+    assert cache_service.get("k") == [1, 2]
+    cache_service.redis.get.assert_not_called()
+    channel, payload = cache_service.redis.publish.call_args[0]
+    assert channel == cache_service.invalidation_channel
+    assert json.loads(payload)['keys'] == ["k"]
+
+
+def test_local_cache_remote_invalidation(cache_service):
+    """Messages from other processes evict keys and patterns from L1."""
+    cache_service.enable_local_cache(max_items=10, ttl=60)
+    cache_service.local.set("pdf:1:a", b'1')
+    cache_service.local.set("pdf:2:a", b'2')
+    cache_service.local.set("qa:x", b'3')
+
+    # Own messages are ignored
+    own = {'origin': cache_service._instance_id, 'keys': ['qa:x'], 'pattern': None}
+    cache_service._handle_invalidation({'data': json.dumps(own).encode()})
+    assert cache_service.local.get("qa:x") == b'3'
+
+    other = {'origin': 'other-worker', 'keys': ['qa:x'], 'pattern': 'pdf:1:*'}
+    cache_service._handle_invalidation({'data': json.dumps(other).encode()})
+
+    assert cache_service.local.get("qa:x") is None
+    assert cache_service.local.get("pdf:1:a") is None
+    assert cache_service.local.get("pdf:2:a") == b'2'
+
+
+def test_local_lru_eviction_and_ttl():
+    """L1 evicts least recently used entries and expires by TTL."""
+    from backend.services.local_cache import LocalLRUCache
+
+    local = LocalLRUCache(max_items=2, ttl=60)
+    local.set("a", 1)
+    local.set("b", 2)
+    local.get("a")
+    local.set("c", 3)
+
+    assert local.get("b") is None
+    assert local.get("a") == 1
+    assert local.get("c") == 3
+
+    local.set("d", 4, ttl=0)
+    assert local.get("d") is None
+
+
+def test_get_many_uses_single_mget(cache_service):
+    """get_many fetches all keys in one round trip and skips misses."""
+    cache_service.redis.mget.return_value = [b'{"a": 1}', None, b'[1, 2]']
+
+    result = cache_service.get_many(["k1", "k2", "k3"])
+
+    cache_service.redis.mget.assert_called_once_with(["k1", "k2", "k3"])
+    cache_service.redis.get.assert_not_called()
+    assert result == {"k1": {"a": 1}, "k3": [1, 2]}
+
+
+def test_set_many_applies_per_key_ttl(cache_service):
+    """set_many pipelines SETEX with default and per-key TTLs."""
+    pipe = cache_service.redis.pipeline.return_value
+
+    cache_service.set_many({"k1": 1, "k2": 2}, ttl=60, ttls={"k2": 5})
+
+    ttls = {c[0][0]: c[0][1] for c in pipe.setex.call_args_list}
+    assert ttls == {"k1": 60, "k2": 5}
+    pipe.execute.assert_called_once()
+    cache_service.redis.setex.assert_not_called()
+
+
+def test_delete_many_batches(cache_service):
+    """delete_many splits keys into DEL batches in one pipeline."""
+    cache_service.DELETE_BATCH_SIZE = 2
+    pipe = cache_service.redis.pipeline.return_value
+    pipe.execute.return_value = [2, 1]
+
+    deleted = cache_service.delete_many(["a", "b", "c"])
+
+    assert [c[0] for c in pipe.delete.call_args_list] == [("a", "b"), ("c",)]
+    assert deleted == 3
+
+
+def test_single_flight_collapses_concurrent_calls():
+    """Concurrent callers for one key share a single execution."""
+    import threading
+    from backend.services.cache_service import SingleFlight
+
+    flight = SingleFlight()
+    calls = {"value": 0}
+    started = threading.Event()
+
+    def slow():
+        calls["value"] += 1
+        started.set()
+        time.sleep(0.1)
+        return "result"
+
+    results = []
+    threads = [
+        threading.Thread(target=lambda: results.append(flight.do("key", slow)))
+        for _ in range(5)
+    ]
+    threads[0].start()
+    started.wait()
+    for t in threads[1:]:
+        t.start()
+    for t in threads:
+        t.join()
+
+    assert calls["value"] == 1
+    assert results == ["result"] * 5
+
+
+def test_cache_decorator_waits_for_lock_holder(cache_service):
+    """A caller that loses the Redis lock waits for the winner's value."""
+    call_count = {"value": 0}
+
+    @cached(ttl=60, key_prefix="test", lock_timeout=2)
+    def expensive_function(x):
+        call_count["value"] += 1
+        return x * 2
+
+    cache_service.redis.lock.return_value.acquire.return_value = False
+    # Miss, then still missing on first poll, then filled by the other process
+    cache_service.redis.get.side_effect = [None, None, '8']
+
+    with patch('backend.services.cache_service.get_cache_service', return_value=cache_service):
+        result = expensive_function(4)
+
+    assert result == 8
+    assert call_count["value"] == 0
+
+
+def test_cache_decorator_retries_lock_released_without_value(cache_service):
+    """A waiter takes the lock over when the holder releases it without a value."""
+    call_count = {"value": 0}
+
+    @cached(ttl=60, key_prefix="test", lock_timeout=30)
+    def expensive_function(x):
+        call_count["value"] += 1
+        return x * 2
+
+    # The holder failed: the lock is gone and no value was stored
+    cache_service.redis.lock.return_value.acquire.side_effect = [False, True]
+    cache_service.redis.get.return_value = None
+    cache_service.redis.exists.return_value = 0
+
+    started = time.monotonic()
+    with patch('backend.services.cache_service.get_cache_service', return_value=cache_service):
+        result = expensive_function(4)
+
+    assert result == 8
+    assert call_count["value"] == 1
+    assert time.monotonic() - started < 1
+    assert cache_service.redis.exists.call_args[0][0].startswith("lock:test:expensive_function")
+
+
+def test_cache_decorator_stale_while_revalidate(cache_service):
+    """Stale entries are served immediately while one caller refreshes them."""
+    import threading
+    from backend.services.cache_codecs import encode_value, get_codec
+
+    refreshed = threading.Event()
+
+    @cached(ttl=60, key_prefix="test", stale_ttl=30)
+    def expensive_function(x):
+        refreshed.set()
+        return "fresh"
+
+    stale_entry = {"__swr__": 1, "value": "stale", "fresh_until": time.time() - 1}
+    cache_service.redis.get.return_value = encode_value(stale_entry, get_codec("json"))
+
+    with patch('backend.services.cache_service.get_cache_service', return_value=cache_service):
+        result = expensive_function(1)
+        assert refreshed.wait(timeout=2)
+
+    assert result == "stale"
+    # Refreshed value keeps the stale window in its Redis TTL
+    for _ in range(20):
+        if cache_service.redis.setex.called:
+            break
+        time.sleep(0.05)
+    assert cache_service.redis.setex.call_args[0][1] == 90
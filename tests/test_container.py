@@ -0,0 +1,72 @@
+"""Tests for the service container."""
+import pytest
+from unittest.mock import AsyncMock, patch
+from backend.container import ServiceContainer
+
+
+@pytest.fixture
+def container():
+    """Container whose service classes are mocked."""
+    with patch('backend.embeddings.EmbeddingService') as embedding_cls, \
+         patch('backend.vector_store.VectorStore') as vector_store_cls, \
+         patch('backend.pipeline.PDFPipeline') as pipeline_cls, \
+         patch('backend.retrieval.RetrievalService') as retrieval_cls, \
+         patch('backend.qa_service.QAService') as qa_cls:
+        yield ServiceContainer(), {
+            'embedding': embedding_cls,
+            'vector_store': vector_store_cls,
+            'pipeline': pipeline_cls,
+            'retrieval': retrieval_cls,
+            'qa': qa_cls
+        }
+
+
+def test_services_built_once(container):
+    """Repeated lookups reuse one instance per service."""
+    services, classes = container
+
+    assert services.qa_service is services.qa_service
+    assert services.retrieval_service is services.retrieval_service
+    classes['qa'].assert_called_once()
+    classes['retrieval'].assert_called_once()
+
+
+def test_clients_shared_between_services(container):
+    """Pipeline and retrieval share one EmbeddingService and VectorStore."""
+    services, classes = container
+
+    services.pipeline
+    services.retrieval_service
+
+    classes['embedding'].assert_called_once()
+    classes['vector_store'].assert_called_once()
+    shared = {
+        'embedding_service': classes['embedding'].return_value,
+        'vector_store': classes['vector_store'].return_value
+    }
+    classes['pipeline'].assert_called_once_with(**shared)
+    classes['retrieval'].assert_called_once_with(**shared)
+
+
+@pytest.mark.asyncio
+async def test_aclose_closes_and_forgets(container):
+    """Shutdown closes every built client and rebuilds on next use."""
+    services, classes = container
+    qa = services.qa_service
+    qa.aclose = AsyncMock()
+
+    await services.aclose()
+
+    qa.aclose.assert_awaited_once()
+    services.qa_service
+    assert classes['qa'].call_count == 2
+
+
+def test_warm_up_tolerates_failures(container):
+    """A dependency that is down at startup does not fail warm-up."""
+    services, classes = container
+    classes['vector_store'].side_effect = ConnectionError("qdrant down")
+
+    services.warm_up()
+
+    classes['qa'].assert_called_once()
@@ -0,0 +1,50 @@
+"""Tests for the content-addressed embedding cache."""
+import hashlib
+import pytest
+import redis
+from unittest.mock import MagicMock, patch
+from backend.services.embedding_cache import EmbeddingCache
+
+
+@pytest.fixture
+def cache_service():
+    """Mocked CacheService backing the embedding cache."""
+    service = MagicMock()
+    with patch('backend.services.embedding_cache.get_cache_service', return_value=service):
+        yield service
+
+
+def test_key_includes_model_and_text_hash():
+    """Keys are content-addressed per model."""
+    cache = EmbeddingCache("model-a", ttl=60)
+    digest = hashlib.sha256("你好".encode('utf-8')).hexdigest()
+
+    assert cache.make_key("你好") == f"emb:model-a:{digest}"
+    assert cache.make_key("你好") != EmbeddingCache("model-b").make_key("你好")
+
+
+def test_round_trip_as_float32(cache_service):
+    """Vectors are stored as 4 bytes per dimension and decoded on read."""
+    cache = EmbeddingCache("model-a", ttl=60)
+    vector = [0.5, -1.25, 2.0]
+
+    cache.set_many({"text": vector})
+
+    mapping = cache_service.set_bytes_many.call_args[0][0]
+    stored = mapping[cache.make_key("text")]
+    assert isinstance(stored, bytes)
+    assert len(stored) == 4 * len(vector)
+    assert cache_service.set_bytes_many.call_args[1]['ttl'] == 60
+
+    cache_service.get_bytes_many.return_value = [stored, None]
+    assert cache.get_many(["text", "missing"]) == [vector, None]
+
+
+def test_redis_failure_is_a_miss(cache_service):
+    """Redis errors degrade to cache misses instead of failing embeddings."""
+    cache = EmbeddingCache("model-a", ttl=60)
+    cache_service.get_bytes_many.side_effect = redis.RedisError("down")
+    cache_service.set_bytes_many.side_effect = redis.RedisError("down")
+
+    assert cache.get_many(["a", "b"]) == [None, None]
+    cache.set_many({"a": [0.1]})  # should not raise
@@ -1,6 +1,13 @@
 import pytest
 from unittest.mock import Mock, patch
-from backend.embeddings import EmbeddingService
+from backend.embeddings import EmbeddingService, settings
+
+
+@pytest.fixture(autouse=True)
+def no_embedding_cache():
+    """Keep API-call assertions independent of a live Redis cache"""
+    with patch.object(settings, 'embedding_cache_enabled', False):
+        yield
 
 @patch('backend.embeddings.OpenAI')
 def test_get_embedding(mock_openai):
@@ -47,3 +54,84 @@ def test_batch_embeddings(mock_openai):
         input=texts,
         model="text-embedding-3-small"
     )
+
+@patch('backend.embeddings.OpenAI')
+def test_batch_embeddings_split_by_token_budget(mock_openai):
+    # Echo back one embedding per input, tagged with the input's number
+    mock_client = Mock()
+    mock_client.embeddings.create.side_effect = lambda input, model: Mock(
+        data=[Mock(embedding=[float(text.split()[-1])] * 3) for text in input]
+    )
+    mock_openai.return_value = mock_client
+
+    service = EmbeddingService()
+    service.batch_max_tokens = 10
+    service.max_concurrency = 3
+    texts = [f"text {i}" for i in range(10)]  # ~2 tokens each
+
+    embeddings = service.get_embeddings_batch(texts)
+
+    # Results are reassembled in input order
+    assert [emb[0] for emb in embeddings] == [float(i) for i in range(10)]
+    assert mock_client.embeddings.create.call_count == 2
+    for call in mock_client.embeddings.create.call_args_list:
+        batch = call.kwargs['input']
+        assert sum(service._estimate_tokens(t) for t in batch) <= 10
+
+@patch('backend.embeddings.OpenAI')
+def test_batch_embeddings_split_by_input_cap(mock_openai):
+    mock_client = Mock()
+    mock_openai.return_value = mock_client
+
+    service = EmbeddingService()
+    service.batch_max_inputs = 2
+
+    batches = service._split_batches(["a", "b", "c", "d", "e"])
+
+    assert batches == [["a", "b"], ["c", "d"], ["e"]]
+    assert service.get_embeddings_batch([]) == []
+    mock_client.embeddings.create.assert_not_called()
+
+class DictEmbeddingCache:
+    """In-memory stand-in for EmbeddingCache"""
+
+    def __init__(self, store=None):
+        self.store = dict(store or {})
+
+    def get_many(self, texts):
+        return [self.store.get(text) for text in texts]
+
+    def set_many(self, embeddings):
+        self.store.update(embeddings)
+
+@patch('backend.embeddings.OpenAI')
+def test_batch_embeddings_only_requests_cache_misses(mock_openai):
+    mock_client = Mock()
+    mock_client.embeddings.create.side_effect = lambda input, model: Mock(
+        data=[Mock(embedding=[0.5] * 3) for _ in input]
+    )
+    mock_openai.return_value = mock_client
+
+    service = EmbeddingService()
+    service.cache = DictEmbeddingCache({"cached": [0.1] * 3})
+
+    embeddings = service.get_embeddings_batch(["cached", "new", "new", "other"])
+
+    # Duplicate misses are requested once, hits are not requested at all
+    mock_client.embeddings.create.assert_called_once_with(
+        input=["new", "other"],
+        model="text-embedding-3-small"
+    )
+    assert embeddings == [[0.1] * 3, [0.5] * 3, [0.5] * 3, [0.5] * 3]
+    assert set(service.cache.store) == {"cached", "new", "other"}
+
+@patch('backend.embeddings.OpenAI')
+def test_get_embedding_cache_hit(mock_openai):
+    mock_client = Mock()
+    mock_openai.return_value = mock_client
+
+    service = EmbeddingService()
+    service.cache = DictEmbeddingCache({"hello": [0.25] * 3})
+
+    assert service.get_embedding("hello") == [0.25] * 3
+    mock_client.embeddings.create.assert_not_called()
@@ -0,0 +1,64 @@
+"""Tests for the shared HTTP transport."""
+import httpx
+import pytest
+from unittest.mock import patch
+from backend.config import get_settings
+from backend.http_transport import HTTPTransport, build_limits, build_timeout, pool_stats_for
+
+
+def test_limits_and_timeouts_from_settings():
+    """Pool limits and timeouts come from Settings."""
+    settings = get_settings()
+    with patch.object(settings, 'http_max_connections', 7), \
+         patch.object(settings, 'http_connect_timeout', 1.5):
+        limits = build_limits()
+        timeout = build_timeout()
+
+    assert limits.max_connections == 7
+    assert timeout.connect == 1.5
+
+
+def test_clients_are_shared():
+    """One sync and one async client per transport."""
+    transport = HTTPTransport()
+
+    assert transport.client is transport.client
+    assert isinstance(transport.client, httpx.Client)
+    assert isinstance(transport.async_client, httpx.AsyncClient)
+
+
+def test_pool_stats():
+    """Pool stats report connection counts for built clients."""
+    transport = HTTPTransport()
+    assert transport.pool_stats() == {}
+
+    transport.client
+    stats = transport.pool_stats()['sync']
+
+    assert stats['connections'] == 0
+    assert stats['max_connections'] == get_settings().http_max_connections
+    assert pool_stats_for(object()) == {'available': False}
+
+
+@patch('backend.embeddings.OpenAI')
+def test_embedding_service_uses_shared_client(mock_openai):
+    """EmbeddingService hands the shared pool to OpenAI and does not close it."""
+    from backend.embeddings import EmbeddingService
+    from backend.http_transport import get_http_transport
+
+    service = EmbeddingService()
+
+    assert mock_openai.call_args.kwargs['http_client'] is get_http_transport().client
+    assert service._owns_http_clients is False
+
+
+@pytest.mark.asyncio
+async def test_aclose_rebuilds_on_next_use():
+    """Closed clients are replaced on next access."""
+    transport = HTTPTransport()
+    client = transport.client
+
+    await transport.aclose()
+
+    assert client.is_closed
+    assert transport.client is not client
@@ -1,6 +1,14 @@
 """混合检索测试"""
+import threading
+import time
 import pytest
-from backend.services.hybrid_retrieval import HybridRetriever
+from types import SimpleNamespace
+from unittest.mock import Mock
+from backend.services.hybrid_retrieval import (
+    HybridRetriever,
+    get_retrieval_executor,
+    shutdown_retrieval_executor
+)
 from tests.fixtures.test_data import get_test_documents, get_test_queries
 
 
@@ -19,7 +27,7 @@ class TestHybridRetrieval:
         docs = get_test_documents()
 
         # 索引文档 (BM25)
-        retriever.index_documents(pdf_id, docs)
+        retriever.index_sparse(pdf_id, docs)
 
         # 模拟向量检索 (简化版,返回相同文档)
         # 实际环境中会调用 Qdrant
@@ -52,6 +60,55 @@ class TestHybridRetrieval:
         assert 'doc1' in top_ids
         assert 'doc2' in top_ids
 
+    def test_weighted_rrf(self, retriever):
+        """测试加权 RRF 与逐项计算一致"""
+        dense_results = [{'id': 'doc1', 'score': 0.9}, {'id': 'doc2', 'score': 0.8}]
+        sparse_results = [{'id': 'doc2', 'score': 5.0}, {'id': 'doc3', 'score': 3.0}]
+
+        merged = retriever.rrf_fusion(dense_results, sparse_results, k=60, dense_weight=0.7, sparse_weight=0.3)
+        scores = {item['id']: item['rrf_score'] for item in merged}
+
+        assert scores['doc1'] == pytest.approx(0.7 / 61)
+        assert scores['doc2'] == pytest.approx(0.7 / 62 + 0.3 / 61)
+        assert scores['doc3'] == pytest.approx(0.3 / 62)
+        assert merged[0]['dense_rank'] == 2 and merged[0]['sparse_rank'] == 1
+        assert merged[-1]['dense_rank'] is None and merged[-1]['sparse_score'] == 3.0
+
+    @pytest.mark.parametrize('mode', ['minmax', 'zscore', 'dbsf'])
+    def test_score_normalized_fusion(self, retriever, mode):
+        """测试归一化分数融合: 两路高分的文档排第一,分数降序"""
+        dense_results = [
+            {'id': 'doc1', 'score': 0.91},
+            {'id': 'doc2', 'score': 0.90},
+            {'id': 'doc3', 'score': 0.40}
+        ]
+        sparse_results = [
+            {'id': 'doc2', 'score': 12.0},
+            {'id': 'doc4', 'score': 3.0},
+            {'id': 'doc1', 'score': 2.0}
+        ]
+
+        merged = retriever.fuse(dense_results, sparse_results, mode=mode)
+
+        assert merged[0]['id'] == 'doc2'
+        assert {item['id'] for item in merged} == {'doc1', 'doc2', 'doc3', 'doc4'}
+        scores = [item['fusion_score'] for item in merged]
+        assert scores == sorted(scores, reverse=True)
+        assert all(item['fusion'] == mode for item in merged)
+
+    def test_minmax_fusion_scores(self, retriever):
+        dense_results = [{'id': 'doc1', 'score': 1.0}, {'id': 'doc2', 'score': 0.5}]
+        sparse_results = [{'id': 'doc2', 'score': 8.0}, {'id': 'doc3', 'score': 4.0}]
+
+        merged = retriever.fuse(dense_results, sparse_results, mode='minmax', dense_weight=0.6, sparse_weight=0.4)
+        scores = {item['id']: item['fusion_score'] for item in merged}
+
+        assert scores == pytest.approx({'doc1': 0.6, 'doc2': 0.4, 'doc3': 0.0})
+
+    def test_unknown_fusion_mode(self, retriever):
+        with pytest.raises(ValueError):
+            retriever.fuse([{'id': 'doc1', 'score': 1.0}], [], mode='max')
+
     def test_hybrid_retrieval_accuracy(self, indexed_retriever):
         """测试混合检索准确率"""
         pdf_id = 'test_pdf'
@@ -104,3 +161,169 @@ class TestHybridRetrieval:
         # 结果应该按分数降序排列
         scores = [r['rrf_score'] for r in results]
         assert scores == sorted(scores, reverse=True)
+
+
+class TestDenseLeg:
+    """测试向量检索一路及并发/超时退化"""
+
+    SPARSE = [{'id': 'doc1', 'score': 5.0}, {'id': 'doc2', 'score': 4.0}]
+
+    @staticmethod
+    def hit(source_id, score, page=1):
+        return SimpleNamespace(score=score, payload={
+            'text': f'text of {source_id}', 'page_num': page, 'page_end': page,
+            'chunk_id': f'point-{source_id}', 'source_id': source_id, 'pdf_id': 'pdf'
+        })
+
+    def assert_sparse_only(self, results):
+        """只有 BM25 一路结果时仍经过融合,字段与两路都有结果时一致"""
+        assert [r['id'] for r in results] == ['doc1', 'doc2']
+        assert [r['sparse_rank'] for r in results] == [1, 2]
+        assert all(r['dense_rank'] is None and r['dense_score'] is None for r in results)
+        assert all('fusion_score' in r and r['fusion'] == 'rrf' for r in results)
+
+    @pytest.fixture
+    def retriever(self):
+        embedding_service = Mock()
+        embedding_service.get_embedding.return_value = [0.1, 0.2]
+        vector_store = Mock()
+        vector_store.search.return_value = [self.hit('doc2', 0.9), self.hit('doc3', 0.8)]
+        retriever = HybridRetriever(embedding_service=embedding_service, vector_store=vector_store)
+        retriever.sparse_retriever = Mock()
+        retriever.sparse_retriever.retrieve.return_value = self.SPARSE
+        return retriever
+
+    def test_dense_results_use_bm25_chunk_ids(self, retriever):
+        results = retriever.dense_retrieve('query', 'pdf', top_k=2)
+
+        retriever.vector_store.search.assert_called_once_with([0.1, 0.2], 'pdf', limit=2)
+        retriever.embedding_service.get_embedding.assert_called_once_with('query', timeout=retriever.dense_timeout)
+        assert [r['id'] for r in results] == ['doc2', 'doc3']
+        assert results[0]['chunk_id'] == 'point-doc2'
+        assert results[0]['retrieval_method'] == 'dense'
+
+    def test_fuses_both_legs(self, retriever):
+        results = retriever.retrieve('query', 'pdf', top_k=3)
+
+        # doc2 两路都命中,排第一
+        assert [r['id'] for r in results] == ['doc2', 'doc1', 'doc3']
+        assert all(r['retrieval_method'] == 'hybrid' for r in results)
+
+    def test_legs_run_concurrently(self, retriever):
+        def slow_embedding(query, timeout=None):
+            time.sleep(0.3)
+            return [0.1, 0.2]
+
+        def slow_sparse(*args):
+            time.sleep(0.3)
+            return self.SPARSE
+
+        retriever.embedding_service.get_embedding.side_effect = slow_embedding
+        retriever.sparse_retriever.retrieve.side_effect = slow_sparse
+
+        started = time.monotonic()
+        results = retriever.retrieve('query', 'pdf')
+        assert time.monotonic() - started < 0.55
+        assert results[0]['id'] == 'doc2'
+
+    def test_dense_timeout_falls_back_to_sparse(self, retriever):
+        retriever.dense_timeout = 0.05
+        retriever.embedding_service.get_embedding.side_effect = lambda q, timeout=None: time.sleep(0.3)
+
+        self.assert_sparse_only(retriever.retrieve('query', 'pdf'))
+
+    def test_hung_dense_calls_do_not_starve_sparse_leg(self, retriever):
+        retriever.dense_timeout = 0.05
+        retriever.sparse_timeout = 0.5
+        release = threading.Event()
+        retriever.embedding_service.get_embedding.side_effect = lambda q, timeout=None: release.wait(2)
+
+        try:
+            # 先让挂起的向量检索占满 dense 线程池
+            for _ in range(get_retrieval_executor('dense')._max_workers):
+                retriever.retrieve('query', 'pdf')
+            self.assert_sparse_only(retriever.retrieve('query', 'pdf'))
+        finally:
+            release.set()
+
+    def test_failed_leg_falls_back_to_other(self, retriever):
+        retriever.sparse_retriever.retrieve.side_effect = RuntimeError('index unavailable')
+        assert [r['id'] for r in retriever.retrieve('query', 'pdf')] == ['doc2', 'doc3']
+
+        retriever.sparse_retriever.retrieve.side_effect = None
+        retriever.vector_store.search.side_effect = ConnectionError('qdrant down')
+        self.assert_sparse_only(retriever.retrieve('query', 'pdf'))
+
+
+def test_retrievers_share_one_executor_per_leg():
+    """每一路一个线程池,所有检索器共用,关闭后重新创建"""
+    sparse = get_retrieval_executor('sparse')
+    dense = get_retrieval_executor('dense')
+    assert get_retrieval_executor('sparse') is sparse
+    assert dense is not sparse
+
+    shutdown_retrieval_executor()
+    assert sparse._shutdown and dense._shutdown
+    assert get_retrieval_executor('sparse') is not sparse
+
+
+def index_with_pipeline(vector_store, pdf_texts):
+    """用 PDFPipeline 把 {pdf_id: [文本]} 写入 BM25 和内存 Qdrant,返回 embedding mock"""
+    from backend.pipeline import PDFPipeline
+
+    texts = [text for chunk_texts in pdf_texts.values() for text in chunk_texts]
+
+    def embed(text, timeout=None):
+        vector = [0.0] * 1536
+        vector[texts.index(text) if text in texts else 0] = 1.0
+        return vector
+
+    embedding_service = Mock()
+    embedding_service.get_embeddings_batch.side_effect = lambda batch: [embed(t) for t in batch]
+    embedding_service.get_embedding.side_effect = embed
+
+    pipeline = PDFPipeline(embedding_service=embedding_service, vector_store=vector_store)
+    pipeline.pdf_processor = Mock()
+    pipeline.pdf_processor.extract_pages.return_value = [{'page_num': 1, 'text': ''}]
+    for pdf_id, chunk_texts in pdf_texts.items():
+        pipeline.pdf_processor.smart_chunking.return_value = [{'text': t, 'page': 1} for t in chunk_texts]
+        assert pipeline.process_pdf('doc.pdf', pdf_id)['success']
+    return embedding_service
+
+
+@pytest.fixture
+def memory_vector_store():
+    from qdrant_client import AsyncQdrantClient, QdrantClient
+    from backend.vector_store import VectorStore
+    return VectorStore(client=QdrantClient(":memory:"), async_client=AsyncQdrantClient(":memory:"))
+
+
+def test_pipeline_chunks_match_across_legs(memory_vector_store):
+    """PDFPipeline 写入的块在向量和 BM25 两路中 ID 一致,融合时合并为同一结果"""
+    texts = ['深度学习是机器学习的一个分支', '神经网络由输入层和输出层组成', '强化学习通过奖励信号训练智能体']
+    embedding_service = index_with_pipeline(memory_vector_store, {'pipeline_pdf': texts})
+
+    retriever = HybridRetriever(embedding_service=embedding_service, vector_store=memory_vector_store)
+    results = retriever.retrieve(texts[0], 'pipeline_pdf', top_k=3)
+
+    assert results[0]['id'] == 'pipeline_pdf_chunk_0'
+    assert results[0]['dense_rank'] == 1
+    assert results[0]['sparse_rank'] == 1
+    assert len({r['id'] for r in results}) == len(results)
+
+
+def test_library_retrieval_across_pdfs(memory_vector_store):
+    """跨 PDF 混合检索: 两路都在选定的 PDF 中召回并合并"""
+    embedding_service = index_with_pipeline(memory_vector_store, {
+        'lib_a': ['深度学习是机器学习的一个分支', '神经网络由输入层和输出层组成'],
+        'lib_b': ['卷积神经网络常用于图像识别', '强化学习通过奖励信号训练智能体'],
+        'lib_c': ['数据库索引可以加速查询', '事务保证数据的一致性'],
+    })
+    retriever = HybridRetriever(embedding_service=embedding_service, vector_store=memory_vector_store)
+
+    results = retriever.retrieve_library('卷积神经网络常用于图像识别', pdf_ids=['lib_b', 'lib_c'], top_k=4)
+
+    assert results[0]['id'] == 'lib_b_chunk_0'
+    assert results[0]['pdf_id'] == 'lib_b'
+    assert results[0]['dense_rank'] == 1 and results[0]['sparse_rank'] == 1
+    assert {r['pdf_id'] for r in results} <= {'lib_b', 'lib_c'}
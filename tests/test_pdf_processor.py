@@ -28,3 +28,21 @@ def test_clean_text():
 
     assert "  " not in clean  # No double spaces
     assert clean.strip() == clean  # No leading/trailing whitespace
+
+def test_extract_pages_parallel_matches_serial():
+    processor = PDFProcessor(max_workers=1)
+    serial = processor.extract_pages("tests/fixtures/sample.pdf")
+
+    parallel_processor = PDFProcessor(max_workers=2)
+    parallel_processor.parallel_min_pages = 1
+    parallel = parallel_processor.extract_pages("tests/fixtures/sample.pdf")
+
+    assert parallel == serial
+    assert [p['page_num'] for p in parallel] == list(range(1, len(serial) + 1))
+
+def test_split_page_ranges():
+    processor = PDFProcessor()
+    ranges = processor._split_page_ranges(10, 3)
+
+    assert ranges == [(0, 4), (4, 7), (7, 10)]
+    assert processor._split_page_ranges(2, 8) == [(0, 1), (1, 2)]
@@ -111,3 +111,116 @@ class TestCallbackTask:
 
         assert hasattr(CallbackTask, 'update_progress'), \
             "CallbackTask should have update_progress method"
+
+
+class TestShardedProcessing:
+    """Test fan-out of large PDFs into page-range subtasks."""
+
+    def test_build_sharded_workflow_routes_subtasks(self):
+        """Verify every range gets an extract -> embed chain and one merge callback."""
+        from backend.celery_app import celery_app
+        from backend.tasks.pdf_tasks import build_sharded_workflow
+
+        workflow = build_sharded_workflow('/tmp/doc.pdf', 'pdf-1', [(0, 50), (50, 100)], index_vectors=True)
+
+        assert len(workflow.tasks) == 2
+        first = workflow.tasks[0]
+        assert [task.task for task in first.tasks] == [
+            'backend.tasks.pdf.extract_shard',
+            'backend.tasks.embedding.embed_shard'
+        ]
+        assert first.tasks[0].args == ('/tmp/doc.pdf', 'pdf-1', 0, 50)
+        assert workflow.body.task == 'backend.tasks.pdf.merge_shards'
+
+        router = celery_app.amqp.router
+        assert router.route({}, 'backend.tasks.pdf.extract_shard')['queue'].name == 'pdf_processing'
+        assert router.route({}, 'backend.tasks.embedding.embed_shard')['queue'].name == 'embedding'
+
+    def test_build_sharded_workflow_without_vectors(self):
+        """Verify shards skip the embedding subtask when vectors are not indexed."""
+        from backend.tasks.pdf_tasks import build_sharded_workflow
+
+        workflow = build_sharded_workflow('/tmp/doc.pdf', 'pdf-1', [(0, 50), (50, 80)])
+
+        assert [task.task for task in workflow.tasks] == ['backend.tasks.pdf.extract_shard'] * 2
+
+    def test_merge_shards_orders_chunks_and_keeps_ids(self):
+        """Verify merge sorts shards by page, keeps the vector-store IDs and builds indexes once."""
+        from unittest.mock import patch
+        from backend.tasks.pdf_tasks import merge_shards_task
+
+        shards = [
+            {'start': 2, 'end': 4, 'page_count': 2, 'chunks': [
+                {'id': 'pdf-1_shard_2_chunk_0', 'text': 'third', 'page': 3, 'tokens': 1}
+            ]},
+            {'start': 0, 'end': 2, 'page_count': 2, 'chunks': [
+                {'id': 'pdf-1_shard_0_chunk_0', 'text': 'first', 'page': 1, 'tokens': 1},
+                {'id': 'pdf-1_shard_0_chunk_1', 'text': 'second', 'page': 2, 'tokens': 1}
+            ]}
+        ]
+
+        with patch('backend.tasks.pdf_tasks.get_sparse_retriever') as mock_retriever, \
+                patch('backend.tasks.pdf_tasks.get_cache_service') as mock_cache, \
+                patch('backend.tasks.pdf_tasks.get_semantic_cache') as mock_answer_cache, \
+                patch('backend.tasks.pdf_tasks.publish_task_event'), \
+                patch.object(merge_shards_task, 'update_state'):
+            result = merge_shards_task.run(shards, 'pdf-1')
+
+        chunks = mock_retriever.return_value.index_document.call_args[0][1]
+        assert [c['text'] for c in chunks] == ['first', 'second', 'third']
+        assert [c['id'] for c in chunks] == [
+            'pdf-1_shard_0_chunk_0', 'pdf-1_shard_0_chunk_1', 'pdf-1_shard_2_chunk_0'
+        ]
+        mock_cache.return_value.set.assert_called_once_with('pdf:chunks:pdf-1', chunks, ttl=3600)
+        mock_answer_cache.return_value.invalidate.assert_called_once_with('pdf-1')
+        assert result['chunks_count'] == 3
+        assert result['page_count'] == 4
+        assert result['shards'] == 2
+
+    def test_shard_failure_publishes_event_for_replaced_task(self):
+        """Verify the chord errback reports a failed shard under the original task ID."""
+        from unittest.mock import patch
+        from backend.tasks.pdf_tasks import build_sharded_workflow, sharded_workflow_failed_task
+
+        workflow = build_sharded_workflow('/tmp/doc.pdf', 'pdf-1', [(0, 50), (50, 100)], task_id='task-1')
+
+        errbacks = workflow.body.options['link_error']
+        assert [(e['task'], tuple(e['args'])) for e in errbacks] == [
+            ('backend.tasks.pdf.sharded_workflow_failed', ('task-1',))
+        ]
+
+        with patch('backend.tasks.pdf_tasks.publish_task_event') as mock_publish:
+            sharded_workflow_failed_task.run(None, RuntimeError('shard 50 failed'), None, 'task-1')
+        mock_publish.assert_called_once_with('task-1', 'FAILURE', {'error': 'shard 50 failed'})
+
+    def test_eager_replace_returns_workflow_result(self):
+        """Verify eager mode returns the replacement result instead of raising it."""
+        from unittest.mock import patch
+        from backend.tasks.pdf_tasks import process_pdf_task
+
+        merged = {'status': 'completed', 'pdf_id': 'pdf-1', 'shards': 2}
+        with patch('backend.tasks.pdf_tasks.PDFProcessor') as mock_processor, \
+                patch('backend.tasks.pdf_tasks.publish_task_event'), \
+                patch.object(process_pdf_task, 'update_state'), \
+                patch.object(process_pdf_task, 'replace', return_value=merged):
+            mock_processor.return_value.page_ranges.return_value = [(0, 50), (50, 100)]
+            assert process_pdf_task.run('/tmp/doc.pdf', 'pdf-1', sharded=True) == merged
+
+    def test_large_pdf_is_replaced_by_sharded_workflow(self):
+        """Verify process_pdf_task hands documents above the threshold to the chord."""
+        from unittest.mock import patch
+        from celery.exceptions import Ignore
+        from backend.tasks.pdf_tasks import process_pdf_task
+
+        ranges = [(0, 50), (50, 100), (100, 150), (150, 200), (200, 250)]
+        with patch('backend.tasks.pdf_tasks.PDFProcessor') as mock_processor, \
+                patch('backend.tasks.pdf_tasks.publish_task_event'), \
+                patch.object(process_pdf_task, 'update_state'), \
+                patch.object(process_pdf_task, 'replace', side_effect=Ignore()) as mock_replace:
+            mock_processor.return_value.page_ranges.return_value = ranges
+            with pytest.raises(Ignore):
+                process_pdf_task.run('/tmp/doc.pdf', 'pdf-1', index_vectors=True)
+
+        workflow = mock_replace.call_args[0][0]
+        assert len(workflow.tasks) == len(ranges)
+        mock_processor.return_value.extract_pages.assert_not_called()
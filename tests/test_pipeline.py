@@ -98,3 +98,38 @@ def test_pipeline_integration(mock_pdf_processor, mock_embedding_service, mock_v
     chunks = call_args[0][1]
     assert 'embedding' in chunks[0]
     assert len(chunks[0]['embedding']) == 1536
+
+@patch('backend.pipeline.VectorStore')
+@patch('backend.pipeline.EmbeddingService')
+@patch('backend.pipeline.PDFProcessor')
+def test_process_pdf_streaming_windows(mock_pdf_processor, mock_embedding_service, mock_vector_store):
+    # Three pages, two chunks per page
+    pages = [{'page_num': i, 'text': f'Page {i}'} for i in range(1, 4)]
+    mock_pdf_instance = Mock()
+    mock_pdf_instance.iter_pages.return_value = iter(pages)
+    mock_pdf_instance.smart_chunking.side_effect = lambda ps: [
+        {'text': f"{ps[0]['text']} chunk {j}", 'page': ps[0]['page_num']} for j in range(2)
+    ]
+    mock_pdf_processor.return_value = mock_pdf_instance
+
+    mock_emb_instance = Mock()
+    mock_emb_instance.get_embeddings_batch.side_effect = lambda texts: [[0.1] * 1536 for _ in texts]
+    mock_embedding_service.return_value = mock_emb_instance
+
+    mock_vs_instance = Mock()
+    mock_vector_store.return_value = mock_vs_instance
+
+    pipeline = PDFPipeline()
+    result = pipeline.process_pdf_streaming("test.pdf", "id-123", batch_size=4)
+
+    assert result['success'] == True
+    assert result['chunks_created'] == 6
+    assert result['pages_processed'] == 3
+    assert result['batches_upserted'] == 2
+
+    # Windows are bounded by batch_size and keep page order
+    windows = [call[0][1] for call in mock_vs_instance.add_chunks.call_args_list]
+    assert [len(w) for w in windows] == [4, 2]
+    assert [c['page'] for w in windows for c in w] == [1, 1, 2, 2, 3, 3]
+    assert all('embedding' in c for w in windows for c in w)
+    mock_pdf_instance.extract_pages.assert_not_called()
@@ -1,5 +1,5 @@
 import pytest
-from unittest.mock import Mock, patch
+from unittest.mock import AsyncMock, Mock, MagicMock, patch
 from backend.qa_service import QAService
 
 @patch('backend.qa_service.Anthropic')
@@ -77,3 +77,46 @@ def test_system_prompt(mock_anthropic):
     assert "来源" in prompt
     assert "页码" in prompt
     assert "严格" in prompt
+
+@pytest.mark.asyncio
+@patch('backend.qa_service.AsyncAnthropic')
+@patch('backend.qa_service.Anthropic')
+async def test_astream_answer(mock_anthropic, mock_async_anthropic):
+    # Mock the async messages.stream() context manager
+    async def text_stream():
+        for text in ["根据第5页", "的内容。", "[来源: 第5页]"]:
+            yield text
+
+    mock_stream = MagicMock()
+    mock_stream.__aenter__ = AsyncMock(return_value=Mock(text_stream=text_stream()))
+    mock_stream.__aexit__ = AsyncMock(return_value=False)
+    mock_async_anthropic.return_value.messages.stream.return_value = mock_stream
+
+    service = QAService()
+    chunks = [{'text': 'The main contribution is X', 'page': 5}]
+
+    events = [event async for event in service.astream_answer("What is it?", chunks)]
+
+    tokens = [e['text'] for e in events if e['type'] == 'token']
+    assert tokens == ["根据第5页", "的内容。", "[来源: 第5页]"]
+    assert events[-1]['type'] == 'done'
+    assert events[-1]['answer'] == ''.join(tokens)
+    assert events[-1]['cited_pages'] == [5]
+    mock_anthropic.return_value.messages.stream.assert_not_called()
+
+@pytest.mark.asyncio
+@patch('backend.qa_service.AsyncAnthropic')
+@patch('backend.qa_service.Anthropic')
+async def test_aanswer_uses_async_client(mock_anthropic, mock_async_anthropic):
+    mock_content = Mock()
+    mock_content.text = "根据第7页的内容。[来源: 第7页]"
+    mock_async_client = Mock()
+    mock_async_client.messages.create = AsyncMock(return_value=Mock(content=[mock_content]))
+    mock_async_anthropic.return_value = mock_async_client
+
+    service = QAService()
+    answer = await service.aanswer("Q?", [{'text': 'X', 'page': 7}])
+
+    assert answer['cited_pages'] == [7]
+    mock_async_client.messages.create.assert_awaited_once()
+    mock_anthropic.return_value.messages.create.assert_not_called()
@@ -1,5 +1,5 @@
 import pytest
-from unittest.mock import Mock, patch
+from unittest.mock import AsyncMock, Mock, patch
 from backend.retrieval import RetrievalService
 
 @patch('backend.retrieval.VectorStore')
@@ -96,3 +96,52 @@ def test_page_boosting(mock_embedding_service, mock_vector_store):
     assert results[0]['page'] == 5
     assert results[1]['page'] == 5
     assert results[2]['page'] == 3
+
+@pytest.mark.asyncio
+@patch('backend.retrieval.VectorStore')
+@patch('backend.retrieval.EmbeddingService')
+async def test_aretrieve_uses_async_paths(mock_embedding_service, mock_vector_store):
+    mock_emb_instance = Mock()
+    mock_emb_instance.aget_embedding = AsyncMock(return_value=[0.1] * 1536)
+    mock_embedding_service.return_value = mock_emb_instance
+
+    hit = Mock()
+    hit.payload = {'text': 'Page 6 text', 'page_num': 6, 'chunk_id': 'c6'}
+    hit.score = 0.9
+    other = Mock()
+    other.payload = {'text': 'Page 2 text', 'page_num': 2, 'chunk_id': 'c2'}
+    other.score = 0.95
+    mock_vs_instance = Mock()
+    mock_vs_instance.asearch = AsyncMock(return_value=[other, hit])
+    mock_vector_store.return_value = mock_vs_instance
+
+    service = RetrievalService()
+    results = await service.aretrieve("第6页讲了什么?", "pdf-1", k=2)
+
+    # Page mentioned in the question is boosted to the top
+    assert [r['page'] for r in results] == [6, 2]
+    mock_emb_instance.get_embedding.assert_not_called()
+    mock_vs_instance.search.assert_not_called()
+
+
+@patch('backend.retrieval.VectorStore')
+@patch('backend.retrieval.EmbeddingService')
+def test_page_boosting_uses_page_span(mock_embedding_service, mock_vector_store):
+    mock_embedding_service.return_value.get_embedding.return_value = [0.1] * 1536
+
+    mock_result1 = Mock()
+    mock_result1.payload = {'text': 'Page 2 only', 'page_num': 2, 'chunk_id': 'c1'}
+    mock_result1.score = 0.90
+
+    mock_result2 = Mock()
+    mock_result2.payload = {'text': 'Spans pages 4-6', 'page_num': 4, 'page_end': 6, 'chunk_id': 'c2'}
+    mock_result2.score = 0.85
+
+    mock_vector_store.return_value.search.return_value = [mock_result1, mock_result2]
+
+    service = RetrievalService()
+    results = service.retrieve("第5页的内容", "test-pdf", k=2)
+
+    # Chunk covering page 5 should be boosted even though it starts on page 4
+    assert results[0]['chunk_id'] == 'c2'
+    assert results[0]['page_end'] == 6
@@ -0,0 +1,131 @@
+"""语义答案缓存测试"""
+import pytest
+from backend.services.semantic_cache import SemanticAnswerCache
+
+
+class FakeRedis:
+    """只实现代数计数所需的 get/incr"""
+
+    def __init__(self):
+        self.values = {}
+
+    def get(self, key):
+        value = self.values.get(key)
+        return str(value).encode() if value is not None else None
+
+    def incr(self, key):
+        self.values[key] = self.values.get(key, 0) + 1
+        return self.values[key]
+
+
+class TestSemanticAnswerCache:
+    """测试语义答案缓存"""
+
+    @pytest.fixture
+    def cache(self):
+        """创建缓存实例"""
+        return SemanticAnswerCache(threshold=0.95, ttl=60, max_entries=2)
+
+    @pytest.fixture
+    def answer(self):
+        """示例答案"""
+        return {
+            'answer': '深度学习是机器学习的分支。[来源: 第1页]',
+            'cited_pages': [1],
+            'sources': [{'page': 1, 'text': '深度学习是机器学习的一个分支'}]
+        }
+
+    def test_similar_question_hits(self, cache, answer):
+        """相似问题命中缓存"""
+        cache.store('pdf1', [1.0, 0.0, 0.0], answer)
+
+        # 余弦相似度 ≈ 0.995
+        result = cache.lookup('pdf1', [1.0, 0.1, 0.0])
+
+        assert result == answer
+        assert cache.stats()['hits'] == 1
+
+    def test_dissimilar_question_misses(self, cache, answer):
+        """不相似问题或其他 PDF 不命中"""
+        cache.store('pdf1', [1.0, 0.0, 0.0], answer)
+
+        assert cache.lookup('pdf1', [0.0, 1.0, 0.0]) is None
+        assert cache.lookup('pdf2', [1.0, 0.0, 0.0]) is None
+        assert cache.stats()['misses'] == 2
+
+    def test_lru_eviction(self, cache, answer):
+        """超过容量时淘汰最久未使用的条目"""
+        cache.store('pdf1', [1.0, 0.0, 0.0], {**answer, 'answer': 'a'})
+        cache.store('pdf1', [0.0, 1.0, 0.0], {**answer, 'answer': 'b'})
+        cache.lookup('pdf1', [1.0, 0.0, 0.0])  # a 变为最近使用
+        cache.store('pdf1', [0.0, 0.0, 1.0], {**answer, 'answer': 'c'})
+
+        assert cache.lookup('pdf1', [0.0, 1.0, 0.0]) is None
+        assert cache.lookup('pdf1', [1.0, 0.0, 0.0])['answer'] == 'a'
+        assert cache.lookup('pdf1', [0.0, 0.0, 1.0])['answer'] == 'c'
+
+    def test_ttl_expiration(self, answer):
+        """过期条目不再命中"""
+        cache = SemanticAnswerCache(threshold=0.95, ttl=0, max_entries=10)
+        cache.store('pdf1', [1.0, 0.0], answer)
+
+        assert cache.lookup('pdf1', [1.0, 0.0]) is None
+        assert cache.stats()['entries'] == 0
+
+    def test_invalidate_on_reindex(self, cache, answer):
+        """重新索引后清空该 PDF 的缓存"""
+        cache.store('pdf1', [1.0, 0.0], answer)
+        cache.store('pdf2', [1.0, 0.0], answer)
+
+        cache.invalidate('pdf1')
+
+        assert cache.lookup('pdf1', [1.0, 0.0]) is None
+        assert cache.lookup('pdf2', [1.0, 0.0]) == answer
+
+    def test_invalidate_from_other_process(self, answer):
+        """其他进程 (Celery worker) 失效后,本进程的旧答案不再命中"""
+        redis_client = FakeRedis()
+        api_cache = SemanticAnswerCache(threshold=0.95, ttl=60, max_entries=2, redis_client=redis_client)
+        worker_cache = SemanticAnswerCache(threshold=0.95, ttl=60, max_entries=2, redis_client=redis_client)
+        api_cache.store('pdf1', [1.0, 0.0], answer)
+        api_cache.store('pdf2', [1.0, 0.0], answer)
+
+        worker_cache.invalidate('pdf1')
+
+        assert api_cache.lookup('pdf1', [1.0, 0.0]) is None
+        assert api_cache.lookup('pdf2', [1.0, 0.0]) == answer
+
+        # 新索引上的答案照常缓存
+        api_cache.store('pdf1', [1.0, 0.0], answer)
+        assert api_cache.lookup('pdf1', [1.0, 0.0]) == answer
+
+    def test_reconnects_to_redis_lazily(self, answer, monkeypatch):
+        """Redis 首次连接失败后仍会重试,恢复后开始校验其他进程的失效"""
+        monkeypatch.setattr(SemanticAnswerCache, 'REDIS_RETRY_SECONDS', 0)
+        redis_client = FakeRedis()
+        attempts = []
+
+        def redis_factory():
+            attempts.append(1)
+            if len(attempts) == 1:
+                raise ConnectionError('redis down')
+            return redis_client
+
+        cache = SemanticAnswerCache(threshold=0.95, ttl=60, max_entries=2, redis_factory=redis_factory)
+        cache.store('pdf1', [1.0, 0.0], answer)
+        assert cache.redis is None
+
+        assert cache.lookup('pdf1', [1.0, 0.0]) == answer
+        assert cache.redis is redis_client
+
+        redis_client.incr(SemanticAnswerCache.GENERATION_KEY.format(pdf_id='pdf1'))
+        assert cache.lookup('pdf1', [1.0, 0.0]) is None
+        assert len(attempts) == 2
+
+    @pytest.mark.asyncio
+    async def test_async_lookup_and_store(self, cache, answer):
+        """异步接口与同步接口结果一致"""
+        await cache.astore('pdf1', [1.0, 0.0], answer)
+
+        assert await cache.alookup('pdf1', [1.0, 0.1]) == answer
+        assert await cache.alookup('pdf1', [0.0, 1.0]) is None
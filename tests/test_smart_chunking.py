@@ -86,3 +86,36 @@ class TestSmartChunker:
         tokens = chunker.count_tokens(english_text)
         # 英文约 1.3 tokens/词
         assert tokens > 0
+
+    def test_chunk_pages_matches_joined_text(self, chunker):
+        """测试按页分块与拼接全文分块结果一致"""
+        pages = [
+            {'page_num': 1, 'text': '第一页第一句。第一页第二句。'},
+            {'page_num': 2, 'text': '第二页内容很长。' * 30},
+            {'page_num': 3, 'text': '第三页最后一句'}
+        ]
+
+        joined = chunker.chunk('\n\n'.join(p['text'] for p in pages), max_tokens=100)
+        chunks = chunker.chunk_pages(iter(pages), max_tokens=100)
+
+        assert [c['text'] for c in chunks] == [c['text'] for c in joined]
+        assert [c['tokens'] for c in chunks] == [c['tokens'] for c in joined]
+
+    def test_chunk_pages_tracks_page_span_and_offsets(self, chunker):
+        """测试块记录真实页码范围和页内字符偏移"""
+        pages = [
+            {'page_num': 4, 'text': '前言。' + '第四页的内容较长。' * 20},
+            {'page_num': 5, 'text': '第五页开头。第五页结尾。'}
+        ]
+
+        chunks = chunker.chunk_pages(pages, max_tokens=100, overlap=0)
+
+        assert chunks[0]['page'] == 4
+        assert chunks[0]['char_start'] == 0
+        assert chunks[-1]['page_end'] == 5
+        assert chunks[-1]['char_end'] == len(pages[1]['text'])
+        for chunk in chunks:
+            start_page = pages[chunk['page'] - 4]['text']
+            assert chunk['text'].startswith(start_page[chunk['char_start']:][:5])
+            end_page = pages[chunk['page_end'] - 4]['text']
+            assert end_page[:chunk['char_end']].endswith(chunk['text'].rstrip('\n')[-5:])
@@ -74,3 +74,31 @@ class TestSparseRetriever:
         assert '深度' in tokens or '深度学习' in tokens
         assert '机器' in tokens or '机器学习' in tokens
         assert len(tokens) > 0
+
+
+class TestTokenization:
+    """测试批量分词与查询缓存"""
+
+    TEXTS = ['深度学习是机器学习的一个分支', '神经网络由输入层组成', '', '强化学习 通过 奖励']
+
+    def test_tokenize_batch_parallel_matches_serial(self):
+        """测试进程池分词与逐条分词结果一致且保持顺序"""
+        retriever = SparseRetriever()
+        retriever.tokenize_workers = 2
+        retriever.parallel_min_texts = 1
+
+        texts = self.TEXTS * 5
+        assert retriever.tokenize_batch(texts) == [retriever.tokenize(t) for t in texts]
+
+    def test_tokenize_query_is_cached(self):
+        """测试重复查询只分词一次"""
+        from unittest.mock import patch
+
+        retriever = SparseRetriever()
+        with patch('backend.services.sparse_retrieval.jieba.cut', return_value=iter(['深度', ' ', '学习'])) as mock_cut:
+            first = retriever.tokenize_query('深度学习')
+            first.append('被修改')
+            second = retriever.tokenize_query('深度学习')
+
+        assert second == ['深度', '学习']
+        assert mock_cut.call_count == 1
@@ -108,3 +108,117 @@ def test_get_task_status(mock_celery_app):
     assert data['task_id'] == 'test-task-failure'
     assert data['status'] == 'FAILURE'
     assert data['result']['error'] == 'File not found'
+
+
+class FakePubSub:
+    """Minimal redis.asyncio PubSub replaying queued messages."""
+
+    def __init__(self, messages):
+        self.messages = list(messages)
+        self.subscribed = []
+        self.closed = False
+
+    async def subscribe(self, channel):
+        self.subscribed.append(channel)
+
+    async def get_message(self, ignore_subscribe_messages=False, timeout=None):
+        return self.messages.pop(0) if self.messages else None
+
+    async def unsubscribe(self):
+        pass
+
+    async def aclose(self):
+        self.closed = True
+
+
+@patch('backend.routers.tasks.celery_app')
+def test_stream_task_events(mock_celery_app):
+    """Test GET /tasks/{task_id}/events pushes published updates until done."""
+    import json
+
+    mock_result = MagicMock()
+    mock_result.state = 'PROGRESS'
+    mock_result.info = {'current': 1, 'total': 4, 'percent': 25, 'message': 'Applying smart chunking'}
+    mock_celery_app.AsyncResult.return_value = mock_result
+
+    pubsub = FakePubSub([
+        None,
+        {'data': json.dumps({'state': 'PROGRESS', 'result': {'current': 2, 'total': 4, 'percent': 50}})},
+        {'data': json.dumps({'state': 'SUCCESS', 'result': {'status': 'completed', 'chunks_count': 42}})},
+    ])
+    fake_cache = Mock()
+    fake_cache.redis.pubsub.return_value = pubsub
+
+    with patch('backend.services.async_cache_service.get_async_cache_service', return_value=fake_cache):
+        response = client.get('/tasks/test-task-id/events')
+
+    assert response.status_code == 200
+    assert response.headers['content-type'].startswith('text/event-stream')
+    assert pubsub.subscribed == ['task:events:test-task-id']
+    assert pubsub.closed
+
+    body = response.text
+    events = [block for block in body.split('\n\n') if block.startswith('event:')]
+    assert [e.split('\n')[0] for e in events] == ['event: progress', 'event: progress', 'event: done']
+    assert ': keep-alive' in body
+    done = json.loads(events[-1].split('data: ', 1)[1])
+    assert done['status'] == 'SUCCESS'
+    assert done['result']['chunks_count'] == 42
+
+
+@patch('backend.routers.tasks.celery_app')
+def test_stream_task_events_finished_task(mock_celery_app):
+    """Test events stream ends immediately for an already finished task."""
+    mock_result = MagicMock()
+    mock_result.state = 'SUCCESS'
+    mock_result.info = {'status': 'completed'}
+    mock_celery_app.AsyncResult.return_value = mock_result
+
+    pubsub = FakePubSub([])
+    fake_cache = Mock()
+    fake_cache.redis.pubsub.return_value = pubsub
+
+    with patch('backend.services.async_cache_service.get_async_cache_service', return_value=fake_cache):
+        response = client.get('/tasks/test-task-done/events')
+
+    assert response.text.startswith('event: done')
+    assert response.text.count('event:') == 1
+
+
+@patch('backend.routers.tasks.celery_app')
+def test_stream_task_events_ends_on_unpublished_terminal_state(mock_celery_app):
+    """Test the stream ends when a heartbeat finds the task revoked without an event."""
+    running = MagicMock(state='PROGRESS', info={'current': 1, 'total': 4})
+    revoked = MagicMock(state='REVOKED', info=None)
+    mock_celery_app.AsyncResult.side_effect = [running, running, revoked]
+
+    pubsub = FakePubSub([])
+    fake_cache = Mock()
+    fake_cache.redis.pubsub.return_value = pubsub
+
+    with patch('backend.services.async_cache_service.get_async_cache_service', return_value=fake_cache):
+        response = client.get('/tasks/test-task-revoked/events')
+
+    body = response.text
+    events = [block for block in body.split('\n\n') if block.startswith('event:')]
+    assert [e.split('\n')[0] for e in events] == ['event: progress', 'event: done']
+    assert body.count(': keep-alive') == 1
+    assert '"status": "REVOKED"' in events[-1]
+    assert pubsub.closed
+
+
+@patch('backend.tasks.pdf_tasks.publish_task_event')
+def test_update_progress_publishes_event(mock_publish):
+    """Test CallbackTask.update_progress publishes to the task's channel."""
+    from backend.tasks.pdf_tasks import process_pdf_task
+
+    process_pdf_task.push_request(id='test-task-id')
+    try:
+        with patch.object(process_pdf_task, 'update_state') as mock_update_state:
+            process_pdf_task.update_progress(2, 4, 'Building BM25 index')
+    finally:
+        process_pdf_task.pop_request()
+
+    meta = {'current': 2, 'total': 4, 'percent': 50, 'message': 'Building BM25 index'}
+    mock_update_state.assert_called_once_with(state='PROGRESS', meta=meta)
+    mock_publish.assert_called_once_with('test-task-id', 'PROGRESS', meta)
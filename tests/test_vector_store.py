@@ -1,6 +1,22 @@
+from qdrant_client import AsyncQdrantClient, QdrantClient
 from backend.vector_store import VectorStore
 
 def test_vector_store_connection():
     vs = VectorStore()
     assert vs.client is not None
     assert vs.collection_name == "pdf_chunks"
+
+def test_search_filters_by_pdf_id():
+    vs = VectorStore(client=QdrantClient(":memory:"), async_client=AsyncQdrantClient(":memory:"))
+    vs.add_chunks('pdf-1', [
+        {'id': 'pdf-1_chunk_0', 'text': 'first', 'page': 1, 'embedding': [1.0] + [0.0] * 1535},
+        {'id': 'pdf-1_chunk_1', 'text': 'second', 'page': 2, 'embedding': [0.0, 1.0] + [0.0] * 1534}
+    ])
+    vs.add_chunks('pdf-2', [
+        {'id': 'pdf-2_chunk_0', 'text': 'other', 'page': 1, 'embedding': [1.0] + [0.0] * 1535}
+    ])
+
+    hits = vs.search([1.0] + [0.0] * 1535, 'pdf-1', limit=5)
+
+    assert [hit.payload['source_id'] for hit in hits] == ['pdf-1_chunk_0', 'pdf-1_chunk_1']
+    assert hits[0].score > hits[1].score